@@ -1,16 +1,55 @@
-from fastapi import FastAPI, Request, Depends, HTTPException
+from fastapi import APIRouter, Depends, FastAPI, Header, Request, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from database.db import get_db
-from database.models import Condition, Remedy, Conversation, UserSession
-import datetime
+from database.db import SessionLocal
+from database.models import Condition, Remedy
+from database.migrations import migrate
+from database.session_store import make_session_store, sweep_periodically
+from database.conversation_log import ConversationLog
+from database.admin_changes import ADMIN_TOKEN, ADMIN_TOKEN_HEADER, AdminChanges, poll_periodically
+from database.analytics import DIMENSIONS, MAX_DAYS
+from database.reference_cache import ReferenceCache, CACHE_CONTROL, etag_matches
 from models.symptom_analyzer import SymptomAnalyzer
-from utils.safety_checker import check_emergency_symptoms
-from config.medical_config import DISCLAIMER
+from models.chat_flow import run_turn
+from models.batch_triage import MAX_REQUEST_TURNS, count_turns, triage
+from config.medical_config import DISCLAIMER, EMERGENCY_NOTICE
+from utils.admission import AdmissionController, Rejected
+from utils.metrics import REGISTRY, TURNS, span, stats_gauges
+from utils.profiler import make_profiler
 import json
+import asyncio
+import hmac
+import logging
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+# Debug output is off unless MEDBOT_LOG_LEVEL=DEBUG; disabled calls only cost a level check
+logger = logging.getLogger("medbot")
+logger.setLevel(os.environ.get("MEDBOT_LOG_LEVEL", "WARNING").upper())
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Expire sessions idle longer than MEDBOT_SESSION_TTL_HOURS
+    sweeper = asyncio.create_task(sweep_periodically(session_store))
+    # Apply admin changes made through other workers
+    poller = asyncio.create_task(poll_periodically(admin_changes, _apply_admin_change))
+    yield
+    sweeper.cancel()
+    poller.cancel()
+    await asyncio.gather(sweeper, poller, *_write_backs, return_exceptions=True)
+    # Write back any session state left dirty by in-flight turns and open sockets
+    await session_store.close()
+    # Write out conversation records still queued
+    await asyncio.to_thread(conversation_log.close)
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS setup
 app.add_middleware(
@@ -25,236 +64,383 @@ class ChatRequest(BaseModel):
     message: str
     user_id: str = None
 
+class BatchItem(BaseModel):
+    user_id: str = None
+    message: str = None
+    messages: list[str] = None
+
+class BatchRequest(BaseModel):
+    items: list[BatchItem]
+
+# Ids of the rows database/ingest.py wrote, per table; the rows are re-read
+# from the database, so nothing in the request reaches the analyzer directly
+class IngestChanges(BaseModel):
+    conditions: list[int] = []
+    symptoms: list[int] = []
+    remedies: list[int] = []
+    synonyms: list[int] = []
+
+# Bring medbot.db up to the current schema before anything reads it
+migrate()
 analyzer = SymptomAnalyzer()
+# Session state backend (SQLite with an in-process cache, or the shared
+# key-value server when running several workers); see database/session_store.py
+session_store = make_session_store()
+# Conversation records are written in the background; see database/conversation_log.py
+conversation_log = ConversationLog()
+# Serialized /conditions and /remedies responses, dropped when the knowledge base reloads
+reference_cache = ReferenceCache(analyzer.knowledge_base)
+# Slow-request sampling profiler; a no-op unless MEDBOT_PROFILE_SLOW_MS is set
+profiler = make_profiler()
+# Per-user rate limit and global cap on chat turns in progress; see utils/admission.py
+admission = AdmissionController()
+# Admin changes made through any worker, replayed by all of them; see database/admin_changes.py
+admin_changes = AdminChanges()
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
-# Helper: get or create user session
-def get_or_create_session(db, user_id):
-    session = db.query(UserSession).filter(UserSession.id == user_id).first()
-    if not session:
-        session = UserSession(
-            id=user_id,
-            symptoms="[]",
-            conditions_suggested="[]",
-            canonicals="[]",
-            answers="{}",
-            followups="[]"
-        )
-        db.add(session)
-        db.commit()
-    return session
-
-# Helper: get follow-up questions for a symptom
-FOLLOWUP_TEMPLATES = {
-    "sore throat": [
-        "How long have you had your sore throat?",
-        "On a scale of 1-10, how severe is your sore throat?",
-        "Are you also experiencing any cough or fever?"
-    ],
-    "headache": [
-        "How long have you had your headache?",
-        "On a scale of 1-10, how severe is your headache?",
-        "Are you also experiencing any nausea or vision changes?"
-    ],
-    "eyes": [
-        "How long have you had your eye symptoms?",
-        "Are your eyes red, itchy, or sensitive to light?",
-        "Do you have any vision changes?"
-    ],
-    "chest pain": [
-        "How long have you had your chest pain?",
-        "On a scale of 1-10, how severe is your chest pain?",
-        "Are you also experiencing shortness of breath or sweating?"
-    ],
-    "fatigue": [
-        "How long have you been feeling fatigued?",
-        "Is your fatigue constant or does it come and go?",
-        "Are you also experiencing any fever or muscle aches?"
-    ],
-    # Add more as needed
-}
+def _apply_admin_change(kind, payload):
+    if kind == "reload-knowledge-base":
+        db = SessionLocal()
+        try:
+            analyzer.knowledge_base.load(db, vocabulary=analyzer.known_symptoms)
+        finally:
+            db.close()
+    elif kind == "refresh-lexicon":
+        return analyzer.refresh_lexicon()
+    elif kind == "apply-ingest":
+        analyzer.apply_ingest(payload)
+    else:
+        raise ValueError(f"Unknown admin change {kind!r}")
+
+# Every /admin/* call needs the shared secret in MEDBOT_ADMIN_TOKEN; while it
+# is unset the admin endpoints are off.
+def _require_admin_token(token: str = Header(None, alias=ADMIN_TOKEN_HEADER)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled; set MEDBOT_ADMIN_TOKEN")
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail=f"missing or wrong {ADMIN_TOKEN_HEADER} header")
+
+admin = APIRouter(prefix="/admin", dependencies=[Depends(_require_admin_token)])
+
+# The admin endpoints record their change for every worker and apply it here
+# along with any others not applied yet.
+@admin.post("/reload-knowledge-base")
+def reload_knowledge_base():
+    """
+    Reload the in-memory condition snapshot after the conditions table changes.
+    """
+    change = admin_changes.publish("reload-knowledge-base")
+    admin_changes.catch_up(_apply_admin_change, raise_for=change)
+    kb = analyzer.knowledge_base
+    return {"status": "ok", "version": kb.version, "conditions": len(kb.conditions)}
+
+@admin.post("/refresh-lexicon")
+def refresh_lexicon():
+    """
+    Pick up synonyms and symptoms added to the database since startup.
+    """
+    change = admin_changes.publish("refresh-lexicon")
+    changed = admin_changes.catch_up(_apply_admin_change, raise_for=change) or 0
+    return {"status": "ok", "changed": changed, "synonyms": len(analyzer.synonym_map),
+            "revision": analyzer.lexicon_revision}
+
+@admin.post("/apply-ingest")
+def apply_ingest(changes: IngestChanges):
+    """
+    Re-read rows just loaded by database/ingest.py and apply them to the
+    analyzer in place.
+    """
+    change = admin_changes.publish("apply-ingest", changes.model_dump())
+    admin_changes.catch_up(_apply_admin_change, raise_for=change)
+    kb = analyzer.knowledge_base
+    return {"status": "ok", "version": kb.version, "conditions": len(kb.conditions),
+            "synonyms": len(analyzer.synonym_map)}
+
+@admin.get("/metrics")
+async def admin_metrics():
+    return {
+        "session_store": await session_store.stats(),
+        "conversation_log": conversation_log.stats(),
+        "reference_cache": reference_cache.stats(),
+        "extraction_cache": analyzer.extraction_cache.stats(),
+        "semantic_index": analyzer.semantic_index.stats() if analyzer.semantic_index else None,
+        "admission": admission.stats(),
+        "admin_changes": admin_changes.stats(),
+    }
+
+app.include_router(admin)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Stage latency histograms and counters in the Prometheus text format,
+    plus the /admin/metrics numbers as gauges.
+    """
+    gauges = [
+        *stats_gauges("medbot_session_store", await session_store.stats()),
+        *stats_gauges("medbot_conversation_log", conversation_log.stats()),
+        *stats_gauges("medbot_reference_cache", reference_cache.stats()),
+        *stats_gauges("medbot_extraction_cache", analyzer.extraction_cache.stats()),
+        *stats_gauges("medbot_semantic_index", analyzer.semantic_index.stats() if analyzer.semantic_index else {}),
+        *stats_gauges("medbot_admission", admission.stats()),
+        *stats_gauges("medbot_admin_changes", admin_changes.stats()),
+    ]
+    return Response(REGISTRY.render(gauges), media_type="text/plain; version=0.0.4")
+
+# Turns from the same user are serialized so overlapping requests can't
+# overwrite each other's session state; different users run concurrently.
+# The locks are per process: under serve.py, concurrent turns for one user
+# on different workers aren't serialized (see serve.py).
+_user_locks = weakref.WeakValueDictionary()
+
+def _user_lock(user_id):
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = _user_locks[user_id] = asyncio.Lock()
+    return lock
 
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
-    user_message = request.message
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     user_id = request.user_id or "anonymous"
-    print('DEBUG: user_id:', user_id)
-    session = get_or_create_session(db, user_id)
-    print('DEBUG: loaded session:', session.__dict__)
-    # Load session state
-    session_symptoms = json.loads(session.symptoms) if session.symptoms else []
-    canonicals_raw = session.canonicals if session.canonicals else '[]'
-    session_canonicals = json.loads(canonicals_raw)
-    answers_raw = session.answers if session.answers else '{}'
-    followups_raw = session.followups if session.followups else '[]'
-    print('DEBUG: DB session.answers:', session.answers)
-    print('DEBUG: DB session.followups:', session.followups)
-    session_answers = json.loads(answers_raw)
-    session_followups = json.loads(followups_raw)
-
-    # Reset session if user requests
-    if user_message.strip().lower() in ["reset", "start over", "clear"]:
-        session.symptoms = "[]"
-        session.canonicals = "[]"
-        session.answers = "{}"
-        session.followups = "[]"
-        db.commit()
-        return {
-            "response": "Hello! I'm MedBot, your preliminary health assistant. How are you feeling today? Please describe your symptoms.",
-            "disclaimer": DISCLAIMER
-        }
-
-    # If there are pending follow-ups, treat this message as an answer
-    if 'current_followup' in session_answers:
-        last_q = session_answers['current_followup']
-        session_answers[last_q] = user_message
-        del session_answers['current_followup']
-        session.answers = json.dumps(session_answers)
-        db.commit()
-        if session_followups:
-            # Ask the next follow-up
-            next_q = session_followups.pop(0)
-            session_answers['current_followup'] = next_q
-            session.followups = json.dumps(session_followups)
-            session.answers = json.dumps(session_answers)
-            db.commit()
-            response_text = next_q + "\n\n" + DISCLAIMER
-            conv = Conversation(user_id=user_id, messages=f"USER: {user_message}\nBOT: {response_text}")
-            db.add(conv)
-            db.commit()
-            return {
-                "response": response_text,
-                "disclaimer": DISCLAIMER
-            }
-        # If no follow-ups left, fall through to diagnosis below
-
-    # Track if new symptoms were added
-    symptoms, intent = analyzer.extract_and_classify(user_message)
-    canonicals = [analyzer.synonym_map.get(s, s) for s in symptoms]
-    is_emergency = check_emergency_symptoms(user_message)
-    new_symptom_added = False
-    if canonicals:
-        for s in canonicals:
-            if s not in session_canonicals:
-                session_canonicals.append(s)
-                new_symptom_added = True
-        session.canonicals = json.dumps(session_canonicals)
-        db.commit()
-
-    # Only generate follow-ups if a new symptom was added
-    if new_symptom_added:
-        # Use the most recently added canonical symptom for follow-ups
-        main_canonical = canonicals[-1] if canonicals else session_canonicals[-1]
-        if main_canonical in FOLLOWUP_TEMPLATES:
-            session_followups = FOLLOWUP_TEMPLATES[main_canonical][:]
-        else:
-            session_followups = [
-                f"How long have you had your {main_canonical}?",
-                f"On a scale of 1-10, how severe is your {main_canonical}?"
-            ]
-        session.followups = json.dumps(session_followups)
-        db.commit()
-        # Ask the first follow-up
-        next_q = session_followups.pop(0)
-        session_answers['current_followup'] = next_q
-        session.followups = json.dumps(session_followups)
-        session.answers = json.dumps(session_answers)
-        db.commit()
-        response_text = next_q + "\n\n" + DISCLAIMER
-        conv = Conversation(user_id=user_id, messages=f"USER: {user_message}\nBOT: {response_text}")
-        db.add(conv)
-        db.commit()
-        return {
-            "response": response_text,
-            "disclaimer": DISCLAIMER
-        }
-
-    # If no follow-ups and no new symptoms, proceed to diagnosis and summary
-    print('DEBUG: session_canonicals:', session_canonicals)
-    print('DEBUG: session_answers:', session_answers)
-    analysis = analyzer.analyze(session_canonicals) if session_canonicals else []
-    print('DEBUG: analysis:', analysis)
-    # Remedy suggestion (for top condition)
-    remedy_text = None
-    safety_notes = None
-    if analysis:
-        top_condition = db.query(Condition).filter(Condition.name == analysis[0]["condition"]).first()
-        if top_condition:
-            remedy = db.query(Remedy).filter(Remedy.condition_id == top_condition.id).first()
-            if remedy:
-                remedy_text = remedy.remedy_text
-                safety_notes = remedy.safety_notes
-    # Compose personalized summary
-    summary_lines = []
-    if session_canonicals:
-        summary_lines.append(f"You reported: {', '.join(session_canonicals)}.")
-    # Add follow-up answers to summary
-    duration = None
-    severity = None
-    for q, a in session_answers.items():
-        if "how long" in q.lower():
-            duration = a
-            summary_lines.append(f"Duration: {a}.")
-        if "severe" in q.lower():
-            severity = a
-            summary_lines.append(f"Severity: {a}/10.")
-    # Add warnings if needed
-    warning = ""
+    TURNS.inc("http")
+    start = time.perf_counter()
+    with profiler.track("chat"), span("turn"):
+        # The phrase pass doubles as the emergency pre-check for admission and
+        # is reused for extraction
+        with span("scan"):
+            scan = analyzer.scan(request.message)
+        address = http_request.client.host if http_request.client else None
+        # Without a user_id, turns are rate limited per client address only
+        key = request.user_id or address or user_id
+        event = {}
+        try:
+            admission.check_rate(key, priority=scan[2], address=address)
+            # A user's overlapping turns wait on their lock without holding a slot
+            async with _user_lock(user_id), admission.slot(priority=scan[2]):
+                try:
+                    result = await _chat_turn(request.message, user_id, scan, event)
+                except BaseException:
+                    # The cached state may hold changes that never reached the database
+                    session_store.forget(user_id)
+                    raise
+        except Rejected as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers())
+        await _record_turn(user_id, event, scan, start)
+        return result
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchRequest, http_request: Request):
+    """
+    Triage many messages or whole sessions offline and stream NDJSON results.
+    Sessions are replayed in memory only; see models/batch_triage.py.
+
+    A request carries at most MEDBOT_MAX_BATCH_TURNS turns (413 beyond that).
+    It is admitted like a chat turn, rate limited per client address, and
+    holds one slot until its results are streamed.
+    """
+    for i, item in enumerate(request.items):
+        if item.message is None and item.messages is None:
+            raise HTTPException(status_code=422, detail=f"items[{i}] needs 'message' or 'messages'")
+    records = [item.model_dump(exclude_none=True) for item in request.items]
+    turns = count_turns(records)
+    if turns > MAX_REQUEST_TURNS:
+        raise HTTPException(status_code=413, detail=f"{turns} turns in one batch; the limit is {MAX_REQUEST_TURNS}")
+    address = http_request.client.host if http_request.client else None
+
+    async def lines():
+        async with admission.slot():
+            # Hand back once admitted, before anything is streamed
+            yield None
+            async for result in triage(analyzer, records):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    body = lines()
     try:
-        if severity and int(severity) >= 8:
-            warning = "Your symptoms are quite severe. Please consider seeking medical attention promptly."
-        if duration and any(word in duration.lower() for word in ["week", "10 days", "long", "persistent"]):
-            warning = "Your symptoms have lasted a long time. Please consult a healthcare provider."
-    except Exception:
-        pass
-    if warning:
-        summary_lines.append(f"⚠️ {warning}")
-    # Add condition/remedy
-    if is_emergency:
-        summary_lines.append("⚠️ EMERGENCY: Your symptoms may indicate a serious condition. Please seek immediate medical attention or call your local emergency number.")
-    elif intent == "remedy_request" and remedy_text:
-        summary_lines.append(f"Possible condition: {analysis[0]['condition']}")
-        summary_lines.append(f"Home remedy: {remedy_text}")
-        summary_lines.append(f"Safety notes: {safety_notes}")
-    elif analysis:
-        summary_lines.append(f"Possible condition: {analysis[0]['condition']}")
-        if remedy_text:
-            summary_lines.append(f"Home remedy: {remedy_text}")
-            summary_lines.append(f"Safety notes: {safety_notes}")
-    else:
-        summary_lines.append("I'm sorry, I couldn't identify your symptoms. Please provide more details.")
-    summary_lines.append("")
-    summary_lines.append(DISCLAIMER)
-    response_text = "\n".join(summary_lines)
-    # Log conversation
-    conv = Conversation(user_id=user_id, messages=f"USER: {user_message}\nBOT: {response_text}")
-    db.add(conv)
-    db.commit()
+        admission.check_rate(None, address=address)
+        await body.__anext__()
+    except Rejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers())
+    return StreamingResponse(body, media_type="application/x-ndjson")
+
+# Remedies come from the knowledge base snapshot, like condition scoring
+async def _remedy_for(condition_name):
+    return analyzer.knowledge_base.remedy_for(condition_name)
+
+# Each turn's session changes are written once on the way out, so a turn
+# costs one store write; the conversation record is queued for the
+# background log writer.
+async def _chat_turn(user_message, user_id, scan=None, event=None):
+    with span("session_load"):
+        session = await session_store.load(user_id)
+    logger.debug("user_id=%s answers=%s dialogue=%s", user_id, session.answers, session.dialogue)
+
+    response_text, logged = await run_turn(analyzer, session, user_message, _remedy_for, scan, event)
+    # Save session and log conversation
+    with span("session_save"):
+        await session_store.save(session)
+    if logged:
+        with span("conversation_log"):
+            await conversation_log.append_async(user_id, "chat", user_message, response_text)
     return {
         "response": response_text,
         "disclaimer": DISCLAIMER
     }
 
+# Every answered turn (resets included) also gets a structured event for the
+# /stats rollups; latency runs from the start of the request, queueing included.
+async def _record_turn(user_id, event, scan, start):
+    event["emergency"] = scan[2]
+    event["latency_ms"] = (time.perf_counter() - start) * 1e3
+    with span("turn_event"):
+        await conversation_log.record_turn_async(user_id, event)
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, user_id: str = None):
+    """
+    Persistent chat channel bound to one user_id.
+
+    The session is loaded once per connection, kept in memory between
+    messages and written back when the connection closes. The client sends
+    {"message": "..."} frames. For each message the server sends
+    {"type": "emergency", "text": ...} first if the message mentions an
+    emergency symptom, then {"type": "line", "text": ...} for each line of the
+    reply, then {"type": "done", "disclaimer": ...}. A message turned away by
+    admission control gets {"type": "error", "detail": ..., "retry_after": ...}
+    instead of a reply.
+    """
+    user_id = user_id or "anonymous"
+    address = websocket.client.host if websocket.client else None
+    await websocket.accept()
+    async with _user_lock(user_id):
+        with span("session_load"):
+            session = await session_store.load(user_id)
+
+    try:
+        while True:
+            try:
+                user_message = json.loads(await websocket.receive_text())["message"]
+                if not isinstance(user_message, str):
+                    raise TypeError
+            except (ValueError, KeyError, TypeError):
+                await websocket.send_json({"type": "error", "detail": 'expected {"message": "..."}'})
+                continue
+            TURNS.inc("websocket")
+            start = time.perf_counter()
+            with profiler.track("ws_chat"), span("turn"):
+                # One matcher pass gives the emergency flag now and is reused for extraction
+                with span("scan"):
+                    scan = analyzer.scan(user_message)
+                if scan[2]:
+                    await websocket.send_json({"type": "emergency", "text": EMERGENCY_NOTICE})
+                event = {}
+                try:
+                    admission.check_rate(user_id, priority=scan[2], address=address)
+                    async with _user_lock(user_id), admission.slot(priority=scan[2]):
+                        session = await session_store.resume(session)
+                        try:
+                            response_text, logged = await run_turn(analyzer, session, user_message, _remedy_for,
+                                                                   scan, event)
+                            with span("session_save"):
+                                await session_store.defer(session)
+                        except BaseException:
+                            # The turn changed the state in place without recording it
+                            session_store.forget(user_id)
+                            raise
+                except Rejected as e:
+                    await websocket.send_json({"type": "error", "detail": e.detail, "retry_after": e.retry_after})
+                    continue
+                for line in response_text.split("\n"):
+                    await websocket.send_json({"type": "line", "text": line})
+                await websocket.send_json({"type": "done", "disclaimer": DISCLAIMER})
+                if logged:
+                    with span("conversation_log"):
+                        await conversation_log.append_async(user_id, "chat", user_message, response_text)
+                await _record_turn(user_id, event, scan, start)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Turns recorded before an error are still written back, in a task of
+        # its own so it isn't cancelled along with the connection
+        task = asyncio.create_task(_write_back(user_id))
+        _write_backs.add(task)
+        task.add_done_callback(_write_backs.discard)
+
+_write_backs = set()
+
+async def _write_back(user_id):
+    async with _user_lock(user_id):
+        await session_store.write_back(user_id)
+
+# Reference data is served from reference_cache with an ETag; clients that
+# send it back in If-None-Match get an empty 304.
+def _reference_response(request, body, etag):
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        reference_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def _load_conditions():
+    db = SessionLocal()
+    try:
+        conditions = db.query(Condition).all()
+        return [{"id": c.id, "name": c.name, "description": c.description, "severity_level": c.severity_level} for c in conditions]
+    finally:
+        db.close()
+
+def _load_remedies(condition_id):
+    db = SessionLocal()
+    try:
+        remedies = db.query(Remedy).filter(Remedy.condition_id == condition_id).all()
+        return [{"id": r.id, "remedy_text": r.remedy_text, "safety_notes": r.safety_notes} for r in remedies]
+    finally:
+        db.close()
+
 @app.get("/conditions")
-def get_conditions(db: Session = Depends(get_db)):
-    conditions = db.query(Condition).all()
-    return [{"id": c.id, "name": c.name, "description": c.description, "severity_level": c.severity_level} for c in conditions]
+async def get_conditions(request: Request):
+    body, etag = await reference_cache.get("conditions", _load_conditions)
+    return _reference_response(request, body, etag)
 
 @app.get("/remedies/{condition_id}")
-def get_remedies(condition_id: int, db: Session = Depends(get_db)):
-    remedies = db.query(Remedy).filter(Remedy.condition_id == condition_id).all()
-    return [{"id": r.id, "remedy_text": r.remedy_text, "safety_notes": r.safety_notes} for r in remedies]
+async def get_remedies(condition_id: int, request: Request):
+    body, etag = await reference_cache.get(("remedies", condition_id), lambda: _load_remedies(condition_id))
+    return _reference_response(request, body, etag)
 
 class FeedbackRequest(BaseModel):
     message: str
     user_id: str = None
 
 @app.post("/feedback")
-def submit_feedback(request: FeedbackRequest, db: Session = Depends(get_db)):
-    conv = Conversation(user_id=request.user_id or "feedback", messages=f"FEEDBACK: {request.message}")
-    db.add(conv)
-    db.commit()
-    return {"status": "success"} 
\ No newline at end of file
+async def submit_feedback(request: FeedbackRequest):
+    await conversation_log.append_async(request.user_id or "feedback", "feedback", request.message)
+    return {"status": "success"}
+
+@app.get("/conversations/{user_id}")
+async def get_conversation_history(user_id: str, limit: int = 100):
+    """
+    Return a user's most recent chat turns and feedback, oldest first.
+    """
+    return await asyncio.to_thread(conversation_log.history, user_id, limit)
+
+# Aggregates over chat turns, read from the daily rollups kept by
+# database/analytics.py; the cost depends on the window, not the history.
+@app.get("/stats/daily")
+async def get_daily_stats(days: int = Query(7, ge=1, le=MAX_DAYS)):
+    """
+    Turns, emergency-flag rate, share of turns with symptoms and latency per
+    UTC day over the last `days` days.
+    """
+    return await asyncio.to_thread(conversation_log.daily_stats, days)
+
+@app.get("/stats/top/{dimension}")
+async def get_top_stats(dimension: str, days: int = Query(7, ge=1, le=MAX_DAYS), limit: int = Query(10, ge=1, le=1000)):
+    """
+    Most frequent symptoms, intents, top conditions or dialogue stages over
+    the last `days` days.
+    """
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"dimension must be one of {', '.join(DIMENSIONS)}")
+    return await asyncio.to_thread(conversation_log.top_stats, dimension, days, limit) 
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Measure /chat under overload with and without admission control
+(utils/admission.py).
+
+Drives the app in-process (httpx ASGI client, scratch copy of medbot.db) with
+more concurrent users than the concurrency cap, each running conversations
+back to back and backing off for Retry-After when turned away, plus one user
+sending an emergency message every so often. Reports turns served per second,
+p50/p99 latency of served turns, how many were shed, and the latency of the
+emergency turns. "off" lifts the cap and the queue bound; neither run uses the
+per-user rate limit, since every simulated user is well behaved.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_admission.py --users 256 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from bench_chat_turns import CONVERSATION, REPO_DIR
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def flood(app, users, seconds, backoff):
+    import httpx
+
+    from config.medical_config import EMERGENCY_SYMPTOMS
+
+    latencies, emergencies = [], []
+    shed = {429: 0, 503: 0}
+    deadline = time.perf_counter() + seconds
+
+    async def post(client, user_id, message, record):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            resp = await client.post("/chat", json={"message": message, "user_id": user_id})
+            if resp.status_code == 200:
+                record.append(time.perf_counter() - start)
+                return
+            if resp.status_code not in shed:
+                raise RuntimeError(f"/chat returned {resp.status_code}")
+            shed[resp.status_code] += 1
+            await asyncio.sleep(min(float(resp.headers["Retry-After"]), backoff))
+
+    async def user(client, index):
+        while time.perf_counter() < deadline:
+            for message in CONVERSATION:
+                await post(client, f"flood-{index}", message, latencies)
+
+    async def emergency_user(client):
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.2)
+            await post(client, "emergency", f"I think I have {EMERGENCY_SYMPTOMS[0]}", emergencies)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(emergency_user(client), *(user(client, i) for i in range(users)))
+        elapsed = time.perf_counter() - start
+    return {
+        "turns_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "shed": shed[429] + shed[503],
+        "emergency_p50_ms": statistics.median(emergencies) * 1e3 if emergencies else float("nan"),
+        "emergency_max_ms": max(emergencies) * 1e3 if emergencies else float("nan"),
+    }
+
+
+async def run(app_module, users, seconds, backoff):
+    from utils.admission import AdmissionController
+
+    results = {}
+    async with app_module.app.router.lifespan_context(app_module.app):
+        for mode in ["off", "on"]:
+            if mode == "off":
+                app_module.admission = AdmissionController(max_concurrent=10 ** 9, max_queued=10 ** 9,
+                                                           max_priority_queued=10 ** 9)
+            else:
+                app_module.admission = AdmissionController()
+            results[mode] = await flood(app_module.app, users, seconds, backoff)
+            results[mode]["stats"] = app_module.admission.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=256)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--backoff", type=float, default=1.0,
+                        help="longest a turned-away user waits before retrying")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="medbot-bench-")
+    shutil.copy(os.path.join(REPO_DIR, "medbot.db"), workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    # Only the concurrency cap and queue are under test
+    os.environ["MEDBOT_RATE_LIMIT_PER_SECOND"] = "0"
+    os.environ["MEDBOT_PRIORITY_RATE_LIMIT_PER_SECOND"] = "0"
+    os.environ["MEDBOT_ADDRESS_RATE_LIMIT_PER_SECOND"] = "0"
+    try:
+        import app as app_module
+
+        results = asyncio.run(run(app_module, args.users, args.seconds, args.backoff))
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'admission':>9} {'turns/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'shed':>6} "
+          f"{'emerg p50 ms':>13} {'emerg max ms':>13}")
+    for mode, r in results.items():
+        print(f"{mode:>9} {r['turns_per_s']:>8.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['shed']:>6} "
+              f"{r['emergency_p50_ms']:>13.1f} {r['emergency_max_ms']:>13.1f}")
+    stats = results["on"]["stats"]
+    print(f"with admission: {stats['queued']} turns queued (mean wait {stats['mean_queue_wait_ms']} ms), "
+          f"{stats['shed_queue_full']} shed on a full queue, {stats['shed_timeout']} after waiting too long")
+
+
+if __name__ == "__main__":
+    main()
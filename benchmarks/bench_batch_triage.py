@@ -0,0 +1,92 @@
+"""
+Check that batch triage matches /chat, then measure batch throughput.
+
+A sample of synthetic sessions is replayed through /chat (in-process, on a
+scratch copy of medbot.db) and through models.batch_triage; the responses must
+be identical. The full corpus is then triaged and turns per second reported.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_batch_triage.py --sessions 2000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bench_chat_turns import APP_ENV, REPO_DIR
+
+FILLER = "i have been feeling odd since yesterday and it is not better today please help".split()
+ANSWERS = ["yes", "no", "2 days", "a week", "3", "8", "since monday", "not really"]
+CLOSERS = ["what remedy can I use?", "ok thanks", "reset"]
+
+
+def make_sessions(phrases, count, rng):
+    sessions = []
+    for i in range(count):
+        opener = rng.sample(FILLER, rng.randint(2, 6)) + [rng.choice(phrases)] + rng.sample(FILLER, rng.randint(0, 4))
+        messages = [" ".join(opener)] + [rng.choice(ANSWERS) for _ in range(3)] + [rng.choice(CLOSERS)]
+        sessions.append({"user_id": f"session-{i}", "messages": messages})
+    return sessions
+
+
+async def collect(analyzer, records):
+    from models.batch_triage import triage
+
+    return [result async for result in triage(analyzer, records)]
+
+
+def check_parity(app_module, sessions):
+    from fastapi.testclient import TestClient
+
+    batch = asyncio.run(collect(app_module.analyzer, sessions))
+    client = TestClient(app_module.app)
+    mismatches = 0
+    i = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for session in sessions:
+            for message in session["messages"]:
+                resp = client.post("/chat", json={"message": message, "user_id": session["user_id"]}).json()
+                if resp["response"] != batch[i]["response"]:
+                    mismatches += 1
+                i += 1
+    return mismatches, i
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--parity-sessions", type=int, default=100)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="medbot-bench-")
+    shutil.copy(os.path.join(REPO_DIR, "medbot.db"), workdir)
+    os.chdir(workdir)
+    # Every parity turn comes from the same test client address
+    os.environ.update(APP_ENV)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import app as app_module
+        rng = random.Random(11)
+        phrases = list(app_module.analyzer.synonym_map)
+        mismatches, turns = check_parity(app_module, make_sessions(phrases, args.parity_sessions, rng))
+        print(f"parity: {mismatches} mismatches over {turns} turns")
+
+        sessions = make_sessions(phrases, args.sessions, rng)
+        start = time.perf_counter()
+        results = asyncio.run(collect(app_module.analyzer, sessions))
+        elapsed = time.perf_counter() - start
+        print(f"batch: {len(results)} turns in {elapsed:.2f}s ({len(results) / elapsed:.0f} turns/s)")
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
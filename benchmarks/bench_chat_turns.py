@@ -0,0 +1,107 @@
+"""
+Measure /chat turns per second with concurrent clients.
+
+Starts uvicorn on a scratch copy of medbot.db and drives multi-turn
+conversations from several client threads. Point --app-dir at another checkout
+to compare revisions, e.g. before and after a change:
+
+    git worktree add /tmp/medbot-before <rev>
+    PYTHONPATH=. python3 benchmarks/bench_chat_turns.py --app-dir /tmp/medbot-before
+    PYTHONPATH=. python3 benchmarks/bench_chat_turns.py
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Benchmark clients send turns back to back, which the per-user rate limit
+# (utils/admission.py) would turn away; the concurrency cap stays on
+APP_ENV = {"MEDBOT_RATE_LIMIT_PER_SECOND": "0", "MEDBOT_PRIORITY_RATE_LIMIT_PER_SECOND": "0",
+           "MEDBOT_ADDRESS_RATE_LIMIT_PER_SECOND": "0"}
+
+CONVERSATION = [
+    "I have a headache and feel dizzy",
+    "2 days",
+    "6",
+    "no",
+    "what remedy can I use?",
+    "reset",
+]
+
+
+def start_server(app_dir, port):
+    workdir = tempfile.mkdtemp(prefix="medbot-bench-")
+    shutil.copy(os.path.join(app_dir, "medbot.db"), workdir)
+    env = dict(os.environ, PYTHONPATH=app_dir, **APP_ENV)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc, workdir
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def client(port, user_id, deadline, counts):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    turns = 0
+    while time.time() < deadline:
+        for message in CONVERSATION:
+            body = json.dumps({"message": message, "user_id": user_id})
+            conn.request("POST", "/chat", body, {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status != 200:
+                raise RuntimeError(f"/chat returned {resp.status}")
+            turns += 1
+    counts.append(turns)
+
+
+def run(port, clients, seconds):
+    counts = []
+    deadline = time.time() + seconds
+    threads = [threading.Thread(target=client, args=(port, f"bench-{i}", deadline, counts)) for i in range(clients)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-dir", default=REPO_DIR)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    proc, workdir = start_server(os.path.abspath(args.app_dir), args.port)
+    try:
+        print(f"{'clients':>8} {'turns/s':>10}")
+        for n in args.clients:
+            print(f"{n:>8} {run(args.port, n, args.seconds):>10.1f}")
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Check vectorized condition scoring against the per-condition loop and time both.
+
+Synthetic knowledge bases are built from the analyzer's symptoms; descriptions
+mention a few random symptoms among filler text. SymptomAnalyzer.analyze (full
+ranking and top_k=1) must return exactly what the old loop over every condition
+returns, and the script exits non-zero on any mismatch.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_condition_scoring.py --sizes 1000 10000 50000
+"""
+import argparse
+import random
+import sys
+import timeit
+
+from models.symptom_analyzer import SymptomAnalyzer
+
+FILLER = "a common condition often with mild or severe symptoms that may last several days".split()
+
+
+def reference_analyze(analyzer, symptoms):
+    # The scoring loop analyze() used before the incidence matrix
+    results = []
+    for cond in analyzer.knowledge_base.conditions:
+        score = 0
+        for symptom in symptoms:
+            canonical = analyzer.synonym_map.get(symptom, symptom)
+            if canonical in cond["description"]:
+                score += 1
+        if score > 0:
+            results.append({"condition": cond["name"], "confidence": round(score / len(symptoms), 2)})
+    results.sort(key=lambda x: x["confidence"], reverse=True)
+    return results
+
+
+def make_conditions(symptoms, count, rng):
+    conditions = []
+    for i in range(count):
+        words = rng.sample(FILLER, 6) + rng.sample(symptoms, rng.randint(1, 5))
+        rng.shuffle(words)
+        conditions.append({"id": i + 1, "name": f"Condition {i % (count // 2 or 1)}",
+                           "description": " ".join(words).lower(), "severity_level": "mild"})
+    return conditions
+
+
+def make_queries(analyzer, count, rng):
+    terms = analyzer.known_symptoms + list(analyzer.synonym_map)
+    queries = [rng.sample(terms, rng.randint(1, 6)) for _ in range(count)]
+    # Repeated symptoms, and sets large enough for different scores to round alike
+    queries += [[rng.choice(terms)] * 2 + rng.sample(terms, 2) for _ in range(count // 10)]
+    queries += [[rng.choice(terms) for _ in range(rng.randint(150, 300))] for _ in range(5)]
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    analyzer = SymptomAnalyzer()
+    kb = analyzer.knowledge_base
+    mismatches = 0
+    print(f"{'conditions':>10} {'loop ms/query':>14} {'matrix ms/query':>16} {'top-1 ms/query':>15}")
+    for size in args.sizes:
+        kb.set_snapshot(make_conditions(analyzer.known_symptoms, size, rng), {}, analyzer.known_symptoms)
+        queries = make_queries(analyzer, args.queries, rng)
+        for query in queries:
+            expected = reference_analyze(analyzer, query)
+            if analyzer.analyze(query) != expected or analyzer.analyze(query, top_k=1) != expected[:1]:
+                mismatches += 1
+                print(f"MISMATCH size={size} query={query[:5]!r}")
+        old = timeit.timeit(lambda: [reference_analyze(analyzer, q) for q in queries], number=1)
+        new = min(timeit.repeat(lambda: [analyzer.analyze(q) for q in queries], number=1, repeat=3))
+        top = min(timeit.repeat(lambda: [analyzer.analyze(q, top_k=1) for q in queries], number=1, repeat=3))
+        per_query = 1e3 / len(queries)
+        print(f"{size:>10} {old * per_query:>14.2f} {new * per_query:>16.2f} {top * per_query:>15.2f}")
+    print(f"parity: {mismatches} mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
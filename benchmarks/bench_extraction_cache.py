@@ -0,0 +1,90 @@
+"""
+Measure the extraction cache (utils/extraction_cache.py) on chat-like traffic.
+
+Replays a seeded mix of messages through SymptomAnalyzer.extract with the
+cache on and off: --repeat-share of the messages are short replies people send
+over and over ("yes", "3 days", "headache", "7"), drawn with a skewed
+distribution and varied in case, spacing and trailing punctuation; the rest
+are fresh corpus messages. Reports us/message both ways, overall and for the
+repeated replies alone, the hit rate and the cache's own estimate of the time
+saved, and checks both runs give the same results.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_extraction_cache.py --messages 20000 --repeat-share 0.3 0.6
+"""
+import argparse
+import random
+import time
+
+import corpus
+
+REPLIES = (corpus.ANSWERS + corpus.DURATIONS + corpus.SEVERITIES + corpus.CLOSERS
+           + ["headache", "i feel tired", "fever", "sore throat", "ok", "7/10", "hi"])
+
+
+def vary(rng, reply):
+    # The same reply as different people type it
+    reply = rng.choice([reply, reply.capitalize(), reply.upper(), " " + reply + " "])
+    return reply + rng.choice(["", "", ".", "!", "  "])
+
+
+def traffic(analyzer, count, repeat_share, seed=0):
+    rng = random.Random(seed)
+    fresh = iter(corpus.messages(analyzer, count, 8, 0.3, seed=seed))
+    # Zipf-like: the first replies are by far the most common
+    weights = [1 / (rank + 1) for rank in range(len(REPLIES))]
+    # (message, is a repeated reply)
+    return [(vary(rng, rng.choices(REPLIES, weights)[0]), True) if rng.random() < repeat_share
+            else (next(fresh), False) for _ in range(count)]
+
+
+def replay(analyzer, messages):
+    """
+    Returns (us/message, us/message over the repeated replies, results).
+    """
+    results = []
+    total = repeated = 0.0
+    for text, is_repeat in messages:
+        start = time.perf_counter()
+        results.append(analyzer.extract(text))
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        if is_repeat:
+            repeated += elapsed
+    repeats = sum(is_repeat for _, is_repeat in messages)
+    return total / len(messages) * 1e6, repeated / repeats * 1e6 if repeats else 0.0, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--repeat-share", type=float, nargs="+", default=[0.3, 0.6],
+                        help="share of messages that are repeated short replies")
+    args = parser.parse_args()
+
+    from models.symptom_analyzer import SymptomAnalyzer
+    from utils.extraction_cache import ExtractionCache
+
+    analyzer = SymptomAnalyzer(artifact_path=None)
+    print(f"{'repeats':>8} {'uncached us':>12} {'cached us':>10} {'replies uncached':>17} {'replies cached':>15} "
+          f"{'hit rate':>9} {'saved s':>8} {'entries':>8}")
+    for share in args.repeat_share:
+        messages = traffic(analyzer, args.messages, share)
+        # Start each run from an empty fuzzy memo so only the cache differs
+        analyzer.extraction_cache = ExtractionCache(max_size=0)
+        analyzer.fuzzy_index._memo.clear()
+        uncached_us, uncached_replies_us, expected = replay(analyzer, messages)
+        analyzer.extraction_cache = cache = ExtractionCache()
+        analyzer.fuzzy_index._memo.clear()
+        cached_us, cached_replies_us, results = replay(analyzer, messages)
+        for (symptoms, intent, emergency), (want, want_intent, want_emergency) in zip(results, expected):
+            if (sorted(symptoms), intent, emergency) != (sorted(want), want_intent, want_emergency):
+                raise RuntimeError("cached and uncached extraction disagree")
+        stats = cache.stats()
+        print(f"{share:>8.0%} {uncached_us:>12.1f} {cached_us:>10.1f} {uncached_replies_us:>17.1f} "
+              f"{cached_replies_us:>15.1f} {stats['hit_rate']:>9.1%} "
+              f"{stats['saved_seconds']:>8.2f} {stats['size']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Check FuzzyIndex against difflib.get_close_matches and time both.
+
+The parity check runs first over words, bigrams and trigrams from synthetic
+messages (with typos) at both cutoffs used by extract_and_classify, and the
+script exits non-zero on any mismatch. Lookups are then timed on today's
+vocabulary and on one 100x larger.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_fuzzy_index.py
+"""
+import difflib
+import random
+import sys
+import timeit
+
+from models.symptom_analyzer import SymptomAnalyzer
+from utils.fuzzy_index import FuzzyIndex
+
+CUTOFFS = [0.7, 0.65]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def typo(word, rng):
+    if len(word) < 3:
+        return word
+    i = rng.randrange(len(word))
+    edit = rng.choice(["drop", "swap", "replace", "insert"])
+    if edit == "drop":
+        return word[:i] + word[i + 1:]
+    if edit == "swap" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == "insert":
+        return word[:i] + rng.choice(LETTERS) + word[i:]
+    return word[:i] + rng.choice(LETTERS) + word[i + 1:]
+
+
+def make_queries(analyzer, rng, count):
+    words = [w for phrase in analyzer.synonym_map for w in phrase.split()]
+    words += [w for s in analyzer.known_symptoms for w in s.split()]
+    queries = []
+    while len(queries) < count:
+        message = [typo(rng.choice(words), rng) if rng.random() < 0.3 else rng.choice(words)
+                   for _ in range(rng.randint(3, 12))]
+        for n in [1, 2, 3]:
+            for i in range(len(message) - n + 1):
+                queries.append(" ".join(message[i:i + n]))
+    return queries[:count]
+
+
+def grow_vocabulary(symptoms, factor, rng):
+    vocab = set(symptoms)
+    while len(vocab) < len(symptoms) * factor:
+        base = rng.choice(symptoms)
+        vocab.add(" ".join(typo(w, rng) for w in base.split()) + rng.choice(["", " " + rng.choice(symptoms)]))
+    return sorted(vocab)
+
+
+def check_parity(vocab, queries):
+    index = FuzzyIndex(vocab)
+    mismatches = 0
+    for cutoff in CUTOFFS:
+        for query in queries:
+            expected = difflib.get_close_matches(query, vocab, n=1, cutoff=cutoff)
+            expected = expected[0] if expected else None
+            if index.best_match(query, cutoff) != expected:
+                mismatches += 1
+                print(f"MISMATCH cutoff={cutoff} query={query!r} expected={expected!r}")
+    return mismatches
+
+
+def time_lookups(vocab, queries):
+    queries = list(dict.fromkeys(queries))
+    index = FuzzyIndex(vocab)
+    old = timeit.timeit(lambda: [difflib.get_close_matches(q, vocab, n=1, cutoff=0.65) for q in queries], number=1)
+
+    def lookups():
+        # Time cold lookups, not the per-query memo
+        index._memo.clear()
+        return [index.best_match(q, 0.65) for q in queries]
+
+    new = min(timeit.repeat(lookups, number=1, repeat=3))
+    return old / len(queries) * 1e6, new / len(queries) * 1e6
+
+
+def main():
+    rng = random.Random(7)
+    analyzer = SymptomAnalyzer()
+    symptoms = sorted(analyzer.known_symptoms)
+    queries = make_queries(analyzer, rng, 2000)
+    large = grow_vocabulary(symptoms, 100, rng)
+
+    mismatches = check_parity(symptoms, queries) + check_parity(large, queries[:500])
+    print(f"parity: {mismatches} mismatches")
+
+    print(f"{'vocabulary':>10} {'difflib us/lookup':>18} {'index us/lookup':>16}")
+    for vocab in [symptoms, large]:
+        old, new = time_lookups(vocab, queries[:500])
+        print(f"{len(vocab):>10} {old:>18.1f} {new:>16.1f}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Measure bulk knowledge-base ingestion (database/ingest.py).
+
+Writes synthetic conditions, remedies, symptoms and synonyms files of the given
+size and loads them into a scratch copy of medbot.db, reporting rows/s for a
+fresh load and for a reload of the same files (every row unchanged). For
+comparison it times the row-at-a-time pattern of populate_symptoms.py (a
+SELECT ... first() per row) on a slice of the symptoms. Finally it loads a
+small follow-up delta (1% of the conditions reworded, as many new synonyms),
+applies it to an analyzer in place and times that against rebuilding the
+matcher and reloading the knowledge base.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_ingest.py --rows 10000 50000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from bench_chat_turns import REPO_DIR
+
+WORDS = ("pain ache swelling itching burning numbness stiffness pressure tingling weakness "
+         "left right upper lower chronic sudden mild sharp dull").split()
+PARTS = "head neck chest back arm leg knee hip hand foot stomach skin eye ear".split()
+
+
+def write_files(workdir, rows, seed=0):
+    rng = random.Random(seed)
+    symptoms = sorted({f"{rng.choice(WORDS)} {rng.choice(PARTS)} {i}" for i in range(max(rows // 10, 1))})
+    paths = {kind: os.path.join(workdir, f"{kind}.{'jsonl' if kind == 'synonyms' else 'csv'}")
+             for kind in ["conditions", "remedies", "symptoms", "synonyms"]}
+    with open(paths["conditions"], "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "description", "severity_level"])
+        for i in range(rows):
+            mentioned = ", ".join(rng.sample(symptoms, min(3, len(symptoms))))
+            writer.writerow([f"Condition {i}", f"Causes {mentioned}.", rng.choice(["mild", "moderate", "severe"])])
+    with open(paths["remedies"], "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["condition", "remedy_text", "safety_notes"])
+        for i in range(rows):
+            writer.writerow([f"Condition {i}", f"Rest and fluids ({i}).", "See a doctor if it persists."])
+    with open(paths["symptoms"], "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "body_part", "severity_indicators"])
+        for name in symptoms:
+            writer.writerow([name, name.split()[1], "mild, severe"])
+    with open(paths["synonyms"], "w") as f:
+        for i in range(rows):
+            phrase = f"my {rng.choice(PARTS)} has {rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+            f.write(json.dumps({"phrase": phrase, "symptom": rng.choice(symptoms)}) + "\n")
+    return paths, symptoms
+
+
+def write_delta(workdir, rows, symptoms, seed=1):
+    # A follow-up load against the full one: 1% of the conditions reworded
+    # and as many new synonyms
+    rng = random.Random(seed)
+    changed = max(rows // 100, 1)
+    paths = {"conditions": os.path.join(workdir, "delta-conditions.csv"),
+             "synonyms": os.path.join(workdir, "delta-synonyms.jsonl")}
+    with open(paths["conditions"], "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "description"])
+        for i in rng.sample(range(rows), changed):
+            writer.writerow([f"Condition {i}", f"Now causes {rng.choice(symptoms)} as well."])
+    with open(paths["synonyms"], "w") as f:
+        for i in range(changed):
+            f.write(json.dumps({"phrase": f"new phrase {i}", "symptom": rng.choice(symptoms)}) + "\n")
+    return list(paths.items())
+
+
+def row_at_a_time(symptoms):
+    # The populate_symptoms.py pattern: an existence query and an add per row
+    from database.db import SessionLocal
+    from database.models import Symptom
+
+    db = SessionLocal()
+    start = time.perf_counter()
+    for name in symptoms:
+        if not db.query(Symptom).filter(Symptom.name == name).first():
+            db.add(Symptom(name=name, body_part="general", severity_indicators="mild"))
+    db.commit()
+    elapsed = time.perf_counter() - start
+    db.close()
+    return len(symptoms) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000],
+                        help="conditions, remedies and synonyms per run (symptoms are a tenth)")
+    parser.add_argument("--compare-rows", type=int, default=2000,
+                        help="rows for the row-at-a-time comparison")
+    args = parser.parse_args()
+
+    # SQLAlchemy resolves ./medbot.db when the engine is created, so move to
+    # the scratch directory before importing anything that opens it
+    workdir = tempfile.mkdtemp(prefix="medbot-bench-")
+    os.chdir(workdir)
+    from database.db import engine
+    from database.ingest import ingest
+    from database.knowledge_base import read_lexicon
+    from models.symptom_analyzer import SymptomAnalyzer
+
+    print(f"{'rows':>7} {'fresh rows/s':>13} {'reload rows/s':>14} {'per-row rows/s':>15} "
+          f"{'delta apply ms':>15} {'rebuild ms':>11}")
+    try:
+        for rows in args.rows:
+            # A fresh copy of the database for every size
+            engine.dispose()
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            shutil.copy(os.path.join(REPO_DIR, "medbot.db"), workdir)
+            paths, symptoms = write_files(workdir, rows)
+            fresh = ingest(list(paths.items()))
+            reload = ingest(list(paths.items()))
+
+            # Both analyzers start from the full load; only the delta differs
+            in_place = SymptomAnalyzer(artifact_path=None)
+            rebuilt = SymptomAnalyzer(artifact_path=None)
+            delta = ingest(write_delta(workdir, rows, symptoms))
+            start = time.perf_counter()
+            in_place.apply_ingest(delta.changes)
+            apply_ms = (time.perf_counter() - start) * 1e3
+            start = time.perf_counter()
+            added, _ = read_lexicon(rebuilt.lexicon_revision)
+            rebuilt.update_synonyms({phrase: canonical for _, phrase, canonical in added})
+            rebuilt.knowledge_base.load(vocabulary=rebuilt.known_symptoms)
+            rebuild_ms = (time.perf_counter() - start) * 1e3
+            probe = "new phrase 0 and " + symptoms[0]
+            if (sorted(in_place.extract(probe)[0]) != sorted(rebuilt.extract(probe)[0])
+                    or in_place.analyze(symptoms[:3]) != rebuilt.analyze(symptoms[:3])):
+                raise RuntimeError("in-place and rebuilt analyzers disagree")
+
+            per_row = row_at_a_time([f"extra symptom {i}" for i in range(args.compare_rows)])
+            print(f"{rows:>7} {fresh.rows_per_second:>13,.0f} {reload.rows_per_second:>14,.0f} "
+                  f"{per_row:>15,.0f} {apply_ms:>15.1f} {rebuild_ms:>11.1f}")
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Measure how per-message extraction cost scales with the size of the lexicon.
+
+Grows the analyzer's synonym table with synthetic phrases (one new canonical
+symptom per --phrases-per-symptom phrases) and times SymptomAnalyzer.scan and
+SymptomAnalyzer.extract on the same seeded messages at each size. Messages
+come from the seed vocabulary, so the work per message stays the same and only
+the lexicon grows. Each repeat uses fresh messages so the fuzzy memo doesn't
+turn later repeats into cache hits.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_lexicon_scale.py --sizes 0 1000 10000 50000
+"""
+import argparse
+import random
+import time
+
+import corpus
+
+WORDS = ("pain ache swelling itching burning numbness stiffness pressure tingling weakness "
+         "left right upper lower chronic sudden mild sharp dull").split()
+PARTS = "head neck chest back arm leg knee hip hand foot stomach skin eye ear".split()
+
+
+def _name(j):
+    # A distinct made-up word per number, 2 to 4 letters
+    letters = ""
+    while True:
+        letters += "bcdfghjklmnprstvz"[j % 17] + "aeiou"[(j // 17) % 5]
+        j //= 85
+        if not j:
+            return letters
+
+
+def synthetic_lexicon(size, phrases_per_symptom, seed=0):
+    """
+    {phrase: canonical} with canonical names of one to three words, so their
+    lengths spread like real symptom names ("rash" to "shortness of breath").
+    """
+    rng = random.Random(seed)
+    mapping = {}
+    canonical = None
+    for i in range(size):
+        if i % phrases_per_symptom == 0:
+            words = rng.sample(WORDS + PARTS, rng.randint(0, 2))
+            canonical = " ".join(words + [_name(i // phrases_per_symptom)])
+        mapping[f"my {rng.choice(PARTS)} has {rng.choice(WORDS)} {rng.choice(WORDS)} {_name(i)}"] = canonical
+    return mapping
+
+
+def per_call_us(fn, batches):
+    best = float("inf")
+    for batch in batches:
+        start = time.perf_counter()
+        for text in batch:
+            fn(text)
+        best = min(best, (time.perf_counter() - start) / len(batch))
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10000, 50000],
+                        help="synthetic phrases added to the seed lexicon")
+    parser.add_argument("--phrases-per-symptom", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from models.symptom_analyzer import SymptomAnalyzer
+
+    analyzer = SymptomAnalyzer(artifact_path=None)
+    seed_map = dict(analyzer.synonym_map)
+    profiles = {}
+    for profile in ["short_sparse", "long_sparse"]:
+        words, density = corpus.PROFILES[profile]
+        profiles[profile] = [corpus.messages(analyzer, args.messages, words, density, seed=r)
+                             for r in range(args.repeats)]
+
+    print(f"{'phrases':>8} {'symptoms':>9} {'build s':>8}", end="")
+    for profile in profiles:
+        print(f" {'scan ' + profile:>18} {'extract ' + profile:>21}", end="")
+    print("  (us/message)")
+    for size in args.sizes:
+        analyzer.synonym_map = dict(seed_map)
+        start = time.perf_counter()
+        analyzer.update_synonyms(synthetic_lexicon(size, args.phrases_per_symptom))
+        build = time.perf_counter() - start
+        print(f"{len(analyzer.synonym_map):>8} {len(analyzer.known_symptoms):>9} {build:>8.2f}", end="")
+        for batches in profiles.values():
+            print(f" {per_call_us(analyzer.scan, batches):>18.1f} {per_call_us(analyzer.extract, batches):>21.1f}",
+                  end="")
+        print()
+
+
+if __name__ == "__main__":
+    main()
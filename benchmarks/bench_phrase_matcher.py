@@ -0,0 +1,75 @@
+"""
+Benchmark phrase matching: the old per-phrase substring scan versus PhraseMatcher.
+
+Message length and vocabulary size are varied separately so the effect of each
+is visible on its own.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_phrase_matcher.py
+"""
+import random
+import timeit
+
+from models.symptom_analyzer import SymptomAnalyzer
+from utils.phrase_matcher import PhraseMatcher
+
+FILLER = "i have been feeling really odd since yesterday and today it is not better".split()
+
+
+def substring_scan(synonym_map, text):
+    text_lower = text.lower()
+    return {canonical for phrase, canonical in synonym_map.items() if phrase in text_lower}
+
+
+def make_vocabulary(base, size, rng):
+    """
+    Grow the real synonym map with synthetic phrases up to the requested size.
+    """
+    vocab = dict(base)
+    words = sorted({w for phrase in base for w in phrase.split()})
+    while len(vocab) < size:
+        phrase = " ".join(rng.choice(words) for _ in range(rng.randint(2, 4))) + f" x{len(vocab)}"
+        vocab[phrase] = rng.choice(list(base.values()))
+    return vocab
+
+
+def make_message(base, n_words, rng):
+    phrases = list(base)
+    words = []
+    while len(words) < n_words:
+        words.extend(rng.choice(phrases).split() if rng.random() < 0.2 else [rng.choice(FILLER)])
+    return " ".join(words[:n_words])
+
+
+def time_call(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    rng = random.Random(42)
+    base = SymptomAnalyzer().synonym_map
+
+    print("Varying message length (vocabulary = %d phrases)" % len(base))
+    print(f"{'words':>8} {'substring us':>14} {'matcher us':>12}")
+    matcher = PhraseMatcher(base)
+    for n_words in [5, 20, 100, 500]:
+        text = make_message(base, n_words, rng)
+        assert set(matcher.find_all(text)) <= substring_scan(base, text)
+        old = time_call(lambda: substring_scan(base, text), 200)
+        new = time_call(lambda: matcher.find_all(text), 200)
+        print(f"{n_words:>8} {old:>14.1f} {new:>12.1f}")
+
+    print()
+    print("Varying vocabulary size (message = 20 words)")
+    print(f"{'phrases':>8} {'substring us':>14} {'matcher us':>12}")
+    text = make_message(base, 20, rng)
+    for size in [len(base), 1000, 10000, 50000]:
+        vocab = make_vocabulary(base, size, rng)
+        matcher = PhraseMatcher(vocab)
+        old = time_call(lambda: substring_scan(vocab, text), 20)
+        new = time_call(lambda: matcher.find_all(text), 200)
+        print(f"{size:>8} {old:>14.1f} {new:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Measure the optional semantic matching stage (utils/semantic_index.py).
+
+Recall: paraphrases of the seed phrases and symptom names (words reordered,
+filler in between, a word inflected) go through SymptomAnalyzer.extract with
+and without the semantic stage; a paraphrase counts as recalled when its
+symptom is among the results. Symptom-free chat messages (answers, closers,
+filler sentences) measure false positives. The per-message cost of the stage
+is timed on the messages that reach it, i.e. those the other passes found
+nothing in.
+
+Index: the seed lexicon is grown with synthetic two- and three-word phrases
+(made-up words as in bench_lexicon_scale.py) and perturbed phrases are looked up through the LSH
+tables and by scoring every phrase, reporting how often the LSH result agrees
+with the exact one and what each costs.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_semantic_match.py --sizes 10000 50000
+"""
+import argparse
+import random
+import time
+
+import corpus
+from bench_lexicon_scale import PARTS, WORDS, _name
+
+FILLER = ["really", "kind of", "a bit", "so", "very"]
+PADDING = ["i think", "since yesterday", "today", "again", "at night"]
+
+
+def synthetic_phrases(size, seed=0):
+    rng = random.Random(seed)
+    return {" ".join(rng.sample(WORDS + PARTS, rng.randint(1, 2)) + [_name(i)]): f"symptom {i // 10}"
+            for i in range(size)}
+
+
+def inflect(word):
+    if word.endswith("e"):
+        return word[:-1] + "ing"
+    return word + "s"
+
+
+def paraphrase(rng, phrase):
+    words = phrase.split()
+    edit = rng.choice(["reorder", "filler", "inflect"])
+    if edit == "reorder" and len(words) > 1:
+        rng.shuffle(words)
+    elif edit == "filler" and len(words) > 1:
+        words.insert(rng.randrange(1, len(words)), rng.choice(FILLER))
+    else:
+        i = rng.randrange(len(words))
+        words[i] = inflect(words[i])
+    return " ".join([rng.choice(PADDING)] + words if rng.random() < 0.5 else words)
+
+
+def extraction_recall(analyzer, count, seed):
+    from utils.extraction_cache import ExtractionCache
+
+    rng = random.Random(seed)
+    sources = sorted(analyzer.synonym_map.items()) + [(s, s) for s in sorted(analyzer.known_symptoms)]
+    cases = [(paraphrase(rng, phrase), canonical) for phrase, canonical in rng.choices(sources, k=count)]
+    clean = corpus.ANSWERS + corpus.DURATIONS + corpus.SEVERITIES + corpus.CLOSERS
+    clean += [" ".join(rng.sample(corpus.FILLER, 8)) for _ in range(count)]
+    # The cache would answer the second run from the first
+    analyzer.extraction_cache = ExtractionCache(max_size=0)
+    semantic_index = analyzer.semantic_index or analyzer.build_semantic_index()
+
+    analyzer.semantic_index = None
+    baseline = [canonical in analyzer.extract(text)[0] for text, canonical in cases]
+    reaching = [text for text, _ in cases + [(text, None) for text in clean] if not analyzer.extract(text)[0]]
+    baseline_false = sum(bool(analyzer.extract(text)[0]) for text in clean)
+    analyzer.semantic_index = semantic_index
+    recalled = [canonical in analyzer.extract(text)[0] for text, canonical in cases]
+    false = sum(bool(analyzer.extract(text)[0]) for text in clean)
+
+    from utils.phrase_matcher import tokenize
+    tokens = [tokenize(text.lower()) for text in reaching]
+    start = time.perf_counter()
+    for message in tokens:
+        semantic_index.match(message)
+    stage_us = (time.perf_counter() - start) / max(len(tokens), 1) * 1e6
+
+    print(f"paraphrases: {count}, recalled by phrase+fuzzy: {sum(baseline) / count:.1%}, "
+          f"with the semantic stage: {sum(recalled) / count:.1%}")
+    print(f"symptom-free messages: {len(clean)}, with symptoms reported: "
+          f"{baseline_false} without the stage, {false} with it")
+    print(f"semantic stage: {stage_us:.0f} us per message reaching it ({len(tokens)} messages)")
+
+
+def index_recall(sizes, queries, seed):
+    from models.symptom_analyzer import SymptomAnalyzer
+    from utils.phrase_matcher import tokenize
+    from utils.semantic_index import SemanticIndex
+
+    analyzer = SymptomAnalyzer(artifact_path=None)
+    rng = random.Random(seed)
+    print(f"{'phrases':>8} {'build s':>8} {'lsh us':>8} {'exact us':>9} {'agreement':>10} {'found':>7}")
+    for size in sizes:
+        mapping = dict(analyzer.synonym_map)
+        mapping.update(synthetic_phrases(size))
+        start = time.perf_counter()
+        index = SemanticIndex(mapping.items())
+        index.prepare()
+        build = time.perf_counter() - start
+        messages = [tokenize(paraphrase(rng, phrase)) for phrase in rng.sample(sorted(mapping), queries)]
+
+        start = time.perf_counter()
+        approximate = [index.match(message) for message in messages]
+        lsh_us = (time.perf_counter() - start) / queries * 1e6
+        # Without tables every phrase is scored
+        index._packed["tables"] = []
+        start = time.perf_counter()
+        exact = [index.match(message) for message in messages]
+        exact_us = (time.perf_counter() - start) / queries * 1e6
+        agree = sum(a[:1] == e[:1] for a, e in zip(approximate, exact)) / queries
+        found = sum(bool(e) for e in exact) / queries
+        print(f"{len(index):>8} {build:>8.2f} {lsh_us:>8.0f} {exact_us:>9.0f} {agree:>10.1%} {found:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paraphrases", type=int, default=2000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000],
+                        help="synthetic phrases added to the seed lexicon for the index comparison")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from models.symptom_analyzer import SymptomAnalyzer
+
+    extraction_recall(SymptomAnalyzer(artifact_path=None), args.paraphrases, args.seed)
+    print()
+    index_recall(args.sizes, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Measure cold start: time from launching uvicorn to the first /health response.
+
+Runs against a scratch copy of medbot.db, optionally grown with synthetic
+conditions, both without an analyzer artifact (everything is built at import)
+and with one prebuilt by models/analyzer_artifact.py. Point --app-dir at
+another checkout to compare revisions; the artifact case is skipped there if
+that checkout has no artifact builder.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_startup.py --conditions 0 20000
+"""
+import argparse
+import http.client
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_chat_turns import REPO_DIR
+
+SYMPTOMS = ["headache", "nausea", "fever", "cough", "sore throat", "fatigue", "dizziness", "rash",
+            "chills", "joint pain", "abdominal pain", "runny nose", "sneezing", "vomiting",
+            "loss of appetite", "shortness of breath", "sensitivity to light"]
+FILLER = "a common condition often with mild or severe symptoms that may last several days".split()
+
+
+def prepare(app_dir, conditions):
+    workdir = tempfile.mkdtemp(prefix="medbot-bench-")
+    db_path = os.path.join(workdir, "medbot.db")
+    shutil.copy(os.path.join(app_dir, "medbot.db"), db_path)
+    if conditions:
+        rng = random.Random(3)
+        conn = sqlite3.connect(db_path)
+        rows = []
+        for i in range(conditions):
+            words = rng.sample(FILLER, 6) + rng.sample(SYMPTOMS, rng.randint(1, 4))
+            rng.shuffle(words)
+            rows.append((f"Synthetic condition {i}", " ".join(words), "mild"))
+        conn.executemany("INSERT INTO conditions (name, description, severity_level) VALUES (?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+    return workdir
+
+
+def time_to_health(app_dir, workdir, port, artifact=None):
+    env = dict(os.environ, PYTHONPATH=app_dir)
+    env.pop("MEDBOT_ANALYZER_ARTIFACT", None)
+    if artifact:
+        env["MEDBOT_ANALYZER_ARTIFACT"] = artifact
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/health")
+                if conn.getresponse().status == 200:
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("server did not start")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-dir", default=REPO_DIR)
+    parser.add_argument("--port", type=int, default=8769)
+    parser.add_argument("--conditions", type=int, nargs="+", default=[0, 20000],
+                        help="synthetic conditions to add to the database")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    builder = os.path.join(args.app_dir, "models", "analyzer_artifact.py")
+    print(f"{'extra conditions':>16} {'mode':>9} {'median s':>9} {'min s':>7}")
+    for conditions in args.conditions:
+        workdir = prepare(args.app_dir, conditions)
+        try:
+            modes = ["build"] + (["artifact"] if os.path.exists(builder) else [])
+            artifact = os.path.join(workdir, "analyzer.artifact")
+            for mode in modes:
+                if mode == "artifact":
+                    subprocess.run([sys.executable, builder, artifact], cwd=workdir, check=True,
+                                   stdout=subprocess.DEVNULL, env=dict(os.environ, PYTHONPATH=args.app_dir))
+                times = [time_to_health(args.app_dir, workdir, args.port, artifact if mode == "artifact" else None)
+                         for _ in range(args.runs)]
+                print(f"{conditions:>16} {mode:>9} {statistics.median(times):>9.3f} {min(times):>7.3f}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Measure the analytics rollups behind /stats (database/analytics.py) as the
+turn history grows.
+
+Grows a scratch conversation log with synthetic turn events spread over the
+last --days days (Zipf-distributed symptoms, a few percent emergencies),
+written in batches like the background writer does. At each size it times the
+/stats answers from the rollups (top symptoms this week, per-day totals for a
+month) against the same answers computed by scanning turn_events, checks the
+two agree, and reports the cost of keeping the rollups up to date per event.
+At the end the rollups are rebuilt from the events and compared with the
+incrementally maintained ones.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_stats.py --sizes 10000 100000 1000000
+"""
+import argparse
+import datetime
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from database import analytics
+from database.conversation_log import ConversationLog
+
+STAGES = ["new_symptom", "follow_up", "follow_up", "summary", "reset"]
+INTENTS = ["symptom_report", "greeting", None]
+
+SCAN_TOP = ("SELECT value, COUNT(*) FROM turn_events, json_each(turn_events.symptoms) "
+            "WHERE timestamp >= ? GROUP BY value")
+SCAN_DAILY = ("SELECT substr(timestamp, 1, 10), COUNT(*), SUM(emergency) FROM turn_events "
+              "WHERE timestamp >= ? GROUP BY 1 ORDER BY 1")
+
+
+def events(rng, count, days, today, symptoms=200):
+    weights = [1 / (rank + 1) for rank in range(symptoms)]
+    start = datetime.datetime.combine(today - datetime.timedelta(days=days - 1), datetime.time(),
+                                      datetime.timezone.utc)
+    for _ in range(count):
+        stamp = start + datetime.timedelta(seconds=rng.random() * days * 86400)
+        stage = rng.choice(STAGES)
+        found = rng.choices(range(symptoms), weights, k=rng.randint(1, 2)) if stage in ("new_symptom", "summary") else []
+        yield analytics.turn_event("user", {
+            "stage": stage,
+            "intent": rng.choice(INTENTS),
+            "symptoms": [f"symptom {i}" for i in found],
+            "condition": f"condition {rng.randrange(50)}" if stage == "summary" else None,
+            "emergency": rng.random() < 0.03,
+            "latency_ms": rng.lognormvariate(2.5, 0.8),
+        }, stamp.isoformat())
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1e3, result
+
+
+def grow(conn, new_events, batch_size, rollups=True):
+    start = time.perf_counter()
+    batch = []
+    for event in new_events:
+        batch.append(event)
+        if len(batch) == batch_size:
+            _write(conn, batch, rollups)
+            batch = []
+    if batch:
+        _write(conn, batch, rollups)
+    return time.perf_counter() - start
+
+
+def _write(conn, batch, rollups):
+    with conn:
+        if rollups:
+            analytics.write_events(conn, batch)
+        else:
+            conn.executemany(analytics.INSERT_EVENTS, [
+                (e["timestamp"], e["user_id"], e["stage"], e["intent"], "[]", e["condition"],
+                 int(e["emergency"]), e["latency_ms"]) for e in batch])
+
+
+def snapshot(conn):
+    return (conn.execute("SELECT * FROM turn_rollup_daily ORDER BY day").fetchall(),
+            conn.execute("SELECT * FROM value_rollup_daily ORDER BY dimension, day, value").fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="total turn events at each measurement")
+    parser.add_argument("--days", type=int, default=365, help="days of history the events are spread over")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    today = datetime.date(2026, 1, 1)
+    week = analytics._since(7, today)
+    month = analytics._since(30, today)
+    workdir = tempfile.mkdtemp(prefix="medbot-stats-")
+    try:
+        log = ConversationLog(os.path.join(workdir, "conversations.db"))
+        conn = log._connect()
+        # Write cost with and without the rollups, on a copy of the first batch of events
+        sample = list(events(random.Random(1), 20000, args.days, today))
+        cost_us = {}
+        for rollups in (False, True):
+            scratch = ConversationLog(os.path.join(workdir, f"sample-{rollups}.db"))._connect()
+            cost_us[rollups] = grow(scratch, sample, args.batch_size, rollups) / len(sample) * 1e6
+            scratch.close()
+        plain_us, rollup_us = cost_us[False], cost_us[True]
+        print(f"writing events in batches of {args.batch_size}: {plain_us:.1f} us/event without rollups, "
+              f"{rollup_us:.1f} us/event with them")
+        print()
+        print(f"{'events':>9} {'top week ms':>12} {'scan ms':>9} {'daily month ms':>15} {'scan ms':>9} {'agree':>6}")
+
+        total = 0
+        for size in args.sizes:
+            grow(conn, events(rng, size - total, args.days, today), args.batch_size)
+            total = size
+            top_ms, top = timed(lambda: analytics.top(conn, "symptom", 7, 10, today), args.repeat)
+            scan_top_ms, scanned = timed(lambda: conn.execute(SCAN_TOP, (week,)).fetchall(), max(1, args.repeat // 10))
+            daily_ms, daily = timed(lambda: analytics.daily(conn, 30, today), args.repeat)
+            scan_daily_ms, scanned_daily = timed(lambda: conn.execute(SCAN_DAILY, (month,)).fetchall(),
+                                                 max(1, args.repeat // 10))
+            expected_top = sorted(scanned, key=lambda row: (-row[1], row[0]))[:10]
+            agree = ([(row["value"], row["turns"]) for row in top["top"]] == expected_top
+                     and [(row["day"], row["turns"], row["emergencies"]) for row in daily] == scanned_daily)
+            print(f"{total:>9} {top_ms:>12.2f} {scan_top_ms:>9.1f} {daily_ms:>15.2f} {scan_daily_ms:>9.1f} "
+                  f"{'yes' if agree else 'NO':>6}")
+
+        incremental = snapshot(conn)
+        start = time.perf_counter()
+        analytics.rebuild(conn)
+        rebuild_s = time.perf_counter() - start
+        rebuilt = snapshot(conn)
+        # Latency sums may differ in the last bits from the order of addition
+        same = (incremental[1] == rebuilt[1] and len(incremental[0]) == len(rebuilt[0])
+                and all(a[:4] == b[:4] and abs(a[4] - b[4]) < 1e-6 * max(1, abs(b[4])) and a[5] == b[5]
+                        for a, b in zip(*[sorted(rows) for rows in (incremental[0], rebuilt[0])])))
+        print()
+        print(f"rebuilding the rollups from {total} events took {rebuild_s:.1f} s; "
+              f"incremental rollups {'match' if same else 'DO NOT match'} the rebuild")
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
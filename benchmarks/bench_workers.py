@@ -0,0 +1,104 @@
+"""
+Measure /chat throughput as serve.py's worker count grows, per session store.
+
+For each store and worker count, serve.py runs on a scratch copy of
+medbot.db and several client processes drive the benchmark conversation.
+Throughput can only scale up to the number of CPU cores, which is printed
+first.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/bench_workers.py --workers 1 2 4 --stores sqlite kv
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_chat_turns import APP_ENV, CONVERSATION, REPO_DIR
+
+
+def start(app_dir, store, workers, port):
+    workdir = tempfile.mkdtemp(prefix="medbot-bench-")
+    shutil.copy(os.path.join(app_dir, "medbot.db"), workdir)
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(app_dir, "serve.py"), "--workers", str(workers),
+         "--store", store, "--port", str(port), "--kv-address", os.path.join(workdir, "kv.sock")],
+        cwd=workdir, env=dict(os.environ, PYTHONPATH=app_dir, **APP_ENV),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return proc, workdir
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("serve.py did not start")
+
+
+def client(port, user_id, seconds, results):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    turns = errors = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        for message in CONVERSATION:
+            conn.request("POST", "/chat", json.dumps({"message": message, "user_id": user_id}),
+                         {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status == 200:
+                turns += 1
+            else:
+                errors += 1
+    results.put((turns, errors))
+
+
+def measure(port, clients, seconds):
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client, args=(port, f"bench-{i}", seconds, results))
+             for i in range(clients)]
+    start_time = time.time()
+    for p in procs:
+        p.start()
+    totals = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.time() - start_time
+    return sum(t for t, _ in totals) / elapsed, sum(e for _, e in totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-dir", default=REPO_DIR)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--stores", nargs="+", default=["sqlite", "kv"])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'store':>7} {'workers':>8} {'turns/s':>9} {'errors':>7}")
+    for store in args.stores:
+        for workers in args.workers:
+            proc, workdir = start(args.app_dir, store, workers, args.port)
+            try:
+                rate, errors = measure(args.port, args.clients, args.seconds)
+            finally:
+                proc.terminate()
+                proc.wait()
+                shutil.rmtree(workdir, ignore_errors=True)
+            print(f"{store:>7} {workers:>8} {rate:>9.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Check that the hot queries are served by indexes.
+
+Runs EXPLAIN QUERY PLAN for each query against a scratch copy of medbot.db
+brought to the current schema by database/migrations.py (and a scratch
+conversation log), prints the plans, and exits non-zero if any query scans a
+whole table or sorts without an index. --no-migrate shows the plans on the
+unmigrated copy for comparison.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/check_query_plans.py
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import sqlite
+
+from bench_chat_turns import REPO_DIR
+from database.admin_changes import PENDING_QUERY
+from database.analytics import DAILY_QUERY, VALUES_QUERY
+from database.conversation_log import HISTORY_QUERY, ConversationLog
+from database.migrations import migrate
+from database.models import Condition, Conversation, Remedy, SessionAnswer, SessionSymptom, Symptom, UserSession
+
+# (description, statement), matching the queries issued by the code
+MEDBOT_QUERIES = [
+    ("session load", select(UserSession).where(UserSession.id == "user")),
+    ("session update", update(UserSession).where(UserSession.id == "user").values(canonicals="[]")),
+    # Also run by the session_details_* triggers on every session write and delete
+    ("session symptoms rewrite", delete(SessionSymptom).where(SessionSymptom.session_id == "user")),
+    ("session answers rewrite", delete(SessionAnswer).where(SessionAnswer.session_id == "user")),
+    ("sweeper", delete(UserSession).where(UserSession.id.in_(
+        select(UserSession.id).where(UserSession.timestamp < datetime.datetime(2000, 1, 1)).limit(500)))),
+    ("sessions reporting a symptom", select(SessionSymptom.session_id).where(SessionSymptom.symptom == "headache")),
+    ("remedies for a condition", select(Remedy).where(Remedy.condition_id == 1)),
+    ("condition by name", select(Condition).where(Condition.name == "Vertigo")),
+    ("symptom by name", select(Symptom).where(Symptom.name == "headache")),
+    ("conversations for a user", select(Conversation).where(Conversation.user_id == "user")
+     .order_by(Conversation.timestamp)),
+]
+
+
+def _sql(statement):
+    compiled = statement.compile(dialect=sqlite.dialect(), compile_kwargs={"render_postcompile": True})
+    return str(compiled), [compiled.params[name] for name in compiled.positiontup]
+
+
+def explain(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def problems(plan):
+    found = []
+    for step in plan:
+        # "SCAN t" reads the whole table; "SCAN t USING [COVERING] INDEX" walks an index in order
+        if step.startswith("SCAN ") and "USING" not in step:
+            found.append(step)
+        if step.startswith("USE TEMP B-TREE"):
+            found.append(step)
+    return found
+
+
+def check(conn, description, sql, params):
+    plan = explain(conn, sql, params)
+    bad = problems(plan)
+    print(f"{'FAIL' if bad else 'ok':<5}{description}")
+    for step in plan:
+        print(f"       {step}")
+    return not bad
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-dir", default=REPO_DIR)
+    parser.add_argument("--no-migrate", action="store_true", help="explain against the unmigrated schema")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="medbot-plans-")
+    try:
+        db_path = os.path.join(workdir, "medbot.db")
+        shutil.copy(os.path.join(args.app_dir, "medbot.db"), db_path)
+        if not args.no_migrate:
+            migrate(db_path)
+        log_path = os.path.join(workdir, "conversations.db")
+        log = ConversationLog(log_path)
+        log.append("user", "chat", "hello", "hi")
+        log.close()
+
+        ok = True
+        conn = sqlite3.connect(db_path)
+        for description, statement in MEDBOT_QUERIES:
+            try:
+                ok &= check(conn, description, *_sql(statement))
+            except sqlite3.OperationalError as e:
+                print(f"FAIL {description}: {e}")
+                ok = False
+        if not args.no_migrate:
+            ok &= check(conn, "admin changes to replay", PENDING_QUERY, (0,))
+        conn.close()
+        conn = sqlite3.connect(log_path)
+        ok &= check(conn, "conversation history", HISTORY_QUERY, ("user", 100))
+        ok &= check(conn, "daily turn totals", DAILY_QUERY, ("2000-01-01",))
+        ok &= check(conn, "daily rollup of a dimension", VALUES_QUERY, ("symptom", "2000-01-01"))
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        print("Some queries are not served by an index.")
+        sys.exit(1)
+    print("All queries use indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Seeded synthetic corpus for the benchmark suite.
+
+Messages are built from the analyzer's own vocabulary (canonical symptoms and
+synonym phrases), emergency phrases and filler words, so the same seed always
+gives the same corpus for the same vocabulary. Length and symptom density are
+parameters, so a benchmark can tell a slowdown on long messages from one on
+symptom-heavy ones.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/corpus.py --count 5 --words 40 --density 0.3
+"""
+import argparse
+import random
+
+from config.medical_config import EMERGENCY_SYMPTOMS
+
+FILLER = ("i have been feeling a bit off since yesterday and it is getting worse at night "
+          "my doctor said to rest but the pain keeps coming back after work so i wanted to ask").split()
+DURATIONS = ["since yesterday", "2 days", "about a week", "3 hours", "on and off for a month"]
+SEVERITIES = ["3", "5", "7", "mild", "pretty bad"]
+ANSWERS = ["no", "yes", "not really", "only at night"]
+CLOSERS = ["what remedy can I use?", "what should I do?", "is it serious?", "thanks"]
+
+# Named message profiles: (words per message, share of words that are symptoms)
+PROFILES = {
+    "short_sparse": (8, 0.1),
+    "short_dense": (8, 0.5),
+    "long_sparse": (80, 0.05),
+    "long_dense": (80, 0.3),
+}
+
+
+def symptom_phrases(analyzer):
+    return sorted(set(analyzer.known_symptoms) | set(analyzer.synonym_map))
+
+
+def message(rng, phrases, words, density, emergency_rate=0.0):
+    """
+    One message of roughly `words` words where about `density` of them belong
+    to symptom phrases.
+    """
+    parts = []
+    count = 0
+    while count < words:
+        if rng.random() < emergency_rate:
+            phrase = rng.choice(EMERGENCY_SYMPTOMS)
+        elif rng.random() < density:
+            phrase = rng.choice(phrases)
+        else:
+            phrase = rng.choice(FILLER)
+        parts.append(phrase)
+        count += len(phrase.split())
+    return " ".join(parts)
+
+
+def messages(analyzer, count, words, density, seed=0, emergency_rate=0.0):
+    rng = random.Random(seed)
+    phrases = symptom_phrases(analyzer)
+    return [message(rng, phrases, words, density, emergency_rate) for _ in range(count)]
+
+
+def symptom_sets(analyzer, count, seed=0, max_size=5):
+    """
+    Canonical symptom lists as handed to SymptomAnalyzer.analyze.
+    """
+    rng = random.Random(seed)
+    symptoms = sorted(analyzer.known_symptoms)
+    return [rng.sample(symptoms, rng.randint(1, min(max_size, len(symptoms)))) for _ in range(count)]
+
+
+def conversation(rng, phrases, emergency_rate=0.05):
+    """
+    A multi-turn /chat conversation: symptom report, follow-up answers, a
+    second report, a closing question and a reset.
+    """
+    turns = [message(rng, phrases, rng.randint(6, 30), 0.3, emergency_rate),
+             rng.choice(DURATIONS), rng.choice(SEVERITIES), rng.choice(ANSWERS)]
+    if rng.random() < 0.5:
+        turns += [message(rng, phrases, rng.randint(4, 12), 0.4), rng.choice(DURATIONS),
+                  rng.choice(SEVERITIES), rng.choice(ANSWERS)]
+    turns += [rng.choice(CLOSERS), "reset"]
+    return turns
+
+
+def conversations(analyzer, count, seed=0, emergency_rate=0.05):
+    rng = random.Random(seed)
+    phrases = symptom_phrases(analyzer)
+    return [conversation(rng, phrases, emergency_rate) for _ in range(count)]
+
+
+if __name__ == "__main__":
+    from models.symptom_analyzer import SymptomAnalyzer
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--words", type=int, default=20)
+    parser.add_argument("--density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--conversations", action="store_true", help="print conversations instead")
+    args = parser.parse_args()
+
+    analyzer = SymptomAnalyzer()
+    if args.conversations:
+        for turns in conversations(analyzer, args.count, args.seed):
+            print("\n".join(turns) + "\n")
+    else:
+        for text in messages(analyzer, args.count, args.words, args.density, args.seed):
+            print(text)
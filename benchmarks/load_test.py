@@ -0,0 +1,99 @@
+"""
+Load-test /chat and report latency percentiles per concurrency level.
+
+Each simulated user runs the same multi-turn conversation in a loop against a
+uvicorn server on a scratch copy of medbot.db. Use --app-dir to test another
+checkout, or --url to hit a server that is already running.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/load_test.py --users 1 16 64
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import threading
+import time
+from urllib.parse import urlparse
+
+from bench_chat_turns import CONVERSATION, REPO_DIR, start_server
+
+
+def user(host, port, user_id, deadline, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while time.time() < deadline:
+        for message in CONVERSATION:
+            body = json.dumps({"message": message, "user_id": user_id})
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/chat", body, {"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+            except OSError:
+                errors.append(1)
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - start)
+            if resp.status != 200:
+                errors.append(resp.status)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def run_level(host, port, users, seconds):
+    latencies, errors = [], []
+    deadline = time.time() + seconds
+    threads = [threading.Thread(target=user, args=(host, port, f"load-{users}-{i}", deadline, latencies, errors))
+               for i in range(users)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    latencies.sort()
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-dir", default=REPO_DIR)
+    parser.add_argument("--url", help="test an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 16, 64])
+    args = parser.parse_args()
+
+    proc = workdir = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        host, port = "127.0.0.1", args.port
+        proc, workdir = start_server(os.path.abspath(args.app_dir), port)
+    try:
+        print(f"{'users':>6} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for users in args.users:
+            r = run_level(host, port, users, args.seconds)
+            print(f"{r['users']:>6} {r['requests']:>9} {r['errors']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}")
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Benchmark suite for the chat pipeline, with a regression check against a
+stored baseline.
+
+Microbenchmarks time SymptomAnalyzer.extract_and_classify (per message
+profile from corpus.py), SymptomAnalyzer.scan (the phrase pass that also
+detects emergencies) and SymptomAnalyzer.analyze.
+The end-to-end benchmark drives multi-turn /chat conversations through the app
+in-process with an httpx ASGI client, so it measures the handler, session store
+and logging without sockets or a server. Everything runs against a scratch copy
+of medbot.db (and of the analyzer artifact in MEDBOT_ANALYZER_ARTIFACT, if set)
+and a seeded corpus.
+
+Results go to a JSON file. If a baseline exists, every result is compared to it
+and the script exits non-zero when one is worse by more than --threshold.
+Baselines are only meaningful on the machine that recorded them; refresh the
+stored one there with --save-baseline after an intended change.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/run_suite.py
+    PYTHONPATH=. python3 benchmarks/run_suite.py --save-baseline
+    PYTHONPATH=. python3 benchmarks/run_suite.py --quick --threshold 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import corpus
+from bench_chat_turns import APP_ENV, REPO_DIR
+
+BASELINE_PATH = os.path.join(REPO_DIR, "benchmarks", "baseline.json")
+
+
+def best_per_call(fn, batches, min_seconds=0.05):
+    """
+    Microseconds per call, best over the batches. Each batch is a fresh slice
+    of the corpus so per-message caches don't turn later batches into pure
+    cache hits. Batches of cheap calls are looped until they take min_seconds,
+    so timer resolution and scheduling blips don't dominate.
+    """
+    best = float("inf")
+    loops = 1
+    for batch in batches:
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                for item in batch:
+                    fn(item)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_seconds or loops >= 1000:
+                break
+            loops *= 2
+        best = min(best, elapsed / (loops * len(batch)))
+    return best * 1e6
+
+
+def micro_benchmarks(analyzer, size, repeats, seed):
+    results = {}
+    for profile, (words, density) in corpus.PROFILES.items():
+        batches = [corpus.messages(analyzer, size, words, density, seed=seed + r) for r in range(repeats)]
+        # Not looped: a second pass over the same batch would be answered by the fuzzy memo.
+        # Batches of extraction calls take long enough to time in one pass.
+        results[f"extract_and_classify.{profile}"] = best_per_call(analyzer.extract_and_classify, batches,
+                                                                   min_seconds=0)
+    batches = [corpus.symptom_sets(analyzer, size, seed=seed + r) for r in range(repeats)]
+    results["analyze.full"] = best_per_call(analyzer.analyze, batches)
+    results["analyze.top1"] = best_per_call(lambda symptoms: analyzer.analyze(symptoms, top_k=1), batches)
+    for profile in ["short_sparse", "long_sparse"]:
+        words, density = corpus.PROFILES[profile]
+        batches = [corpus.messages(analyzer, size, words, density, seed=seed + r, emergency_rate=0.02)
+                   for r in range(repeats)]
+        results[f"scan.{profile}"] = best_per_call(analyzer.scan, batches)
+    return {name: {"value": round(value, 3), "unit": "us/call", "better": "lower"} for name, value in results.items()}
+
+
+async def chat_throughput(app, conversations, clients):
+    import httpx
+
+    latencies = []
+
+    async def user(client, index):
+        for turns in conversations[index::clients]:
+            for text in turns:
+                start = time.perf_counter()
+                resp = await client.post("/chat", json={"message": text, "user_id": f"bench-{index}"})
+                latencies.append(time.perf_counter() - start)
+                if resp.status_code != 200:
+                    raise RuntimeError(f"/chat returned {resp.status_code}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(user(client, i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "turns_per_s": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1e3,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1e3,
+    }
+
+
+async def end_to_end_benchmarks(app_module, count, client_counts, seed, runs):
+    conversations = corpus.conversations(app_module.analyzer, count, seed=seed)
+    results = {}
+    async with app_module.app.router.lifespan_context(app_module.app):
+        # Warm-up: first-touch costs (session rows, fuzzy memo, pool connections)
+        await chat_throughput(app_module.app, conversations[:max(client_counts)], max(client_counts))
+        for clients in client_counts:
+            # Best of several runs; a single run is at the mercy of background noise
+            run = max([await chat_throughput(app_module.app, conversations, clients) for _ in range(runs)],
+                      key=lambda r: r["turns_per_s"])
+            results[f"chat.c{clients}.turns_per_s"] = {"value": round(run["turns_per_s"], 1),
+                                                       "unit": "turns/s", "better": "higher"}
+            results[f"chat.c{clients}.p50_ms"] = {"value": round(run["p50_ms"], 3), "unit": "ms", "better": "lower"}
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each result next to its baseline and return the names that
+    regressed by more than `threshold` (a fraction).
+    """
+    regressions = []
+    print(f"{'benchmark':<42} {'baseline':>10} {'current':>10} {'change':>8}  unit")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<42} {'-':>10} {result['value']:>10} {'new':>8}  {result['unit']}")
+            continue
+        change = (result["value"] - base["value"]) / base["value"] if base["value"] else 0.0
+        worse = change if result["better"] == "lower" else -change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<42} {base['value']:>10} {result['value']:>10} {change:>+8.1%}  {result['unit']}{flag}")
+    return regressions
+
+
+def run_in_process(args):
+    app_dir = os.path.abspath(args.app_dir)
+    workdir = tempfile.mkdtemp(prefix="medbot-bench-")
+    shutil.copy(os.path.join(app_dir, "medbot.db"), workdir)
+    # The artifact, if any, comes from MEDBOT_ANALYZER_ARTIFACT, as for the server
+    artifact = os.environ.get("MEDBOT_ANALYZER_ARTIFACT")
+    if artifact and os.path.exists(artifact):
+        shutil.copy(artifact, os.path.join(workdir, "analyzer.artifact"))
+        os.environ["MEDBOT_ANALYZER_ARTIFACT"] = os.path.join(workdir, "analyzer.artifact")
+    # The app opens ./medbot.db and ./conversations.db, so run it from the scratch copy
+    os.chdir(workdir)
+    sys.path.insert(0, app_dir)
+    os.environ.update(APP_ENV)
+    try:
+        import app as app_module
+
+        results = micro_benchmarks(app_module.analyzer, args.messages, args.repeats, args.seed)
+        results.update(asyncio.run(end_to_end_benchmarks(app_module, args.conversations, args.clients, args.seed,
+                                                           args.runs)))
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def run_processes(count):
+    """
+    Re-run this script `count` times in fresh processes and keep the median
+    of each result. Timings vary more between processes (memory layout, hash
+    seeds) than within one, so a single process can't be trusted on its own.
+    """
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="medbot-bench-") as tmp:
+        for i in range(count):
+            path = os.path.join(tmp, f"run-{i}.json")
+            argv = [a for a in sys.argv[1:] if a != "--save-baseline"]
+            command = [sys.executable, os.path.abspath(__file__)] + argv + [
+                "--processes", "1", "--output", path, "--no-compare"]
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                           env=dict(os.environ, PYTHONHASHSEED=str(i)))
+            with open(path) as f:
+                runs.append(json.load(f)["results"])
+    results = {}
+    for name, result in runs[0].items():
+        values = [run[name]["value"] for run in runs]
+        results[name] = dict(result, value=statistics.median(values), spread=[min(values), max(values)])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-dir", default=REPO_DIR)
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write this run's results")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fail when a result is this much worse than the baseline (0.25 = 25%%)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--messages", type=int, default=500, help="messages per microbenchmark batch")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--runs", type=int, default=2, help="end-to-end runs per client count (best is kept)")
+    parser.add_argument("--processes", type=int, default=3,
+                        help="run the suite in this many fresh processes and keep the median of each result")
+    parser.add_argument("--no-compare", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--quick", action="store_true", help="smaller corpus, for a fast sanity run")
+    args = parser.parse_args()
+    if args.quick:
+        args.messages, args.repeats, args.conversations, args.runs, args.processes = 100, 3, 40, 1, 1
+
+    output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline)
+    if args.processes > 1:
+        results = run_processes(args.processes)
+    else:
+        results = run_in_process(args)
+
+    meta = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU",
+        "seed": args.seed,
+        "quick": args.quick,
+        "processes": args.processes,
+    }
+    report = {"meta": meta, "results": results}
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+    if args.save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline {baseline_path}")
+        return
+    if args.no_compare:
+        return
+    if not os.path.exists(baseline_path):
+        print("No baseline to compare against; run with --save-baseline to record one.")
+        return
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("machine") != meta["machine"]:
+        print(f"Note: baseline was recorded on {baseline['meta'].get('machine')}, this is {meta['machine']}.")
+    regressions = compare(results, baseline["results"], args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Hold thousands of idle /ws/chat connections open and measure active traffic.
+
+Starts uvicorn (one worker) on a scratch copy of medbot.db and opens
+--connections idle WebSockets, reporting the server's memory per connection.
+While they stay open, a few active users run the benchmark conversation over
+WebSocket and over HTTP /chat; time to first frame and full-reply latency are
+reported for both. The replies on the two transports must be identical.
+
+Usage:
+    PYTHONPATH=. python3 benchmarks/ws_idle_test.py --connections 5000
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import statistics
+import time
+
+import httpx
+from websockets.asyncio.client import connect
+
+from bench_chat_turns import CONVERSATION, REPO_DIR, start_server
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def ws_conversation(port, user_id, first_frame, totals):
+    replies = []
+    async with connect(f"ws://127.0.0.1:{port}/ws/chat?user_id={user_id}") as ws:
+        for message in CONVERSATION:
+            start = time.perf_counter()
+            await ws.send(json.dumps({"message": message}))
+            lines = []
+            while True:
+                frame = json.loads(await ws.recv())
+                if not lines and frame["type"] != "done":
+                    first_frame.append(time.perf_counter() - start)
+                if frame["type"] == "line":
+                    lines.append(frame["text"])
+                elif frame["type"] == "done":
+                    break
+            totals.append(time.perf_counter() - start)
+            replies.append("\n".join(lines))
+    return replies
+
+
+async def http_conversation(client, user_id, totals):
+    replies = []
+    for message in CONVERSATION:
+        start = time.perf_counter()
+        resp = await client.post("/chat", json={"message": message, "user_id": user_id})
+        totals.append(time.perf_counter() - start)
+        replies.append(resp.json()["response"])
+    return replies
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return statistics.median(ordered) * 1e3, ordered[int(len(ordered) * 0.99) - 1] * 1e3
+
+
+async def run(port, pid, connections, users, rounds):
+    base = rss_mb(pid)
+    idle = []
+    for i in range(connections):
+        idle.append(await connect(f"ws://127.0.0.1:{port}/ws/chat?user_id=idle-{i}"))
+    await asyncio.sleep(1)
+    held = rss_mb(pid)
+    print(f"idle connections: {connections}, server RSS {base:.0f} -> {held:.0f} MB "
+          f"({(held - base) * 1024 / max(connections, 1):.1f} KB per connection)")
+
+    ws_first, ws_total, http_total = [], [], []
+    mismatches = 0
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+        for r in range(rounds):
+            ws_replies = await asyncio.gather(*[
+                ws_conversation(port, f"ws-{r}-{u}", ws_first, ws_total) for u in range(users)])
+            http_replies = await asyncio.gather(*[
+                http_conversation(client, f"http-{r}-{u}", http_total) for u in range(users)])
+            mismatches += sum(a != b for a, b in zip(ws_replies, http_replies))
+
+    alive = sum(1 for ws in idle if ws.state.name == "OPEN")
+    for ws in idle:
+        await ws.close()
+    print(f"{'transport':>10} {'first frame p50/p99 ms':>24} {'full reply p50/p99 ms':>23}")
+    print(f"{'websocket':>10} {'%.2f / %.2f' % percentiles(ws_first):>24} {'%.2f / %.2f' % percentiles(ws_total):>23}")
+    print(f"{'http':>10} {'':>24} {'%.2f / %.2f' % percentiles(http_total):>23}")
+    print(f"idle connections still open: {alive}/{connections}; reply mismatches: {mismatches}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app-dir", default=REPO_DIR)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    proc, workdir = start_server(args.app_dir, args.port)
+    try:
+        mismatches = asyncio.run(run(args.port, proc.pid, args.connections, args.users, args.rounds))
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    raise SystemExit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
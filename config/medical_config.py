@@ -4,9 +4,89 @@ EMERGENCY_SYMPTOMS = [
     "loss of consciousness", "severe allergic reaction"
 ]
 
+# Other ways people describe the emergency symptoms above (phrase -> emergency symptom).
+# Synonyms of a symptom in SymptomAnalyzer.synonym_map whose canonical name is
+# listed above (e.g. "my chest hurts") count as emergencies without being repeated here.
+EMERGENCY_SYNONYMS = {
+    "chest pains": "chest pain",
+    "tightness in my chest": "chest pain",
+    "tight chest": "chest pain",
+    "pressure in my chest": "chest pain",
+    "can't breathe": "difficulty breathing",
+    "cannot breathe": "difficulty breathing",
+    "can't catch my breath": "difficulty breathing",
+    "trouble breathing": "difficulty breathing",
+    "struggling to breathe": "difficulty breathing",
+    "gasping for air": "difficulty breathing",
+    "severe headaches": "severe headache",
+    "worst headache of my life": "severe headache",
+    "high fevers": "high fever",
+    "very high temperature": "high fever",
+    "severe stomach pain": "severe abdominal pain",
+    "blood in my stool": "blood in stool/urine",
+    "blood in my urine": "blood in stool/urine",
+    "bloody stool": "blood in stool/urine",
+    "bloody urine": "blood in stool/urine",
+    "passed out": "loss of consciousness",
+    "fainted": "loss of consciousness",
+    "blacked out": "loss of consciousness",
+    "anaphylaxis": "severe allergic reaction",
+    "throat is closing": "severe allergic reaction",
+}
+
 AGE_GROUPS = ["child", "adult", "senior"]
 
 DISCLAIMER = (
     "⚠️ IMPORTANT: I provide general information only and cannot replace professional medical advice. "
     "For emergencies, call your local emergency number immediately."
-) 
\ No newline at end of file
+) 
+
+EMERGENCY_NOTICE = (
+    "⚠️ EMERGENCY: Your symptoms may indicate a serious condition. "
+    "Please seek immediate medical attention or call your local emergency number."
+)
+# Follow-up answer slots
+SLOT_DURATION = "duration"
+SLOT_SEVERITY = "severity"
+SLOT_ASSOCIATED = "associated_symptoms"
+SLOT_APPEARANCE = "appearance"
+SLOT_VISION = "vision_changes"
+SLOT_PATTERN = "pattern"
+
+# Follow-up questions per canonical symptom as (answer slot, question) pairs.
+# Question ids are assigned in this order, so append new flows and questions
+# at the end to keep the ids stored in existing sessions valid.
+FOLLOWUP_TEMPLATES = {
+    "sore throat": [
+        (SLOT_DURATION, "How long have you had your sore throat?"),
+        (SLOT_SEVERITY, "On a scale of 1-10, how severe is your sore throat?"),
+        (SLOT_ASSOCIATED, "Are you also experiencing any cough or fever?"),
+    ],
+    "headache": [
+        (SLOT_DURATION, "How long have you had your headache?"),
+        (SLOT_SEVERITY, "On a scale of 1-10, how severe is your headache?"),
+        (SLOT_ASSOCIATED, "Are you also experiencing any nausea or vision changes?"),
+    ],
+    "eyes": [
+        (SLOT_DURATION, "How long have you had your eye symptoms?"),
+        (SLOT_APPEARANCE, "Are your eyes red, itchy, or sensitive to light?"),
+        (SLOT_VISION, "Do you have any vision changes?"),
+    ],
+    "chest pain": [
+        (SLOT_DURATION, "How long have you had your chest pain?"),
+        (SLOT_SEVERITY, "On a scale of 1-10, how severe is your chest pain?"),
+        (SLOT_ASSOCIATED, "Are you also experiencing shortness of breath or sweating?"),
+    ],
+    "fatigue": [
+        (SLOT_DURATION, "How long have you been feeling fatigued?"),
+        (SLOT_PATTERN, "Is your fatigue constant or does it come and go?"),
+        (SLOT_ASSOCIATED, "Are you also experiencing any fever or muscle aches?"),
+    ],
+    # Add more as needed
+}
+
+# Follow-ups for symptoms without a template; {symptom} is filled in
+GENERIC_FOLLOWUPS = [
+    (SLOT_DURATION, "How long have you had your {symptom}?"),
+    (SLOT_SEVERITY, "On a scale of 1-10, how severe is your {symptom}?"),
+]
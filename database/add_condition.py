@@ -1,5 +1,6 @@
 from database.db import SessionLocal
 from database.models import Condition
+from database.knowledge_base import request_reload
 
 def add_or_update_vertigo():
     db = SessionLocal()
@@ -15,6 +16,7 @@ def add_or_update_vertigo():
         print("Added new Vertigo condition.")
     db.commit()
     db.close()
+    request_reload()
     print("Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import urllib.request
+
+from database.db import DATABASE_PATH
+
+# With several workers (serve.py) every one of them replays admin changes
+WORKERS = int(os.environ.get("MEDBOT_WORKERS", "1"))
+
+# Shared secret the /admin/* endpoints expect in the ADMIN_TOKEN_HEADER
+# header; they refuse every call while it is unset
+ADMIN_TOKEN = os.environ.get("MEDBOT_ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# How often each worker looks for changes published by the others
+POLL_SECONDS = float(os.environ.get("MEDBOT_ADMIN_POLL_SECONDS", "1"))
+# Changes older than this are deleted when a new one is published; workers
+# start from the latest entry, so only one that lags this far would miss any
+RETENTION_SECONDS = int(float(os.environ.get("MEDBOT_ADMIN_CHANGES_RETENTION_HOURS", "24")) * 3600)
+
+PENDING_QUERY = "SELECT id, kind, payload FROM admin_changes WHERE id > ? ORDER BY id"
+# Entries are in created_at order, so the subquery stops at the first one kept
+PRUNE_QUERY = ("DELETE FROM admin_changes WHERE id < (SELECT id FROM admin_changes "
+               "WHERE created_at >= datetime('now', ?) ORDER BY id LIMIT 1)")
+
+logger = logging.getLogger("medbot.admin_changes")
+
+
+class AdminChanges:
+    """
+    Admin changes to the in-memory state (knowledge base reloads, lexicon
+    refreshes, applied ingests), shared between worker processes.
+
+    An admin endpoint only runs in the worker that accepted the request, so
+    it records the change in medbot.db's admin_changes table (publish()) and
+    every worker, itself included, applies the entries it hasn't seen yet in
+    order (catch_up(), run by poll_periodically()). A worker starts from the
+    latest entry, since the state it was built from already includes the
+    earlier ones.
+    """
+    def __init__(self, db_path=DATABASE_PATH, shared=WORKERS > 1):
+        self.db_path = db_path
+        self.shared = shared
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.applied = self._latest()
+        self.replayed = 0
+        self.errors = 0
+        self.pruned = 0
+
+    def _connection(self):
+        # Connections can't be shared across fork(), so each worker opens its own
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._pid = os.getpid()
+        return self._conn
+
+    def _latest(self):
+        try:
+            return self._connection().execute("SELECT MAX(id) FROM admin_changes").fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            # Not migrated yet
+            return 0
+
+    def publish(self, kind, payload=None):
+        """
+        Record a change for every worker and return its id. Apply it with
+        catch_up(). Changes older than RETENTION_SECONDS are pruned.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                change_id = conn.execute("INSERT INTO admin_changes (kind, payload) VALUES (?, ?)",
+                                         (kind, json.dumps(payload))).lastrowid
+                self.pruned += conn.execute(PRUNE_QUERY, (f"-{RETENTION_SECONDS} seconds",)).rowcount
+                return change_id
+
+    def catch_up(self, apply, blocking=True, raise_for=None):
+        """
+        Call apply(kind, payload) for each change recorded since the last
+        call, in order, and return what it returned for the last one. With
+        blocking=False, returns at once if another thread is already applying
+        changes. A change that fails to apply is logged and skipped, so one
+        bad entry doesn't stop the rest; if it is change raise_for (the
+        caller's own), its exception is raised once the rest are applied.
+        """
+        result = failure = None
+        if not self._lock.acquire(blocking):
+            return result
+        try:
+            for change_id, kind, payload in self._connection().execute(PENDING_QUERY, (self.applied,)).fetchall():
+                result = None
+                try:
+                    result = apply(kind, json.loads(payload))
+                except Exception as e:
+                    self.errors += 1
+                    logger.exception("Could not apply admin change %d (%s)", change_id, kind)
+                    if change_id == raise_for:
+                        failure = e
+                self.applied = change_id
+                self.replayed += 1
+        finally:
+            self._lock.release()
+        if failure is not None:
+            raise failure
+        return result
+
+    def stats(self):
+        return {"shared": self.shared, "applied": self.applied, "replayed": self.replayed, "errors": self.errors,
+                "pruned": self.pruned}
+
+
+async def poll_periodically(changes, apply, interval=POLL_SECONDS):
+    """
+    Apply changes published by other workers every `interval` seconds until
+    cancelled. catch_up() runs in a thread, so neither its queries nor a
+    knowledge base reload hold up the event loop. Does nothing when this is
+    the only worker, as its admin calls apply their own changes.
+    """
+    if not changes.shared:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(changes.catch_up, apply, False)
+        except Exception:
+            logger.exception("Applying admin changes failed")
+
+
+def admin_request(path, payload=None, timeout=5):
+    """
+    POST to /admin/<path> on the running API server (MEDBOT_API_URL) with
+    the admin token. Raises OSError, or its subclass urllib.error.HTTPError
+    if the server refuses the call.
+    """
+    url = os.environ.get("MEDBOT_API_URL", "http://localhost:8000") + "/admin/" + path
+    headers = {ADMIN_TOKEN_HEADER: ADMIN_TOKEN}
+    data = None
+    if payload is not None:
+        data = json.dumps(payload).encode()
+        headers["Content-Type"] = "application/json"
+    urllib.request.urlopen(urllib.request.Request(url, data=data, method="POST", headers=headers), timeout=timeout)
@@ -0,0 +1,268 @@
+"""
+Structured per-turn events and the daily rollups behind the /stats endpoints.
+
+Turn events are queued with the conversation records and written by the same
+background writer (database/conversation_log.py). Each batch is folded into
+the rollup tables in the same transaction, so the aggregates are always
+consistent with the events and a /stats query only reads the rollup rows of
+the days it asks about, however long the history is.
+
+Run directly to rebuild the rollups from the stored events, e.g. after
+changing LATENCY_BUCKETS_MS:
+    PYTHONPATH=. python3 database/analytics.py [conversations.db]
+"""
+import argparse
+import datetime
+import json
+import math
+import sqlite3
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+# Upper bounds of the turn latency histogram, in milliseconds; the /stats
+# percentiles are read off it
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Breakdowns with a top-N query (see top())
+DIMENSIONS = ("symptom", "intent", "condition", "stage")
+# Longest window a /stats query may ask for
+MAX_DAYS = 366
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turn_events (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    intent TEXT,
+    symptoms TEXT NOT NULL,
+    top_condition TEXT,
+    emergency INTEGER NOT NULL,
+    latency_ms REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turn_rollup_daily (
+    day TEXT PRIMARY KEY,
+    turns INTEGER NOT NULL,
+    emergencies INTEGER NOT NULL,
+    with_symptoms INTEGER NOT NULL,
+    latency_ms_sum REAL NOT NULL,
+    latency_ms_max REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS value_rollup_daily (
+    dimension TEXT NOT NULL,
+    day TEXT NOT NULL,
+    value TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    PRIMARY KEY (dimension, day, value)
+) WITHOUT ROWID;
+"""
+
+INSERT_EVENTS = ("INSERT INTO turn_events (timestamp, user_id, stage, intent, symptoms, top_condition, "
+                 "emergency, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+UPSERT_TOTALS = (
+    "INSERT INTO turn_rollup_daily (day, turns, emergencies, with_symptoms, latency_ms_sum, latency_ms_max) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (day) DO UPDATE SET "
+    "turns = turns + excluded.turns, emergencies = emergencies + excluded.emergencies, "
+    "with_symptoms = with_symptoms + excluded.with_symptoms, "
+    "latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum, "
+    "latency_ms_max = max(latency_ms_max, excluded.latency_ms_max)"
+)
+UPSERT_VALUES = ("INSERT INTO value_rollup_daily (dimension, day, value, turns) VALUES (?, ?, ?, ?) "
+                 "ON CONFLICT (dimension, day, value) DO UPDATE SET turns = turns + excluded.turns")
+
+DAILY_QUERY = ("SELECT day, turns, emergencies, with_symptoms, latency_ms_sum, latency_ms_max "
+               "FROM turn_rollup_daily WHERE day >= ? ORDER BY day")
+VALUES_QUERY = "SELECT day, value, turns FROM value_rollup_daily WHERE dimension = ? AND day >= ?"
+
+
+def _text(value, name):
+    if value is not None and not isinstance(value, str):
+        raise TypeError(f"turn event {name} must be a string, not {type(value).__name__}")
+    return value
+
+
+def turn_event(user_id, event, timestamp):
+    """
+    The record queued for one turn. event is the dict filled by
+    models.chat_flow.run_turn, plus "emergency" and "latency_ms".
+    Checked and serialized here, on the caller's side of the queue, so a
+    malformed event raises in the request that made it instead of failing a
+    batch in the writer. Raises TypeError or ValueError.
+    """
+    symptoms = list(dict.fromkeys(event.get("symptoms", ())))
+    for symptom in symptoms:
+        if not isinstance(symptom, str):
+            raise TypeError(f"turn event symptoms must be strings, not {type(symptom).__name__}")
+    latency_ms = float(event.get("latency_ms", 0.0))
+    if not math.isfinite(latency_ms):
+        raise ValueError(f"turn event latency_ms must be finite, not {latency_ms}")
+    return {
+        "timestamp": timestamp,
+        "user_id": _text(user_id, "user_id"),
+        "stage": _text(event.get("stage", "unknown"), "stage"),
+        "intent": _text(event.get("intent"), "intent"),
+        "symptoms": symptoms,
+        "symptoms_json": json.dumps(symptoms),
+        "condition": _text(event.get("condition"), "condition"),
+        "emergency": bool(event.get("emergency")),
+        "latency_ms": latency_ms,
+    }
+
+
+def _latency_bucket(latency_ms):
+    index = bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+    return str(LATENCY_BUCKETS_MS[index]) if index < len(LATENCY_BUCKETS_MS) else "inf"
+
+
+def rollup(events):
+    """
+    Fold events into rollup deltas: (per-day totals rows, per-value rows),
+    in the column order of UPSERT_TOTALS and UPSERT_VALUES.
+    """
+    totals = {}
+    values = Counter()
+    for event in events:
+        # Timestamps are UTC ISO strings, so the date is the prefix
+        day = event["timestamp"][:10]
+        row = totals.setdefault(day, [0, 0, 0, 0.0, 0.0])
+        row[0] += 1
+        row[1] += event["emergency"]
+        row[2] += bool(event["symptoms"])
+        row[3] += event["latency_ms"]
+        row[4] = max(row[4], event["latency_ms"])
+        for symptom in event["symptoms"]:
+            values["symptom", day, symptom] += 1
+        if event["intent"]:
+            values["intent", day, event["intent"]] += 1
+        if event["condition"]:
+            values["condition", day, event["condition"]] += 1
+        values["stage", day, event["stage"]] += 1
+        values["latency_ms", day, _latency_bucket(event["latency_ms"])] += 1
+    return ([(day, *row) for day, row in totals.items()],
+            [(*key, turns) for key, turns in values.items()])
+
+
+def write_events(conn, events):
+    """
+    Insert a batch of events and add it to the rollups. Runs inside the
+    caller's transaction, so events and rollups are committed together.
+    """
+    conn.executemany(INSERT_EVENTS, [
+        (e["timestamp"], e["user_id"], e["stage"], e["intent"], e["symptoms_json"],
+         e["condition"], int(e["emergency"]), e["latency_ms"])
+        for e in events
+    ])
+    totals, values = rollup(events)
+    conn.executemany(UPSERT_TOTALS, totals)
+    conn.executemany(UPSERT_VALUES, values)
+
+
+def rebuild(conn, chunk=10000):
+    """
+    Recompute the rollups from every stored event. Returns the number of events.
+    """
+    count = 0
+    with conn:
+        conn.execute("DELETE FROM turn_rollup_daily")
+        conn.execute("DELETE FROM value_rollup_daily")
+        cursor = conn.execute("SELECT timestamp, user_id, stage, intent, symptoms, top_condition, emergency, "
+                              "latency_ms FROM turn_events ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk)
+            if not rows:
+                break
+            totals, values = rollup([
+                {"timestamp": timestamp, "user_id": user_id, "stage": stage, "intent": intent,
+                 "symptoms": json.loads(symptoms), "condition": condition, "emergency": bool(emergency),
+                 "latency_ms": latency_ms}
+                for timestamp, user_id, stage, intent, symptoms, condition, emergency, latency_ms in rows
+            ])
+            conn.executemany(UPSERT_TOTALS, totals)
+            conn.executemany(UPSERT_VALUES, values)
+            count += len(rows)
+    return count
+
+
+def _since(days, today=None):
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    return (today - datetime.timedelta(days=days - 1)).isoformat()
+
+
+def _rows(conn, sql, params):
+    try:
+        return conn.execute(sql, params).fetchall()
+    except sqlite3.OperationalError:
+        # Nothing has been recorded yet, so the tables do not exist
+        return []
+
+
+def _percentile(histogram, q, latency_max):
+    # Upper bound of the bucket holding the q-th turn; the top bucket has none,
+    # so the day's maximum stands in
+    target = q * sum(histogram.values())
+    seen = 0
+    for bound in LATENCY_BUCKETS_MS:
+        seen += histogram.get(str(bound), 0)
+        if seen >= target:
+            return bound
+    return round(latency_max, 3)
+
+
+def daily(conn, days=7, today=None):
+    """
+    Per-day totals for the last `days` UTC days, oldest first; days without
+    turns are left out. Latency percentiles are bucket upper bounds.
+    """
+    since = _since(days, today)
+    histograms = defaultdict(dict)
+    for day, bound, turns in _rows(conn, VALUES_QUERY, ("latency_ms", since)):
+        histograms[day][bound] = turns
+    return [
+        {
+            "day": day,
+            "turns": turns,
+            "emergencies": emergencies,
+            "emergency_rate": round(emergencies / turns, 4),
+            "symptom_rate": round(with_symptoms / turns, 4),
+            "mean_latency_ms": round(latency_sum / turns, 3),
+            "p50_latency_ms": _percentile(histograms[day], 0.5, latency_max),
+            "p95_latency_ms": _percentile(histograms[day], 0.95, latency_max),
+            "max_latency_ms": round(latency_max, 3),
+        }
+        for day, turns, emergencies, with_symptoms, latency_sum, latency_max in _rows(conn, DAILY_QUERY, (since,))
+    ]
+
+
+def top(conn, dimension, days=7, limit=10, today=None):
+    """
+    The most frequent values of a dimension over the last `days` UTC days,
+    with the share of turns in the window that had each.
+    """
+    since = _since(days, today)
+    counts = Counter()
+    for _, value, turns in _rows(conn, VALUES_QUERY, (dimension, since)):
+        counts[value] += turns
+    total = sum(row[1] for row in _rows(conn, DAILY_QUERY, (since,)))
+    return {
+        "dimension": dimension,
+        "since": since,
+        "turns": total,
+        "top": [{"value": value, "turns": turns, "share": round(turns / total, 4) if total else 0.0}
+                for value, turns in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the analytics rollups from the stored turn events.")
+    parser.add_argument("path", nargs="?", default=None, help="conversation log (default: MEDBOT_CONVERSATION_LOG)")
+    args = parser.parse_args()
+
+    from database.conversation_log import DEFAULT_PATH
+
+    conn = sqlite3.connect(args.path or DEFAULT_PATH)
+    conn.executescript(SCHEMA)
+    print(f"Rebuilt the rollups from {rebuild(conn)} turn events.")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import asyncio
+import atexit
+import datetime
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from database import analytics
+
+# Conversation records live in their own SQLite file so logging never competes
+# with session writes for medbot.db's single writer lock.
+DEFAULT_PATH = os.environ.get("MEDBOT_CONVERSATION_LOG", "./conversations.db")
+# Longest a history request waits for queued records to be written
+HISTORY_FLUSH_SECONDS = 2.0
+# Longest close() waits for the writer to finish the queue at shutdown
+CLOSE_TIMEOUT_SECONDS = float(os.environ.get("MEDBOT_CONVERSATION_LOG_CLOSE_TIMEOUT_SECONDS", "30"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversation_log (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    user_message TEXT,
+    response TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_conversation_log_user ON conversation_log (user_id, id);
+""" + analytics.SCHEMA
+
+HISTORY_QUERY = ("SELECT kind, user_message, response, timestamp FROM conversation_log "
+                 "WHERE user_id = ? ORDER BY id DESC LIMIT ?")
+
+_STOP = object()
+
+logger = logging.getLogger("medbot.conversation_log")
+
+
+def _is_busy(error):
+    # SQLITE_BUSY or SQLITE_LOCKED, including their extended codes
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class ConversationLog:
+    """
+    Append-only conversation log written in the background.
+
+    append() puts a record on a bounded in-memory queue and returns; a writer
+    thread drains the queue and inserts whatever has accumulated in one
+    transaction, up to batch_size rows at a time. When the queue is full,
+    producers wait for the writer (backpressure) instead of dropping records.
+    A batch that fails to commit because the database is locked or busy is
+    retried up to retry_attempts times. If it still fails, or fails with any
+    other database error (read-only file, I/O error, full disk), it is logged
+    and dropped so the writer keeps draining the queue. Any other failure
+    means something in the batch can't be written: its records are then
+    written one at a time and the ones that still fail are logged and
+    dropped. close() flushes everything queued, waiting at most
+    CLOSE_TIMEOUT_SECONDS.
+
+    Structured turn events (record_turn_async()) share the queue and are
+    folded into the analytics rollups in the same transaction as the records
+    around them; see database/analytics.py.
+    """
+    def __init__(self, path=DEFAULT_PATH, max_queue=10000, batch_size=500, retry_seconds=1.0, retry_attempts=3):
+        self.path = path
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.retry_attempts = retry_attempts
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._progress = threading.Condition()
+        self._enqueued = 0
+        self._written = 0
+        self._thread = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.turn_events = 0
+        self.dropped = 0
+        self.stalls = 0
+        self.errors = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._connect().close()
+                self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+                self._thread.start()
+                # Safety net for processes that exit without running close()
+                atexit.register(self.close)
+
+    def _timestamp(self):
+        if self._closed:
+            raise RuntimeError("conversation log is closed")
+        self._ensure_started()
+        return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    def _record(self, user_id, kind, user_message, response):
+        return (user_id, kind, user_message, response, self._timestamp())
+
+    def _enqueued_one(self):
+        with self._progress:
+            self._enqueued += 1
+
+    def append(self, user_id, kind, user_message=None, response=None):
+        """
+        Queue a record, blocking while the queue is full.
+        """
+        record = self._record(user_id, kind, user_message, response)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.stalls += 1
+            self._queue.put(record)
+        self._enqueued_one()
+
+    async def append_async(self, user_id, kind, user_message=None, response=None):
+        """
+        Queue a record from the event loop. When the queue is full, the caller
+        waits in a worker thread so other requests keep running.
+        """
+        await self._put_async(self._record(user_id, kind, user_message, response))
+
+    async def record_turn_async(self, user_id, event):
+        """
+        Queue a structured event for one chat turn (the dict filled by
+        models.chat_flow.run_turn, plus "emergency" and "latency_ms").
+        Raises TypeError or ValueError for a malformed event, which is never
+        queued; see analytics.turn_event().
+        """
+        await self._put_async(analytics.turn_event(user_id, event, self._timestamp()))
+
+    async def _put_async(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.stalls += 1
+            await asyncio.to_thread(self._queue.put, record)
+        self._enqueued_one()
+
+    def _run(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if any(record is _STOP for record in batch):
+                batch = [record for record in batch if record is not _STOP]
+                stopping = True
+            if batch:
+                try:
+                    self._write_retrying(conn, batch)
+                except sqlite3.OperationalError as e:
+                    # The database itself is failing, so writing the records
+                    # one at a time wouldn't help
+                    self.errors += 1
+                    self.dropped += len(batch)
+                    logger.error("Dropped a conversation log batch of %d records: %s", len(batch), e)
+                except Exception:
+                    self.errors += 1
+                    logger.exception("Conversation log batch failed; writing its %d records one at a time", len(batch))
+                    for record in batch:
+                        try:
+                            self._write_retrying(conn, [record])
+                        except Exception as e:
+                            self.dropped += 1
+                            logger.error("Dropped a conversation log record that can't be written (%r): %.200r",
+                                         e, record)
+                self.batches += 1
+            with self._progress:
+                self._written += len(batch)
+                self._progress.notify_all()
+        conn.close()
+
+    def _write_retrying(self, conn, records):
+        # Retries while the database is locked or busy, up to retry_attempts
+        # times; anything else is raised at once
+        for attempt in range(1, self.retry_attempts + 1):
+            try:
+                self._write(conn, records)
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == self.retry_attempts:
+                    raise
+                self.errors += 1
+                logger.warning("Conversation log write failed (%s); retrying %d records", e, len(records))
+                time.sleep(self.retry_seconds)
+
+    def _write(self, conn, records):
+        # Conversation records are tuples, turn events dicts
+        events = [record for record in records if isinstance(record, dict)]
+        with conn:
+            conn.executemany(
+                "INSERT INTO conversation_log (user_id, kind, user_message, response, timestamp) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [record for record in records if not isinstance(record, dict)],
+            )
+            if events:
+                analytics.write_events(conn, events)
+        self.turn_events += len(events)
+
+    def flush(self, timeout=None):
+        """
+        Wait until every record queued before this call is written.
+        Returns False if the timeout expired first.
+        """
+        with self._progress:
+            target = self._enqueued
+            return self._progress.wait_for(lambda: self._written >= target, timeout)
+
+    def close(self, timeout=CLOSE_TIMEOUT_SECONDS):
+        """
+        Write everything still queued and stop the writer thread. Gives up
+        after `timeout` seconds, leaving unwritten records behind, and returns
+        False in that case.
+        """
+        if self._closed:
+            return True
+        self._closed = True
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            logger.error("Conversation log writer did not finish within %.0f s; %d records were not written",
+                         timeout, self._enqueued - self._written)
+            return False
+        return True
+
+    def history(self, user_id, limit=100, flush_timeout=HISTORY_FLUSH_SECONDS):
+        """
+        Return a user's most recent records, oldest first. Records still queued
+        are flushed first, so a user normally sees their latest turn; if that
+        takes longer than flush_timeout seconds, what is committed so far is
+        returned.
+        """
+        if not self.flush(flush_timeout):
+            logger.warning("Conversation log flush timed out; history for %s may miss recent turns", user_id)
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(HISTORY_QUERY, (user_id, limit)).fetchall()
+        except sqlite3.OperationalError:
+            # Nothing has been logged yet, so the table does not exist
+            rows = []
+        finally:
+            conn.close()
+        return [
+            {"kind": kind, "user_message": user_message, "response": response, "timestamp": timestamp}
+            for kind, user_message, response, timestamp in reversed(rows)
+        ]
+
+    def daily_stats(self, days=7):
+        """
+        Per-day turn totals from the analytics rollups; see analytics.daily().
+        """
+        return self._read(analytics.daily, days)
+
+    def top_stats(self, dimension, days=7, limit=10):
+        """
+        Most frequent symptoms, intents, ... from the analytics rollups; see
+        analytics.top().
+        """
+        return self._read(analytics.top, dimension, days, limit)
+
+    def _read(self, reader, *args):
+        # Rollups are read as last committed; turns still queued show up a
+        # batch later
+        conn = sqlite3.connect(self.path)
+        try:
+            return reader(conn, *args)
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self._written,
+            "batches": self.batches,
+            "turn_events": self.turn_events,
+            "dropped": self.dropped,
+            "stalls": self.stalls,
+            "errors": self.errors,
+        }
@@ -1,17 +1,50 @@
-from sqlalchemy import create_engine
+import asyncio
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./medbot.db"
+DATABASE_PATH = "./medbot.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a turn is being written, and NORMAL sync
+    # only fsyncs at checkpoints, which is still safe against corruption in WAL mode.
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+event.listen(engine, "connect", _configure_sqlite)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for the /chat hot path so DB waits don't block the event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=16,
+    max_overflow=48,
+    pool_timeout=10,
+)
+event.listen(async_engine.sync_engine, "connect", _configure_sqlite)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# SQLite has a single writer. Queueing write transactions on a lock keeps them
+# in arrival order instead of leaving connections to back off in the busy handler.
+# Emit the transaction's writes and its commit while holding the lock.
+_write_lock = asyncio.Lock()
+
+def write_lock():
+    return _write_lock
@@ -0,0 +1,345 @@
+"""
+Bulk load conditions, symptoms, remedies and synonyms from CSV or JSON Lines
+files.
+
+Each file holds one kind of row, named by the file (conditions.csv,
+synonyms.jsonl, ...) or by --kind. Columns:
+    conditions  name, description, severity_level
+    symptoms    name, body_part, severity_indicators
+    remedies    condition (name), remedy_text, safety_notes
+    synonyms    phrase, symptom (canonical name; added to symptoms if new)
+Files are streamed, validated and upserted in batches of executemany()
+statements, all inside one transaction, so a failed load changes nothing.
+Conditions and symptoms are matched by name, remedies by condition and text,
+synonyms by phrase. Unchanged rows are skipped, and optional fields left empty
+keep their stored value. Files load in the order above, so remedies and
+synonyms can refer to rows from the same run.
+
+After committing, the ids of the changed rows are sent to a running API
+server (MEDBOT_API_URL, with MEDBOT_ADMIN_TOKEN), which re-reads those rows
+and applies them to its analyzer in place instead of rebuilding it.
+
+Usage:
+    PYTHONPATH=. python3 database/ingest.py vocab/conditions.csv vocab/synonyms.jsonl
+    PYTHONPATH=. python3 database/ingest.py --kind synonyms extra_phrases.csv --skip-invalid
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+import urllib.error
+
+from database.admin_changes import admin_request
+from database.db import DATABASE_PATH
+from database.migrations import migrate
+from utils.phrase_matcher import tokenize
+
+KINDS = ["conditions", "symptoms", "remedies", "synonyms"]
+SEVERITY_LEVELS = ("mild", "moderate", "severe")
+BATCH_SIZE = 5000
+
+
+def read_rows(path):
+    """
+    Yield (line number, row) from a CSV file with a header row or a JSON Lines
+    file, one row at a time. row is None for a line that isn't a JSON object.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield number, row if isinstance(row, dict) else None
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def kind_of(path):
+    """
+    The kind of rows a file holds, from its name (e.g. "remedies.jsonl").
+    """
+    stem = os.path.basename(path).split(".")[0].lower()
+    if stem not in KINDS:
+        raise ValueError(f"Can't tell what {path} holds; name it after one of {', '.join(KINDS)} or pass --kind")
+    return stem
+
+
+def _field(row, name, required=False):
+    value = row.get(name)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"missing {name}")
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be text")
+    return value.strip()
+
+
+def _merge(new, old):
+    # Optional fields left empty keep the stored value
+    return tuple(o if n is None else n for n, o in zip(new, old))
+
+
+class IngestResult:
+    """
+    Row counts, rejected rows and the changes to apply to a running analyzer.
+    """
+    def __init__(self):
+        self.read = dict.fromkeys(KINDS, 0)
+        self.inserted = dict.fromkeys(KINDS, 0)
+        self.updated = dict.fromkeys(KINDS, 0)
+        # (path, line number, message)
+        self.errors = []
+        self.seconds = 0.0
+        # Ids of the rows written, per table; a running server re-reads them
+        self.changes = {kind: [] for kind in KINDS}
+
+    @property
+    def rows_per_second(self):
+        return sum(self.read.values()) / self.seconds if self.seconds else 0.0
+
+
+class Ingestor:
+    """
+    Upserts validated rows on an open connection, inside the caller's
+    transaction. Keeps the existing keys in memory, so each batch costs one
+    executemany() per statement and no per-row lookups.
+    """
+    def __init__(self, conn, result, batch_size=BATCH_SIZE, skip_invalid=False):
+        self.conn = conn
+        self.result = result
+        self.batch_size = batch_size
+        self.skip_invalid = skip_invalid
+        # Existing rows by key; the first row wins where names repeat, as in KnowledgeBase
+        self.conditions = {}
+        for row_id, name, description, severity_level in conn.execute(
+                "SELECT id, name, description, severity_level FROM conditions ORDER BY id"):
+            self.conditions.setdefault(name, (row_id, description, severity_level))
+        self.symptoms = {}
+        for row_id, name, body_part, severity_indicators in conn.execute(
+                "SELECT id, name, body_part, severity_indicators FROM symptoms ORDER BY id"):
+            self.symptoms.setdefault(name, (row_id, body_part, severity_indicators))
+        self.remedies = {}
+        for row_id, condition_id, text, notes in conn.execute(
+                "SELECT id, condition_id, remedy_text, safety_notes FROM remedies ORDER BY id"):
+            self.remedies.setdefault((condition_id, text), (row_id, notes))
+        self.synonyms = dict(conn.execute("SELECT phrase, symptom_id FROM synonyms"))
+        # Ids are assigned here so one executemany() can insert a whole batch
+        self._next_ids = {table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0] + 1
+                          for table in KINDS}
+
+    def _new_id(self, table):
+        row_id = self._next_ids[table]
+        self._next_ids[table] += 1
+        return row_id
+
+    def load(self, kind, path):
+        """
+        Stream one file into its table.
+        """
+        validate = getattr(self, f"_validate_{kind}")
+        write = getattr(self, f"_write_{kind}")
+        batch = []
+        for number, row in read_rows(path):
+            self.result.read[kind] += 1
+            try:
+                if row is None:
+                    raise ValueError("not a JSON object")
+                batch.append(validate(row))
+            except ValueError as e:
+                self.result.errors.append((path, number, str(e)))
+                if not self.skip_invalid:
+                    raise ValueError(f"{path}:{number}: {e}")
+                continue
+            if len(batch) >= self.batch_size:
+                write(batch)
+                batch = []
+        if batch:
+            write(batch)
+
+    @staticmethod
+    def _validate_conditions(row):
+        severity_level = _field(row, "severity_level")
+        if severity_level is not None:
+            severity_level = severity_level.lower()
+            if severity_level not in SEVERITY_LEVELS:
+                raise ValueError(f"severity_level must be one of {', '.join(SEVERITY_LEVELS)}")
+        return _field(row, "name", True), _field(row, "description"), severity_level
+
+    @staticmethod
+    def _validate_symptoms(row):
+        return _field(row, "name", True).lower(), _field(row, "body_part"), _field(row, "severity_indicators")
+
+    def _validate_remedies(self, row):
+        condition = _field(row, "condition", True)
+        if condition not in self.conditions:
+            raise ValueError(f"unknown condition {condition!r}")
+        return condition, _field(row, "remedy_text", True), _field(row, "safety_notes")
+
+    @staticmethod
+    def _validate_synonyms(row):
+        phrase = " ".join(tokenize(_field(row, "phrase", True).lower()))
+        if not phrase:
+            raise ValueError("phrase has no words")
+        return phrase, _field(row, "symptom", True).lower()
+
+    def _upsert(self, table, columns, rows):
+        # rows: (id, values, is_new)
+        inserts = [(row_id, *values) for row_id, values, is_new in rows if is_new]
+        updates = [(*values, row_id) for row_id, values, is_new in rows if not is_new]
+        if inserts:
+            self.conn.executemany(f"INSERT INTO {table} (id, {', '.join(columns)}) "
+                                  f"VALUES ({', '.join('?' * (len(columns) + 1))})", inserts)
+        if updates:
+            self.conn.executemany(f"UPDATE {table} SET {', '.join(c + ' = ?' for c in columns)} WHERE id = ?",
+                                  updates)
+        self.result.inserted[table] += len(inserts)
+        self.result.updated[table] += len(updates)
+
+    def _write_conditions(self, batch):
+        rows = []
+        for name, *values in batch:
+            current = self.conditions.get(name)
+            if current is None:
+                row_id, is_new = self._new_id("conditions"), True
+                values = tuple(values)
+            else:
+                row_id, is_new = current[0], False
+                values = _merge(values, current[1:])
+                if values == current[1:]:
+                    continue
+            self.conditions[name] = (row_id, *values)
+            rows.append((row_id, (name, *values), is_new))
+            self.result.changes["conditions"].append(row_id)
+        self._upsert("conditions", ("name", "description", "severity_level"), rows)
+
+    def _write_symptoms(self, batch):
+        rows = []
+        for name, *values in batch:
+            current = self.symptoms.get(name)
+            if current is None:
+                row_id, is_new = self._new_id("symptoms"), True
+                values = tuple(values)
+            else:
+                row_id, is_new = current[0], False
+                values = _merge(values, current[1:])
+                if values == current[1:]:
+                    continue
+            self.symptoms[name] = (row_id, *values)
+            rows.append((row_id, (name, *values), is_new))
+            self.result.changes["symptoms"].append(row_id)
+        self._upsert("symptoms", ("name", "body_part", "severity_indicators"), rows)
+
+    def _write_remedies(self, batch):
+        rows = []
+        for condition, text, notes in batch:
+            condition_id = self.conditions[condition][0]
+            current = self.remedies.get((condition_id, text))
+            if current is None:
+                row_id, is_new = self._new_id("remedies"), True
+            else:
+                row_id, is_new = current[0], False
+                notes = current[1] if notes is None else notes
+                if notes == current[1]:
+                    continue
+            self.remedies[(condition_id, text)] = (row_id, notes)
+            rows.append((row_id, (condition_id, text, notes), is_new))
+            self.result.changes["remedies"].append(row_id)
+        self._upsert("remedies", ("condition_id", "remedy_text", "safety_notes"), rows)
+
+    def _write_synonyms(self, batch):
+        # Canonical symptoms that aren't in the symptoms table yet get a bare row
+        missing = sorted({symptom for _, symptom in batch} - self.symptoms.keys())
+        self._write_symptoms([(symptom, None, None) for symptom in missing])
+        rows = []
+        for phrase, symptom in batch:
+            symptom_id = self.symptoms[symptom][0]
+            current = self.synonyms.get(phrase)
+            if current == symptom_id:
+                continue
+            # A changed phrase replaces its row with a new id, so the analyzer
+            # can pick up changes by id (see knowledge_base.read_lexicon)
+            row_id = self._new_id("synonyms")
+            rows.append((row_id, phrase, symptom_id))
+            if current is None:
+                self.result.inserted["synonyms"] += 1
+            else:
+                self.result.updated["synonyms"] += 1
+            self.synonyms[phrase] = symptom_id
+            self.result.changes["synonyms"].append(row_id)
+        self.conn.executemany("INSERT OR REPLACE INTO synonyms (id, phrase, symptom_id) VALUES (?, ?, ?)", rows)
+
+def ingest(sources, db_path=DATABASE_PATH, batch_size=BATCH_SIZE, skip_invalid=False):
+    """
+    Load [(kind, path)] in one transaction and return an IngestResult.
+    Raises ValueError on the first invalid row unless skip_invalid is set, in
+    which case invalid rows are left out and listed in result.errors.
+    """
+    result = IngestResult()
+    start = time.perf_counter()
+    migrate(db_path)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            ingestor = Ingestor(conn, result, batch_size, skip_invalid)
+            for kind, path in sorted(sources, key=lambda source: KINDS.index(source[0])):
+                ingestor.load(kind, path)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def send_changes(changes):
+    """
+    Ask a running API server to re-read the ingested rows and apply them to
+    its analyzer in place.
+    """
+    try:
+        admin_request("apply-ingest", changes, timeout=60)
+        print("Applied the changes on the running server.")
+    except urllib.error.HTTPError as e:
+        print(f"The server refused the changes ({e.code}); check MEDBOT_ADMIN_TOKEN, or restart it to pick them up.")
+    except OSError:
+        print("Could not reach the server; restart it to pick up the changes.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--kind", choices=KINDS, help="what the files hold (default: from each file name)")
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--skip-invalid", action="store_true", help="leave out invalid rows instead of aborting")
+    parser.add_argument("--no-notify", action="store_true", help="don't send the changes to a running server")
+    args = parser.parse_args()
+
+    try:
+        sources = [(args.kind or kind_of(path), path) for path in args.files]
+        result = ingest(sources, args.db, args.batch_size, args.skip_invalid)
+    except (OSError, ValueError) as e:
+        print(f"Nothing was loaded: {e}")
+        sys.exit(1)
+    for path, number, message in result.errors:
+        print(f"skipped {path}:{number}: {message}")
+    for kind in KINDS:
+        if result.read[kind] or result.inserted[kind]:
+            print(f"{kind:<11} {result.read[kind]:>8} read {result.inserted[kind]:>8} inserted "
+                  f"{result.updated[kind]:>8} updated")
+    print(f"{sum(result.read.values())} rows in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s)")
+    if not args.no_notify and any(result.changes.values()):
+        send_changes(result.changes)
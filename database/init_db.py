@@ -1,8 +1,12 @@
 from database.db import engine, Base, SessionLocal
 from database.models import Condition, Remedy
+from database.migrations import migrate
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # The tables above are already current; this records the schema version
+    # (or upgrades tables that existed before)
+    migrate()
     db = SessionLocal()
     # Check if already initialized
     if db.query(Condition).first():
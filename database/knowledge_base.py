@@ -0,0 +1,243 @@
+import sqlite3
+import urllib.error
+
+import numpy as np
+
+from database.admin_changes import admin_request
+from database.db import DATABASE_PATH, SessionLocal
+from database.models import Condition, Remedy
+
+
+def _chunks(ids, size=500):
+    # Keeps each IN (...) list well under SQLite's bound-parameter limit
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class KnowledgeBase:
+    """
+    In-memory snapshot of the conditions table and each condition's first remedy.
+
+    Keeps a sparse condition-by-symptom incidence matrix, stored column-wise:
+    each canonical symptom maps to the sorted array of conditions whose
+    description mentions it. Counting matches for a symptom set is then a
+    sparse matrix-vector product (one bincount over the selected columns), and
+    scoring never goes back to the database. The snapshot is reloaded on demand
+    after invalidate() and every load bumps `version`.
+    """
+    def __init__(self):
+        self.version = 0
+        self.conditions = []
+        self.remedies = {}
+        self._descriptions = np.array([], dtype=str)
+        self._symptom_index = {}
+        self._stale = True
+
+    def load(self, db=None, vocabulary=()):
+        """
+        (Re)load the snapshot from the database and index the given symptoms.
+        """
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            rows = db.query(Condition).all()
+            conditions = [
+                {
+                    "id": c.id,
+                    "name": c.name,
+                    "description": (c.description or '').lower(),
+                    "severity_level": c.severity_level,
+                }
+                for c in rows
+            ]
+            # Mirror the per-request lookup: first condition with a name, then its first remedy
+            first_remedy = {}
+            for r in db.query(Remedy).all():
+                first_remedy.setdefault(r.condition_id, (r.remedy_text, r.safety_notes))
+            remedies = {}
+            for c in conditions:
+                if c["name"] not in remedies:
+                    remedies[c["name"]] = first_remedy.get(c["id"])
+        finally:
+            if own_session:
+                db.close()
+        self.set_snapshot(conditions, remedies, vocabulary)
+
+    def set_snapshot(self, conditions, remedies, vocabulary=()):
+        """
+        Replace the snapshot with already-loaded conditions and remedies.
+        """
+        descriptions = np.array([c["description"] for c in conditions], dtype=str)
+        index = {symptom: self._rows_mentioning(descriptions, symptom) for symptom in vocabulary}
+        # Swap in the new snapshot in one step so readers never see a half-built index
+        self.conditions, self.remedies = conditions, remedies
+        self._descriptions, self._symptom_index = descriptions, index
+        self._stale = False
+        self.version += 1
+
+    def upsert(self, conditions=(), remedies=()):
+        """
+        Apply added or changed rows to the snapshot in place, re-indexing only
+        the conditions that changed.
+        conditions: {"id", "name", "description", "severity_level"} dicts; ids
+        not in the snapshot are appended, as SQLite assigns increasing ids.
+        remedies: {"condition", "remedy_text", "safety_notes"} dicts, keyed by
+        condition name; only a condition's first remedy is kept, as in load().
+        """
+        if self._stale:
+            # The reload reads the changes from the database anyway
+            self.ensure_loaded()
+            return
+        snapshot = list(self.conditions)
+        descriptions, index = self._descriptions, self._symptom_index
+        positions = {c["id"]: i for i, c in enumerate(snapshot)}
+        changed = set()
+        for row in conditions:
+            condition = {
+                "id": row["id"],
+                "name": row["name"],
+                "description": (row.get("description") or '').lower(),
+                "severity_level": row.get("severity_level"),
+            }
+            position = positions.get(condition["id"])
+            if position is None:
+                position = positions[condition["id"]] = len(snapshot)
+                snapshot.append(condition)
+            else:
+                snapshot[position] = condition
+            changed.add(position)
+        if changed:
+            changed = np.array(sorted(changed), dtype=np.intp)
+            texts = np.array([snapshot[i]["description"] for i in changed], dtype=str)
+            # Widen the fixed-width strings if a new description is longer; the
+            # padding np.resize adds is overwritten, as every new row changed
+            descriptions = np.resize(descriptions.astype(np.result_type(descriptions, texts)), len(snapshot))
+            descriptions[changed] = texts
+            index = {}
+            for symptom, rows in list(self._symptom_index.items()):
+                hits = changed[np.char.find(texts, symptom) >= 0]
+                index[symptom] = np.union1d(rows[~np.isin(rows, changed)], hits)
+        first_remedies = dict(self.remedies)
+        for condition in snapshot[len(self.conditions):]:
+            first_remedies.setdefault(condition["name"], None)
+        for row in remedies:
+            current = first_remedies.get(row["condition"])
+            if current is None or current[0] == row["remedy_text"]:
+                first_remedies[row["condition"]] = (row["remedy_text"], row.get("safety_notes"))
+        # Swap in the new snapshot in one step, as in set_snapshot()
+        self.conditions, self.remedies = snapshot, first_remedies
+        self._descriptions, self._symptom_index = descriptions, index
+        self.version += 1
+
+    def reload_rows(self, condition_ids=(), remedy_ids=(), db=None):
+        """
+        Re-read the given conditions and remedies from the database and
+        upsert() them. Ids that no longer exist are ignored.
+        """
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            conditions = [
+                {"id": c.id, "name": c.name, "description": c.description, "severity_level": c.severity_level}
+                for ids in _chunks(condition_ids)
+                for c in db.query(Condition).filter(Condition.id.in_(ids)).order_by(Condition.id)
+            ]
+            remedies = [
+                {"condition": name, "remedy_text": r.remedy_text, "safety_notes": r.safety_notes}
+                for ids in _chunks(remedy_ids)
+                for r, name in db.query(Remedy, Condition.name).join(Condition, Condition.id == Remedy.condition_id)
+                .filter(Remedy.id.in_(ids)).order_by(Remedy.id)
+            ]
+        finally:
+            if own_session:
+                db.close()
+        self.upsert(conditions, remedies)
+
+    def invalidate(self):
+        """
+        Mark the snapshot stale; it is reloaded on next use.
+        """
+        self._stale = True
+
+    def ensure_loaded(self):
+        if self._stale:
+            self.load(vocabulary=list(self._symptom_index))
+
+    def remedy_for(self, condition_name):
+        """
+        Return (remedy_text, safety_notes) for a condition, or None.
+        """
+        return self.remedies.get(condition_name)
+
+    @staticmethod
+    def _rows_mentioning(descriptions, symptom):
+        if not len(descriptions):
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(np.char.find(descriptions, symptom) >= 0)
+
+    def conditions_for(self, symptom):
+        """
+        Return the indexes (into self.conditions) of conditions mentioning a symptom.
+        Symptoms outside the indexed vocabulary are looked up once and cached.
+        """
+        indexes = self._symptom_index.get(symptom)
+        if indexes is None:
+            indexes = self._symptom_index[symptom] = self._rows_mentioning(self._descriptions, symptom)
+        return indexes
+
+    def match_counts(self, symptoms):
+        """
+        Count how many of the given symptoms each condition mentions.
+        Repeated symptoms count once per occurrence. Returns (indexes, counts)
+        for the conditions with at least one match, in table order.
+        """
+        columns = [self.conditions_for(symptom) for symptom in symptoms]
+        rows = np.concatenate(columns) if columns else np.empty(0, dtype=np.intp)
+        if not len(rows):
+            return rows, rows
+        counts = np.bincount(rows)
+        indexes = np.flatnonzero(counts)
+        return indexes, counts[indexes]
+
+
+def read_lexicon(since=0, db_path=DATABASE_PATH):
+    """
+    Read the phrase lexicon. Returns ([(id, phrase, canonical symptom)] for the
+    synonyms with an id above `since`, in id order, and {symptom: (body_part,
+    severity_indicators)} for every symptom). database/ingest.py writes a
+    changed phrase as a new row, so synonym ids only grow and passing the
+    highest id already read returns just the changes since.
+    Returns ([], {}) if the database predates the synonyms table.
+    """
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return [], {}
+    try:
+        synonyms = conn.execute("SELECT synonyms.id, synonyms.phrase, symptoms.name FROM synonyms "
+                                "JOIN symptoms ON symptoms.id = synonyms.symptom_id "
+                                "WHERE synonyms.id > ? ORDER BY synonyms.id", (since,)).fetchall()
+        symptoms = {}
+        for name, body_part, severity_indicators in conn.execute(
+                "SELECT name, body_part, severity_indicators FROM symptoms ORDER BY id"):
+            symptoms.setdefault(name, (body_part, severity_indicators))
+        return synonyms, symptoms
+    except sqlite3.OperationalError:
+        return [], {}
+    finally:
+        conn.close()
+
+
+def request_reload():
+    """
+    Ask a running API server to reload its knowledge base snapshot.
+    Used by the maintenance scripts after they change the conditions table.
+    """
+    try:
+        admin_request("reload-knowledge-base")
+        print("Reloaded knowledge base on the running server.")
+    except urllib.error.HTTPError as e:
+        print(f"The server refused the reload ({e.code}); check MEDBOT_ADMIN_TOKEN.")
+    except OSError:
+        print("Could not reach the server; restart it or call /admin/reload-knowledge-base to pick up the changes.")
@@ -0,0 +1,114 @@
+"""
+Minimal key-value server over a Unix socket, shared by all API workers.
+
+It is a local stand-in for a networked store such as Redis: values live in
+the server's memory and are lost when it stops. Requests and responses are
+single JSON lines: ["get", key], ["set", key, value], ["delete", key] or
+["stats"].
+
+Usage:
+    PYTHONPATH=. python3 database/kv_store.py /tmp/medbot-kv.sock
+"""
+import asyncio
+import json
+import os
+import sys
+
+DEFAULT_ADDRESS = "/tmp/medbot-kv.sock"
+
+
+class KVServer:
+    def __init__(self):
+        self.data = {}
+        self.requests = 0
+
+    def handle(self, request):
+        self.requests += 1
+        op = request[0]
+        if op == "get":
+            return self.data.get(request[1])
+        if op == "set":
+            self.data[request[1]] = request[2]
+            return True
+        if op == "delete":
+            return self.data.pop(request[1], None) is not None
+        if op == "stats":
+            return {"keys": len(self.data), "requests": self.requests}
+        raise ValueError(f"unknown op {op!r}")
+
+    async def _serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = {"ok": self.handle(json.loads(line))}
+                except (ValueError, IndexError, TypeError) as e:
+                    response = {"error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address=DEFAULT_ADDRESS):
+        if os.path.exists(address):
+            os.unlink(address)
+        server = await asyncio.start_unix_server(self._serve_client, path=address)
+        async with server:
+            await server.serve_forever()
+
+
+class KVClient:
+    """
+    Async client for KVServer with a small pool of connections, so concurrent
+    requests from one worker don't queue behind each other.
+    """
+    def __init__(self, address=DEFAULT_ADDRESS, max_connections=16):
+        self.address = address
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_connections)
+        self.requests = 0
+
+    async def _request(self, *request):
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await asyncio.open_unix_connection(self.address)
+            reader, writer = conn
+            try:
+                writer.write(json.dumps(request).encode() + b"\n")
+                await writer.drain()
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("key-value server closed the connection")
+            except BaseException:
+                writer.close()
+                raise
+            self._idle.append(conn)
+        self.requests += 1
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"key-value server: {response['error']}")
+        return response["ok"]
+
+    async def get(self, key):
+        return await self._request("get", key)
+
+    async def set(self, key, value):
+        await self._request("set", key, value)
+
+    async def delete(self, key):
+        return await self._request("delete", key)
+
+    async def stats(self):
+        return await self._request("stats")
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(KVServer().serve(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_ADDRESS))
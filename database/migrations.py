@@ -0,0 +1,189 @@
+"""
+Schema migrations for medbot.db, tracked in SQLite's PRAGMA user_version.
+
+MIGRATIONS[i] upgrades a database from version i to version i + 1. Each one
+runs in its own transaction together with the version bump, so an interrupted
+upgrade resumes where it stopped. Migrations only add to the schema (or seed
+rows that aren't there yet) and use IF NOT EXISTS, so they also run cleanly on
+a database that init_db.py just created from the current models (which don't
+include the triggers).
+
+The app applies pending migrations when it starts; to upgrade by hand:
+    PYTHONPATH=. python3 database/migrations.py
+"""
+import csv
+import logging
+import os
+import sqlite3
+import sys
+
+from database.db import DATABASE_PATH
+from utils.phrase_matcher import tokenize
+
+logger = logging.getLogger("medbot.migrations")
+
+
+# Indexes for lookups by name (maintenance scripts), remedies per condition,
+# history per user, and the session sweeper's age scan
+_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_conditions_name ON conditions (name)",
+    "CREATE INDEX IF NOT EXISTS ix_symptoms_name ON symptoms (name)",
+    "CREATE INDEX IF NOT EXISTS ix_remedies_condition_id ON remedies (condition_id)",
+    "CREATE INDEX IF NOT EXISTS ix_conversations_user_id ON conversations (user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_user_sessions_timestamp ON user_sessions (timestamp)",
+]
+
+def _json_array(column):
+    # The column if it holds a JSON array, otherwise an empty one (NULL, or
+    # answers saved before follow-ups had question ids)
+    return (f"CASE WHEN NOT json_valid({column}) THEN '[]' "
+            f"WHEN json_type({column}) = 'array' THEN {column} ELSE '[]' END")
+
+
+_FILL_DETAILS = f"""
+    INSERT OR REPLACE INTO session_symptoms (session_id, position, symptom)
+        SELECT NEW.id, key, value FROM json_each({_json_array('NEW.canonicals')});
+    INSERT OR REPLACE INTO session_answers (session_id, position, question_id, answer)
+        SELECT NEW.id, key, json_extract(value, '$[0]'), json_extract(value, '$[1]')
+        FROM json_each({_json_array('NEW.answers')});
+"""
+_CLEAR_DETAILS = """
+    DELETE FROM session_symptoms WHERE session_id = OLD.id;
+    DELETE FROM session_answers WHERE session_id = OLD.id;
+"""
+
+# Per-session symptom and answer rows kept in step with user_sessions' JSON
+# columns by triggers, so every writer (and the sweeper's deletes) keeps them
+# current without extra statements
+_SESSION_TABLES = [
+    """CREATE TABLE IF NOT EXISTS session_symptoms (
+        session_id VARCHAR NOT NULL,
+        position INTEGER NOT NULL,
+        symptom VARCHAR NOT NULL,
+        PRIMARY KEY (session_id, position)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_session_symptoms_symptom ON session_symptoms (symptom)",
+    """CREATE TABLE IF NOT EXISTS session_answers (
+        session_id VARCHAR NOT NULL,
+        position INTEGER NOT NULL,
+        question_id INTEGER,
+        answer TEXT,
+        PRIMARY KEY (session_id, position)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_session_answers_question_id ON session_answers (question_id)",
+    f"""CREATE TRIGGER IF NOT EXISTS session_details_insert AFTER INSERT ON user_sessions BEGIN
+        {_FILL_DETAILS}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS session_details_update AFTER UPDATE OF canonicals, answers ON user_sessions
+        WHEN NEW.canonicals IS NOT OLD.canonicals OR NEW.answers IS NOT OLD.answers BEGIN
+        {_CLEAR_DETAILS}
+        {_FILL_DETAILS}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS session_details_delete AFTER DELETE ON user_sessions BEGIN
+        {_CLEAR_DETAILS}
+    END""",
+    # Backfill existing sessions
+    f"""INSERT OR REPLACE INTO session_symptoms (session_id, position, symptom)
+        SELECT user_sessions.id, key, value FROM user_sessions, json_each({_json_array('user_sessions.canonicals')})""",
+    f"""INSERT OR REPLACE INTO session_answers (session_id, position, question_id, answer)
+        SELECT user_sessions.id, key, json_extract(value, '$[0]'), json_extract(value, '$[1]')
+        FROM user_sessions, json_each({_json_array('user_sessions.answers')})""",
+]
+
+# Phrase -> canonical symptom table written by database/ingest.py
+_SYNONYMS = [
+    """CREATE TABLE IF NOT EXISTS synonyms (
+        id INTEGER NOT NULL PRIMARY KEY,
+        phrase VARCHAR NOT NULL UNIQUE,
+        symptom_id INTEGER NOT NULL REFERENCES symptoms (id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_synonyms_symptom_id ON synonyms (symptom_id)",
+]
+
+# Admin changes replayed by every worker; see database/admin_changes.py
+_ADMIN_CHANGES = [
+    """CREATE TABLE IF NOT EXISTS admin_changes (
+        id INTEGER NOT NULL PRIMARY KEY,
+        kind VARCHAR NOT NULL,
+        payload TEXT,
+        created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+SEED_SYNONYMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed", "synonyms.csv")
+
+
+def _seed_synonyms(conn):
+    # The phrase lexicon that used to be a dict in SymptomAnalyzer. Phrases
+    # already in the table (loaded by database/ingest.py) are left alone, and
+    # canonical symptoms missing from the symptoms table get a bare row.
+    with open(SEED_SYNONYMS_PATH, newline="", encoding="utf-8") as f:
+        rows = [(" ".join(tokenize(row["phrase"].lower())), row["symptom"]) for row in csv.DictReader(f)]
+    conn.executemany("INSERT INTO symptoms (name) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM symptoms WHERE name = ?)",
+                     [(symptom, symptom) for symptom in dict.fromkeys(symptom for _, symptom in rows)])
+    conn.executemany("INSERT OR IGNORE INTO synonyms (phrase, symptom_id) "
+                     "SELECT ?, MIN(id) FROM symptoms WHERE name = ?", rows)
+
+
+# (description, statements); entry i upgrades schema version i to i + 1.
+# A statement is SQL or a function called with the connection.
+MIGRATIONS = [
+    ("indexes", _INDEXES),
+    ("session symptom and answer tables", _SESSION_TABLES),
+    ("synonyms table", _SYNONYMS),
+    ("seed synonyms", [_seed_synonyms]),
+    ("admin changes table", _ADMIN_CHANGES),
+]
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(db_path=DATABASE_PATH):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def migrate(db_path=DATABASE_PATH):
+    """
+    Apply pending migrations. Returns the list of versions applied.
+    Safe to call from several processes at once: each step takes the write
+    lock and re-reads the version before running.
+    """
+    applied = []
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= LATEST_VERSION:
+                conn.execute("ROLLBACK")
+                break
+            description, statements = MIGRATIONS[version]
+            try:
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(version + 1)
+            logger.info("Migrated %s to schema version %d (%s)", db_path, version + 1, description)
+    finally:
+        conn.close()
+    return applied
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DATABASE_PATH
+    before = schema_version(path)
+    applied = migrate(path)
+    if applied:
+        print(f"Upgraded {path} from schema version {before} to {applied[-1]}.")
+    else:
+        print(f"{path} is already at schema version {before}.")
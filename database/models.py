@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from database.db import Base
 import datetime
@@ -6,7 +6,7 @@ import datetime
 class Condition(Base):
     __tablename__ = "conditions"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     description = Column(Text)
     severity_level = Column(String)
     remedies = relationship("Remedy", back_populates="condition")
@@ -14,20 +14,29 @@ class Condition(Base):
 class Symptom(Base):
     __tablename__ = "symptoms"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, index=True)
     body_part = Column(String)
     severity_indicators = Column(Text)
 
+# Extra phrases that map to a canonical symptom, loaded by database/ingest.py
+class Synonym(Base):
+    __tablename__ = "synonyms"
+    id = Column(Integer, primary_key=True)
+    phrase = Column(String, nullable=False, unique=True)
+    symptom_id = Column(Integer, ForeignKey("symptoms.id"), nullable=False, index=True)
+    symptom = relationship("Symptom")
+
 class Remedy(Base):
     __tablename__ = "remedies"
     id = Column(Integer, primary_key=True, index=True)
-    condition_id = Column(Integer, ForeignKey("conditions.id"))
+    condition_id = Column(Integer, ForeignKey("conditions.id"), index=True)
     remedy_text = Column(Text, nullable=False)
     safety_notes = Column(Text)
     condition = relationship("Condition", back_populates="remedies")
 
 class Conversation(Base):
     __tablename__ = "conversations"
+    __table_args__ = (Index("ix_conversations_user_id", "user_id", "timestamp"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String)
     messages = Column(Text)
@@ -41,4 +50,21 @@ class UserSession(Base):
     canonicals = Column(Text)
     answers = Column(Text)
     followups = Column(Text)
-    timestamp = Column(DateTime, default=datetime.datetime.utcnow) 
\ No newline at end of file
+    # Last write; the session sweeper expires sessions by it
+    timestamp = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+# Queryable copies of each session's canonical symptoms and follow-up answers,
+# maintained from user_sessions' JSON columns by triggers (database/migrations.py).
+# The JSON columns stay the source the session store loads from.
+class SessionSymptom(Base):
+    __tablename__ = "session_symptoms"
+    session_id = Column(String, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    symptom = Column(String, nullable=False, index=True)
+
+class SessionAnswer(Base):
+    __tablename__ = "session_answers"
+    session_id = Column(String, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    question_id = Column(Integer, index=True)
+    answer = Column(Text) 
\ No newline at end of file
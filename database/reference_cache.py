@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+# Reference data only changes through maintenance scripts followed by a
+# knowledge base reload, so clients may reuse responses for a while and then
+# revalidate them with If-None-Match.
+CACHE_CONTROL = "public, max-age=300"
+
+
+def encode(value):
+    """
+    Serialize a response body the way Starlette's JSONResponse does.
+    """
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def etag_matches(if_none_match, etag):
+    """
+    True if an If-None-Match header value names `etag` (weak comparison).
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ReferenceCache:
+    """
+    Read-through cache of serialized reference-data responses (conditions,
+    remedies).
+
+    Entries are tagged with the knowledge base version they were built from.
+    Reloading the knowledge base bumps its version, and the next lookup drops
+    every entry, so maintenance scripts only need to trigger the reload they
+    already do. Each entry keeps the encoded body and its ETag, so hits cost
+    neither a query nor serialization.
+    """
+    def __init__(self, knowledge_base, max_entries=4096):
+        self.knowledge_base = knowledge_base
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def _current_version(self):
+        self.knowledge_base.ensure_loaded()
+        version = self.knowledge_base.version
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+        return version
+
+    async def get(self, key, loader):
+        """
+        Return (body, etag) for `key`, calling loader() in a worker thread on
+        a miss. loader returns the JSON-serializable response value.
+        """
+        start = time.perf_counter()
+        version = self._current_version()
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._hit_seconds += time.perf_counter() - start
+            return entry
+        body = encode(await asyncio.to_thread(loader))
+        entry = (body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"')
+        # Don't keep a value loaded from data that was reloaded meanwhile
+        if self._current_version() == version:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self.misses += 1
+        self._miss_seconds += time.perf_counter() - start
+        return entry
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "invalidations": self.invalidations,
+            "hit_latency_ms": round(self._hit_seconds / self.hits * 1e3, 4) if self.hits else None,
+            "miss_latency_ms": round(self._miss_seconds / self.misses * 1e3, 4) if self.misses else None,
+        }
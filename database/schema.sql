@@ -14,6 +14,14 @@ CREATE TABLE IF NOT EXISTS symptoms (
     severity_indicators TEXT
 );
 
+-- Table: synonyms
+CREATE TABLE IF NOT EXISTS synonyms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    phrase TEXT NOT NULL UNIQUE,
+    symptom_id INTEGER NOT NULL,
+    FOREIGN KEY (symptom_id) REFERENCES symptoms(id)
+);
+
 -- Table: remedies
 CREATE TABLE IF NOT EXISTS remedies (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -40,4 +48,39 @@ CREATE TABLE IF NOT EXISTS user_sessions (
     answers TEXT,
     followups TEXT,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-); 
\ No newline at end of file
+); 
+
+-- Table: session_symptoms (kept in step with user_sessions.canonicals by triggers)
+CREATE TABLE IF NOT EXISTS session_symptoms (
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    symptom TEXT NOT NULL,
+    PRIMARY KEY (session_id, position)
+);
+
+-- Table: session_answers (kept in step with user_sessions.answers by triggers)
+CREATE TABLE IF NOT EXISTS session_answers (
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    question_id INTEGER,
+    answer TEXT,
+    PRIMARY KEY (session_id, position)
+);
+
+-- Table: admin_changes (admin calls replayed by every worker; see database/admin_changes.py)
+CREATE TABLE IF NOT EXISTS admin_changes (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indexes and triggers: see database/migrations.py
+CREATE INDEX IF NOT EXISTS ix_conditions_name ON conditions (name);
+CREATE INDEX IF NOT EXISTS ix_symptoms_name ON symptoms (name);
+CREATE INDEX IF NOT EXISTS ix_synonyms_symptom_id ON synonyms (symptom_id);
+CREATE INDEX IF NOT EXISTS ix_remedies_condition_id ON remedies (condition_id);
+CREATE INDEX IF NOT EXISTS ix_conversations_user_id ON conversations (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_user_sessions_timestamp ON user_sessions (timestamp);
+CREATE INDEX IF NOT EXISTS ix_session_symptoms_symptom ON session_symptoms (symptom);
+CREATE INDEX IF NOT EXISTS ix_session_answers_question_id ON session_answers (question_id);
\ No newline at end of file
@@ -0,0 +1,153 @@
+import json
+import time
+from collections import OrderedDict
+
+from models.dialogue import dialogue
+
+_COLUMNS = ("symptoms", "conditions_suggested", "canonicals", "answers", "followups")
+
+
+class SessionState:
+    """
+    Typed, in-process view of a user_sessions row.
+    The JSON columns are decoded once when the row is loaded and encoded again
+    only when the state is written back.
+
+    `answers` is a list of [question_id, text] pairs and `dialogue` is the
+    [symptom, step] position in the follow-up flow (None when no question is
+    pending); see models/dialogue.py. `dialogue` is stored in the followups column.
+    """
+    __slots__ = ("user_id", "symptoms", "conditions_suggested", "canonicals",
+                 "answers", "dialogue", "persisted", "last_access")
+
+    def __init__(self, user_id, symptoms=None, conditions_suggested=None, canonicals=None,
+                 answers=None, dialogue=None, persisted=False):
+        self.user_id = user_id
+        self.symptoms = symptoms if symptoms is not None else []
+        self.conditions_suggested = conditions_suggested if conditions_suggested is not None else []
+        self.canonicals = canonicals if canonicals is not None else []
+        self.answers = answers if answers is not None else []
+        self.dialogue = dialogue
+        self.persisted = persisted
+        self.last_access = time.monotonic()
+
+    @classmethod
+    def from_row(cls, row):
+        return cls.from_values(row.id, {column: getattr(row, column) for column in _COLUMNS})
+
+    @classmethod
+    def from_values(cls, user_id, values):
+        """
+        Build a state from stored column values (the output of row_values()).
+        """
+        answers = json.loads(values["answers"]) if values["answers"] else []
+        state = json.loads(values["followups"]) if values["followups"] else None
+        if isinstance(answers, dict):
+            # Saved before follow-ups were compiled to question ids
+            answers, state = dialogue.upgrade_legacy(answers)
+        return cls(
+            user_id,
+            symptoms=json.loads(values["symptoms"]) if values["symptoms"] else [],
+            conditions_suggested=json.loads(values["conditions_suggested"]) if values["conditions_suggested"] else [],
+            canonicals=json.loads(values["canonicals"]) if values["canonicals"] else [],
+            answers=answers,
+            dialogue=state or None,
+            persisted=True,
+        )
+
+    def reset(self):
+        self.symptoms = []
+        self.canonicals = []
+        self.answers = []
+        self.dialogue = None
+
+    def row_values(self):
+        return {
+            "symptoms": json.dumps(self.symptoms),
+            "conditions_suggested": json.dumps(self.conditions_suggested),
+            "canonicals": json.dumps(self.canonicals),
+            "answers": json.dumps(self.answers),
+            "followups": json.dumps(self.dialogue or []),
+        }
+
+
+class SessionCache:
+    """
+    LRU cache of hot SessionState objects with idle-time (TTL) expiry.
+
+    /chat writes state back at the end of every turn; WebSocket connections
+    keep their session dirty and write it back when they close. Clean entries
+    can be dropped at any time, while dirty ones are still returned by get()
+    after eviction or expiry until they are written. States whose write failed
+    are discarded so the next turn reloads them from the database.
+    """
+    def __init__(self, max_size=10000, ttl_seconds=1800):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._dirty = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        state = self._entries.get(user_id)
+        now = time.monotonic()
+        if state is not None and now - state.last_access > self.ttl_seconds:
+            del self._entries[user_id]
+            self.expirations += 1
+            state = None
+        if state is None and user_id in self._dirty:
+            # Unwritten changes must never be shadowed by a reload from the database
+            state = self._dirty[user_id]
+            self._entries[user_id] = state
+        if state is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        state.last_access = now
+        self._entries.move_to_end(user_id)
+        return state
+
+    def put(self, state):
+        state.last_access = time.monotonic()
+        self._entries[state.user_id] = state
+        self._entries.move_to_end(state.user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, user_id):
+        self._entries.pop(user_id, None)
+        self._dirty.pop(user_id, None)
+
+    def mark_dirty(self, state):
+        self._dirty[state.user_id] = state
+
+    def mark_clean(self, state):
+        self._dirty.pop(state.user_id, None)
+        state.persisted = True
+
+    def is_dirty(self, user_id):
+        return user_id in self._dirty
+
+    def dirty_states(self):
+        return list(self._dirty.values())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "dirty": len(self._dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
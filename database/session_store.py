@@ -0,0 +1,224 @@
+import asyncio
+import datetime
+import logging
+import os
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from database.db import AsyncSessionLocal, write_lock
+from database.kv_store import DEFAULT_ADDRESS, KVClient
+from database.models import UserSession
+from database.session_cache import SessionCache, SessionState
+
+# Sessions not written for this long are deleted by the sweeper (0 disables it)
+SESSION_TTL_SECONDS = float(os.environ.get("MEDBOT_SESSION_TTL_HOURS", "720")) * 3600
+SWEEP_INTERVAL_SECONDS = float(os.environ.get("MEDBOT_SESSION_SWEEP_SECONDS", "3600"))
+
+logger = logging.getLogger("medbot.session_store")
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in medbot.db's user_sessions table.
+
+    With a SessionCache in front, hot sessions are served from memory and
+    WebSocket turns stay dirty until write_back(); that is only coherent when
+    one process serves all requests. Without a cache (several workers sharing
+    the file), every load reads the row and every turn is written through.
+    """
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.swept = 0
+
+    async def load(self, user_id):
+        """
+        Return the SessionState for a user, from the cache when possible.
+        """
+        if self.cache is not None:
+            state = self.cache.get(user_id)
+            if state is not None:
+                return state
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(UserSession).where(UserSession.id == user_id))
+            row = result.scalar_one_or_none()
+        state = SessionState.from_row(row) if row else SessionState(user_id)
+        if self.cache is not None:
+            self.cache.put(state)
+        return state
+
+    async def resume(self, state):
+        """
+        Return the current state for a long-lived connection that holds `state`.
+        A /chat request may have reloaded the user while the connection was idle.
+        """
+        if self.cache is None:
+            return state
+        current = self.cache.get(state.user_id) or state
+        self.cache.put(current)
+        return current
+
+    @staticmethod
+    async def _stage(db, state):
+        values = state.row_values()
+        values["timestamp"] = datetime.datetime.utcnow()
+        updated = 0
+        if state.persisted:
+            result = await db.execute(update(UserSession).where(UserSession.id == state.user_id).values(**values))
+            updated = result.rowcount
+        if not updated:
+            # A new session, or one swept while this state was held in memory.
+            # Another worker may have created the row since this state was loaded.
+            await db.execute(insert(UserSession).values(id=state.user_id, **values)
+                             .on_conflict_do_update(index_elements=["id"], set_=values))
+
+    async def _write(self, states):
+        if self.cache is not None:
+            for state in states:
+                self.cache.mark_dirty(state)
+        async with AsyncSessionLocal() as db:
+            async with write_lock():
+                for state in states:
+                    await self._stage(db, state)
+                await db.commit()
+        for state in states:
+            state.persisted = True
+            if self.cache is not None:
+                self.cache.mark_clean(state)
+
+    async def save(self, state):
+        """
+        Write a session's state in its own transaction.
+        """
+        await self._write([state])
+
+    async def defer(self, state):
+        """
+        Record changes made by a long-lived connection; they are written by
+        write_back() or close(). Written immediately when there is no cache.
+        """
+        if self.cache is None:
+            await self.save(state)
+        else:
+            self.cache.mark_dirty(state)
+
+    async def write_back(self, user_id):
+        if self.cache is not None and self.cache.is_dirty(user_id):
+            await self.save(self.cache.get(user_id))
+
+    def forget(self, user_id):
+        """
+        Drop a state whose changes may not have been written; the next turn reloads it.
+        """
+        if self.cache is not None:
+            self.cache.discard(user_id)
+
+    async def close(self):
+        """
+        Write back every dirty session in one transaction (used on shutdown).
+        """
+        if self.cache is not None:
+            states = self.cache.dirty_states()
+            if states:
+                await self._write(states)
+
+    async def sweep(self, max_age_seconds, batch_size=500):
+        """
+        Delete sessions that haven't been written for max_age_seconds, in
+        transactions of batch_size sessions so turns get the write lock in
+        between. Returns the number of sessions removed.
+        """
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=max_age_seconds)
+        removed = 0
+        expired = select(UserSession.id).where(UserSession.timestamp < cutoff).limit(batch_size)
+        while True:
+            async with AsyncSessionLocal() as db:
+                async with write_lock():
+                    # Triggers remove the sessions' session_symptoms and session_answers rows
+                    result = await db.execute(delete(UserSession).where(UserSession.id.in_(expired)))
+                    await db.commit()
+            removed += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        self.swept += removed
+        return removed
+
+    async def stats(self):
+        stats = {"backend": "sqlite", "swept": self.swept, "cache": None}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+class KVSessionStore:
+    """
+    Sessions in the shared key-value server (database/kv_store.py).
+
+    Every load reads the server and every turn is written through, so all
+    workers see the same state. Values are the user_sessions column values.
+    """
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.client = KVClient(address)
+
+    async def load(self, user_id):
+        values = await self.client.get(user_id)
+        return SessionState.from_values(user_id, values) if values else SessionState(user_id)
+
+    async def resume(self, state):
+        # Written through on every turn, so a connection's own copy is current
+        return state
+
+    async def save(self, state):
+        await self.client.set(state.user_id, state.row_values())
+        state.persisted = True
+
+    async def defer(self, state):
+        await self.save(state)
+
+    async def write_back(self, user_id):
+        pass
+
+    async def sweep(self, max_age_seconds, batch_size=500):
+        # The KV server only keeps sessions in memory, so they end with it
+        return 0
+
+    def forget(self, user_id):
+        pass
+
+    async def close(self):
+        await self.client.close()
+
+    async def stats(self):
+        return {"backend": "kv", "address": self.client.address, "requests": self.client.requests,
+                "server": await self.client.stats()}
+
+
+def make_session_store():
+    """
+    Build the session store selected by the environment (see serve.py):
+    MEDBOT_SESSION_STORE is "sqlite" (default) or "kv" (at MEDBOT_KV_ADDRESS).
+    The SQLite store only caches sessions in process when MEDBOT_WORKERS is 1.
+    """
+    backend = os.environ.get("MEDBOT_SESSION_STORE", "sqlite")
+    if backend == "kv":
+        return KVSessionStore(os.environ.get("MEDBOT_KV_ADDRESS", DEFAULT_ADDRESS))
+    if backend != "sqlite":
+        raise ValueError(f"Unknown MEDBOT_SESSION_STORE {backend!r}")
+    workers = int(os.environ.get("MEDBOT_WORKERS", "1"))
+    return SQLiteSessionStore(SessionCache() if workers == 1 else None)
+
+
+async def sweep_periodically(store, max_age_seconds=SESSION_TTL_SECONDS, interval=SWEEP_INTERVAL_SECONDS):
+    """
+    Run store.sweep() every `interval` seconds until cancelled.
+    """
+    if max_age_seconds <= 0:
+        return
+    while True:
+        try:
+            removed = await store.sweep(max_age_seconds)
+            if removed:
+                logger.info("Swept %d expired sessions", removed)
+        except Exception:
+            logger.exception("Session sweep failed")
+        await asyncio.sleep(interval)
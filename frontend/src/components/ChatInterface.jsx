@@ -1,6 +1,9 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './ChatInterface.css';
 
+const API_URL = 'http://localhost:8000';
+const WS_URL = 'ws://localhost:8000/ws/chat';
+
 const DISCLAIMER = `⚠️ IMPORTANT: I provide general information only and cannot replace professional medical advice. For emergencies, call your local emergency number immediately.`;
 
 // Helper to generate a UUID (v4, simple version)
@@ -18,6 +21,11 @@ function ChatInterface() {
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
   const [userId, setUserId] = useState(null);
+  // Persistent chat channel; replies stream in line by line.
+  // Falls back to POST /chat while the socket is not open.
+  const socketRef = useRef(null);
+  // Index of the bot message the current reply is being streamed into
+  const replyIndexRef = useRef(null);
 
   useEffect(() => {
     let uid = localStorage.getItem('medbot_user_id');
@@ -28,21 +36,82 @@ function ChatInterface() {
     setUserId(uid);
   }, []);
 
+  useEffect(() => {
+    if (!userId) return;
+    let closed = false;
+    let retryTimer = null;
+
+    const connect = () => {
+      const socket = new WebSocket(`${WS_URL}?user_id=${encodeURIComponent(userId)}`);
+      socket.onmessage = (event) => {
+        const frame = JSON.parse(event.data);
+        if (frame.type === 'emergency') {
+          setMessages(msgs => [...msgs, { sender: 'bot', text: frame.text }]);
+        } else if (frame.type === 'line') {
+          setMessages(msgs => {
+            const index = replyIndexRef.current;
+            if (index === null || index >= msgs.length) {
+              replyIndexRef.current = msgs.length;
+              return [...msgs, { sender: 'bot', text: frame.text }];
+            }
+            const updated = [...msgs];
+            updated[index] = { ...updated[index], text: updated[index].text + '\n' + frame.text };
+            return updated;
+          });
+        } else if (frame.type === 'done') {
+          replyIndexRef.current = null;
+          setLoading(false);
+        } else if (frame.type === 'error') {
+          // Turned away (rate limited or busy) or a malformed frame
+          const retry = frame.retry_after ? ` Please try again in ${frame.retry_after} s.` : '';
+          setMessages(msgs => [...msgs, { sender: 'bot', text: `${frame.detail}${retry}` }]);
+          replyIndexRef.current = null;
+          setLoading(false);
+        }
+      };
+      socket.onclose = () => {
+        if (socketRef.current === socket) socketRef.current = null;
+        replyIndexRef.current = null;
+        setLoading(false);
+        if (!closed) retryTimer = setTimeout(connect, 2000);
+      };
+      socketRef.current = socket;
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (socketRef.current) socketRef.current.close();
+    };
+  }, [userId]);
+
   const sendMessage = async () => {
     if (!input.trim() || !userId) return;
     const userMsg = { sender: 'user', text: input };
     setMessages(msgs => [...msgs, userMsg]);
     setInput('');
     setLoading(true);
+    const socket = socketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      replyIndexRef.current = null;
+      socket.send(JSON.stringify({ message: input }));
+      return;
+    }
     try {
-      const res = await fetch('http://localhost:8000/chat', {
+      const res = await fetch(`${API_URL}/chat`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ message: input, user_id: userId })
       });
-      if (!res.ok) throw new Error('Network response was not ok');
       const data = await res.json();
-      setMessages(msgs => [...msgs, { sender: 'bot', text: data.response }]);
+      if (res.status === 429 || res.status === 503) {
+        setMessages(msgs => [...msgs, { sender: 'bot', text: data.detail }]);
+      } else if (!res.ok) {
+        throw new Error('Network response was not ok');
+      } else {
+        setMessages(msgs => [...msgs, { sender: 'bot', text: data.response }]);
+      }
     } catch (err) {
       setMessages(msgs => [...msgs, { sender: 'bot', text: "Sorry, I couldn't reach the MedBot server. Please try again later." }]);
     }
@@ -0,0 +1,148 @@
+"""
+Prebuilt analyzer artifact: the compiled phrase matcher, fuzzy index,
+semantic index and condition index, so a starting server doesn't rebuild them.
+
+The file is a one-line JSON header followed by a pickle of the structures. The
+header records the format version and a fingerprint of the inputs (phrase
+lexicon, the symptoms, conditions and remedies rows, and the source of the
+modules whose objects are pickled). SymptomAnalyzer loads the artifact with a
+single read when both match and otherwise builds everything from scratch as
+before, so a stale artifact is never used.
+
+Unpickling runs code from the file, so the server only loads an artifact from
+the path in MEDBOT_ANALYZER_ARTIFACT, never one it happens to find in its
+working directory. Without it, everything is built at startup.
+
+Rebuild it after changing the synonyms, symptoms, conditions or remedies
+tables, the emergency phrases or the matching code:
+    PYTHONPATH=. python3 models/analyzer_artifact.py [path]
+"""
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import time
+
+from database.db import DATABASE_PATH
+from models.lexicon import build_lexicon
+from utils.semantic_index import ENABLED as SEMANTIC_MATCHING
+
+FORMAT_VERSION = 3
+MAGIC = "medbot-analyzer"
+# Where the artifact is loaded from (and written to by default); unset, none is used
+DEFAULT_PATH = os.environ.get("MEDBOT_ANALYZER_ARTIFACT")
+# Modules whose classes are pickled into the artifact; a change to any of them
+# invalidates it
+PICKLED_MODULES = ("utils.phrase_matcher", "utils.fuzzy_index", "utils.semantic_index", "database.knowledge_base")
+
+logger = logging.getLogger("medbot.artifact")
+
+
+def source_fingerprint(synonym_map, db_path=DATABASE_PATH):
+    """
+    Hash everything the artifact is built from.
+    Reads the tables with the sqlite3 module directly; this is much cheaper
+    than loading them through the ORM and rebuilding the indexes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for name in PICKLED_MODULES:
+        with open(importlib.import_module(name).__file__, "rb") as f:
+            digest.update(hashlib.blake2b(f.read(), digest_size=16).digest())
+    # The lexicon covers synonym_map plus the emergency and intent phrases
+    digest.update(repr(sorted(build_lexicon(synonym_map).items())).encode())
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        for query in ("SELECT id, name FROM symptoms ORDER BY id",
+                      "SELECT id, name, description, severity_level FROM conditions ORDER BY id",
+                      "SELECT id, condition_id, remedy_text, safety_notes FROM remedies ORDER BY id"):
+            digest.update(repr(conn.execute(query).fetchall()).encode())
+    finally:
+        conn.close()
+    return digest.hexdigest()
+
+
+def save_artifact(analyzer, path=DEFAULT_PATH, db_path=DATABASE_PATH):
+    """
+    Write the analyzer's compiled structures to `path`.
+    """
+    fuzzy_index = analyzer.fuzzy_index
+    if fuzzy_index._packed is None:
+        fuzzy_index._pack()
+    fuzzy_index._memo = {}
+    # Built even when semantic matching is off, so turning it on needs no rebuild
+    semantic_index = analyzer.semantic_index or analyzer.build_semantic_index()
+    semantic_index.prepare()
+    header = {
+        "magic": MAGIC,
+        "format": FORMAT_VERSION,
+        "fingerprint": source_fingerprint(analyzer.synonym_map, db_path),
+        "built": time.time(),
+    }
+    payload = {
+        "phrase_matcher": analyzer.phrase_matcher,
+        "known_symptoms": analyzer.known_symptoms,
+        "fuzzy_index": fuzzy_index,
+        "semantic_index": semantic_index,
+        "knowledge_base": analyzer.knowledge_base,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(json.dumps(header).encode() + b"\n")
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # Replace atomically so a starting server never reads a half-written file
+    os.replace(tmp_path, path)
+    return header
+
+
+def load_artifact(analyzer, path=DEFAULT_PATH, db_path=DATABASE_PATH):
+    """
+    Install the compiled structures from `path` on the analyzer.
+    Returns False (leaving the analyzer untouched) if the file is missing, was
+    written by another format version, or was built from different inputs.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return False
+    end = data.find(b"\n")
+    try:
+        header = json.loads(data[:end])
+    except ValueError:
+        header = {}
+    if header.get("magic") != MAGIC or header.get("format") != FORMAT_VERSION:
+        logger.warning("Ignoring %s: not a format %d analyzer artifact.", path, FORMAT_VERSION)
+        return False
+    try:
+        fingerprint = source_fingerprint(analyzer.synonym_map, db_path)
+    except (OSError, sqlite3.Error):
+        return False
+    if header.get("fingerprint") != fingerprint:
+        logger.warning("Ignoring %s: built from different synonyms, symptoms, conditions or code; rebuild it.", path)
+        return False
+    payload = pickle.loads(data[end + 1:])
+    analyzer.phrase_matcher = payload["phrase_matcher"]
+    analyzer.known_symptoms = payload["known_symptoms"]
+    analyzer.fuzzy_index = payload["fuzzy_index"]
+    analyzer.semantic_index = payload["semantic_index"] if SEMANTIC_MATCHING else None
+    if analyzer.semantic_index is not None:
+        analyzer.semantic_index.prepare()
+    analyzer.knowledge_base = payload["knowledge_base"]
+    return True
+
+
+if __name__ == "__main__":
+    from models.symptom_analyzer import SymptomAnalyzer
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    if not path:
+        sys.exit("Pass the path to write, or set MEDBOT_ANALYZER_ARTIFACT.")
+    start = time.perf_counter()
+    analyzer = SymptomAnalyzer(artifact_path=None)
+    save_artifact(analyzer, path)
+    print(f"Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB, {len(analyzer.knowledge_base.conditions)} conditions, "
+          f"{len(analyzer.known_symptoms)} symptoms) in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,157 @@
+"""
+Offline triage of many messages through the same turn logic as /chat.
+
+Input records are either single turns, {"user_id": ..., "message": ...}, or
+whole sessions, {"user_id": ..., "messages": [...]}. Turns with the same
+user_id share a session and are replayed in input order, starting from a fresh
+session; a record without a user_id is a session of its own. Nothing is
+written to the database. One NDJSON result is produced per turn.
+
+Each chunk of turns is extracted and replayed in a worker thread, so a large
+/chat/batch request doesn't hold up the event loop while other requests wait.
+
+Usage:
+    PYTHONPATH=. python3 models/batch_triage.py messages.ndjson > results.ndjson
+    cat messages.ndjson | PYTHONPATH=. python3 models/batch_triage.py -
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from config.medical_config import DISCLAIMER
+from database.session_cache import SessionState
+from models.chat_flow import run_turn
+
+# Records are triaged in chunks: each chunk's distinct messages are extracted
+# in one pass before its turns are replayed.
+CHUNK_SIZE = 5000
+# Memoized results are dropped past this many entries to bound memory on huge inputs
+MEMO_LIMIT = 200000
+# Most turns (single messages plus the messages of whole sessions) one
+# /chat/batch request may carry
+MAX_REQUEST_TURNS = int(os.environ.get("MEDBOT_MAX_BATCH_TURNS", "10000"))
+
+
+class _MemoAnalyzer:
+    """
+    Analyzer wrapper that reuses extraction and scoring results within a batch.
+    Replayed traffic repeats a lot ("yes", "3 days", "headache"), so most turns
+    never reach the matcher. The analyzer's own extraction cache is left to
+    live traffic.
+    """
+    def __init__(self, analyzer):
+        self._analyzer = analyzer
+        self.synonym_map = analyzer.synonym_map
+        self._extractions = {}
+        self._analyses = {}
+
+    def extract_many(self, texts):
+        if len(self._extractions) > MEMO_LIMIT:
+            self._extractions.clear()
+        if len(self._analyses) > MEMO_LIMIT:
+            self._analyses.clear()
+        for text in set(texts) - self._extractions.keys():
+            self._extractions[text] = self._analyzer.extract(text, use_cache=False)
+
+    def extract(self, text, scan=None):
+        result = self._extractions.get(text)
+        if result is None:
+            result = self._extractions[text] = self._analyzer.extract(text, scan, use_cache=False)
+        return result
+
+    def analyze(self, symptoms, top_k=None):
+        key = (tuple(symptoms), top_k)
+        result = self._analyses.get(key)
+        if result is None:
+            result = self._analyses[key] = self._analyzer.analyze(symptoms, top_k)
+        return result
+
+
+def _turns(records):
+    for index, record in enumerate(records):
+        user_id = record.get("user_id") or f"batch-{index}"
+        if "messages" in record:
+            for message in record["messages"]:
+                yield user_id, message
+        else:
+            yield user_id, record["message"]
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def count_turns(records):
+    return sum(len(record["messages"]) if "messages" in record else 1 for record in records)
+
+
+async def _replay(memo, sessions, chunk, remedy_for):
+    memo.extract_many(message for _, message in chunk)
+    responses = []
+    for user_id, message in chunk:
+        session = sessions.get(user_id)
+        if session is None:
+            session = sessions[user_id] = SessionState(user_id)
+        response_text, _ = await run_turn(memo, session, message, remedy_for)
+        responses.append(response_text)
+    return responses
+
+
+async def triage(analyzer, records):
+    """
+    Replay records through run_turn and yield one result dict per turn.
+    """
+    memo = _MemoAnalyzer(analyzer)
+    kb = analyzer.knowledge_base
+    kb.ensure_loaded()
+    sessions = {}
+
+    async def remedy_for(condition_name):
+        return kb.remedy_for(condition_name)
+
+    index = 0
+    for chunk in _chunks(_turns(records), CHUNK_SIZE):
+        # run_turn never waits on anything here (remedies come from the
+        # snapshot), so the chunk runs to completion on a loop of its own
+        responses = await asyncio.to_thread(asyncio.run, _replay(memo, sessions, chunk, remedy_for))
+        for (user_id, message), response_text in zip(chunk, responses):
+            yield {"index": index, "user_id": user_id, "message": message,
+                   "response": response_text, "disclaimer": DISCLAIMER}
+            index += 1
+
+
+def _read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+async def _main(args):
+    from models.symptom_analyzer import SymptomAnalyzer
+
+    analyzer = SymptomAnalyzer()
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    count = 0
+    start = time.perf_counter()
+    with source:
+        async for result in triage(analyzer, _read_ndjson(source)):
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            count += 1
+    elapsed = time.perf_counter() - start
+    print(f"Triaged {count} turns in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f}/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Triage NDJSON messages offline.")
+    parser.add_argument("input", help="NDJSON file of messages or sessions, or - for stdin")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,123 @@
+from config.medical_config import DISCLAIMER, EMERGENCY_NOTICE, SLOT_DURATION, SLOT_SEVERITY
+from models.dialogue import dialogue
+from utils.metrics import span
+
+RESET_COMMANDS = ["reset", "start over", "clear"]
+GREETING = "Hello! I'm MedBot, your preliminary health assistant. How are you feeling today? Please describe your symptoms."
+
+
+async def run_turn(analyzer, session, user_message, remedy_for, scan=None, event=None):
+    """
+    Advance a session by one user message.
+    Shared by /chat and the batch triage path so both give the same answers.
+    Args:
+        analyzer: SymptomAnalyzer (or anything with the same interface)
+        session (SessionState): updated in place
+        user_message (str): the user's message
+        remedy_for: async callable, condition name -> (remedy_text, safety_notes) or None
+        scan: analyzer.scan(user_message), if the caller already ran it
+        event: optional dict, filled with what the turn found for the analytics
+            rollups: stage, canonical symptoms, intent and top condition
+    Returns:
+        (response_text, logged): logged is False for turns that are not written
+        to the conversation log (session resets)
+    """
+    session_canonicals = session.canonicals
+
+    # Reset session if user requests
+    if user_message.strip().lower() in RESET_COMMANDS:
+        session.reset()
+        _note(event, "reset")
+        return GREETING, False
+
+    # If a follow-up is pending, treat this message as its answer
+    if session.dialogue:
+        session.answers.append([dialogue.question_id(session.dialogue), user_message])
+        session.dialogue = dialogue.advance(session.dialogue)
+        if session.dialogue:
+            # Ask the next follow-up
+            _note(event, "follow_up")
+            return dialogue.question_text(session.dialogue) + "\n\n" + DISCLAIMER, True
+        # If no follow-ups left, fall through to diagnosis below
+
+    # Track if new symptoms were added
+    with span("extract"):
+        symptoms, intent, is_emergency = analyzer.extract(user_message, scan)
+    canonicals = [analyzer.synonym_map.get(s, s) for s in symptoms]
+    new_symptom_added = False
+    for s in canonicals:
+        if s not in session_canonicals:
+            session_canonicals.append(s)
+            new_symptom_added = True
+
+    # Only generate follow-ups if a new symptom was added
+    if new_symptom_added:
+        # Use the most recently added canonical symptom for follow-ups
+        main_canonical = canonicals[-1] if canonicals else session_canonicals[-1]
+        # Ask the first follow-up
+        session.dialogue = dialogue.start(main_canonical)
+        _note(event, "new_symptom", canonicals, intent)
+        return dialogue.question_text(session.dialogue) + "\n\n" + DISCLAIMER, True
+
+    # If no follow-ups and no new symptoms, proceed to diagnosis and summary
+    with span("analyze"):
+        analysis = analyzer.analyze(session_canonicals, top_k=1) if session_canonicals else []
+    # Remedy suggestion (for top condition)
+    with span("remedy"):
+        remedy = await remedy_for(analysis[0]["condition"]) if analysis else None
+    _note(event, "summary", canonicals, intent, analysis[0]["condition"] if analysis else None)
+    return compose_summary(session, analysis, intent, is_emergency, remedy), True
+
+
+def _note(event, stage, symptoms=(), intent=None, condition=None):
+    if event is not None:
+        event.update(stage=stage, symptoms=list(symptoms), intent=intent, condition=condition)
+
+
+def compose_summary(session, analysis, intent, is_emergency, remedy):
+    """
+    Build the personalized summary shown at the end of a dialogue.
+    """
+    remedy_text, safety_notes = remedy or (None, None)
+    summary_lines = []
+    if session.canonicals:
+        summary_lines.append(f"You reported: {', '.join(session.canonicals)}.")
+    # Add follow-up answers to summary
+    duration = None
+    severity = None
+    for question_id, a in session.answers:
+        slot = dialogue.slot(question_id)
+        if slot == SLOT_DURATION:
+            duration = a
+            summary_lines.append(f"Duration: {a}.")
+        elif slot == SLOT_SEVERITY:
+            severity = a
+            summary_lines.append(f"Severity: {a}/10.")
+    # Add warnings if needed
+    warning = ""
+    try:
+        if severity and int(severity) >= 8:
+            warning = "Your symptoms are quite severe. Please consider seeking medical attention promptly."
+        if duration and any(word in duration.lower() for word in ["week", "10 days", "long", "persistent"]):
+            warning = "Your symptoms have lasted a long time. Please consult a healthcare provider."
+    except Exception:
+        pass
+    if warning:
+        summary_lines.append(f"⚠️ {warning}")
+    # Add condition/remedy
+    if is_emergency:
+        summary_lines.append(EMERGENCY_NOTICE)
+    elif intent == "remedy_request" and remedy_text:
+        summary_lines.append(f"Possible condition: {analysis[0]['condition']}")
+        summary_lines.append(f"Home remedy: {remedy_text}")
+        summary_lines.append(f"Safety notes: {safety_notes}")
+    elif analysis:
+        summary_lines.append(f"Possible condition: {analysis[0]['condition']}")
+        if remedy_text:
+            summary_lines.append(f"Home remedy: {remedy_text}")
+            summary_lines.append(f"Safety notes: {safety_notes}")
+    else:
+        summary_lines.append("I'm sorry, I couldn't identify your symptoms. Please provide more details.")
+    summary_lines.append("")
+    summary_lines.append(DISCLAIMER)
+    return "\n".join(summary_lines)
@@ -0,0 +1,87 @@
+import re
+
+from config.medical_config import FOLLOWUP_TEMPLATES, GENERIC_FOLLOWUPS
+
+
+class DialogueMachine:
+    """
+    Follow-up question flows compiled into integer question ids and answer slots.
+
+    A session's position in the dialogue is the pair [symptom, step]: which
+    flow is running and the index of the question awaiting an answer. Answers
+    are stored as [question_id, text] pairs, so the summary reads slots by id
+    instead of searching question texts.
+    """
+    def __init__(self, templates, generic):
+        self.questions = []
+        self._flows = {}
+        for symptom, flow in templates.items():
+            self._flows[symptom] = [self._add_question(slot, text) for slot, text in flow]
+        self._generic_flow = [self._add_question(slot, text) for slot, text in generic]
+        # Reverse lookup for sessions saved before question ids existed
+        self._legacy = {}
+        for symptom, flow in self._flows.items():
+            for step, qid in enumerate(flow):
+                self._legacy[self.questions[qid][1]] = (symptom, step)
+        self._generic_patterns = [
+            re.compile("^" + re.escape(self.questions[qid][1]).replace(re.escape("{symptom}"), "(.+)") + "$")
+            for qid in self._generic_flow
+        ]
+
+    def _add_question(self, slot, text):
+        self.questions.append((slot, text))
+        return len(self.questions) - 1
+
+    def flow(self, symptom):
+        return self._flows.get(symptom, self._generic_flow)
+
+    def question_id(self, state):
+        symptom, step = state
+        return self.flow(symptom)[step]
+
+    def question_text(self, state):
+        symptom, step = state
+        return self.questions[self.flow(symptom)[step]][1].replace("{symptom}", symptom)
+
+    def slot(self, question_id):
+        return self.questions[question_id][0]
+
+    def start(self, symptom):
+        """
+        Return the dialogue state for the first follow-up about a symptom.
+        """
+        return [symptom, 0]
+
+    def advance(self, state):
+        """
+        Return the state for the next question in the flow, or None when done.
+        """
+        symptom, step = state
+        if step + 1 < len(self.flow(symptom)):
+            return [symptom, step + 1]
+        return None
+
+    def _legacy_state(self, text):
+        if text in self._legacy:
+            return list(self._legacy[text])
+        for step, pattern in enumerate(self._generic_patterns):
+            match = pattern.match(text)
+            if match:
+                return [match.group(1), step]
+        return None
+
+    def upgrade_legacy(self, answers):
+        """
+        Convert an old {question text: answer, 'current_followup': text} dict
+        into (answers, dialogue state). Unknown questions are dropped.
+        """
+        upgraded = []
+        for text, answer in answers.items():
+            state = self._legacy_state(text) if text != "current_followup" else None
+            if state is not None:
+                upgraded.append([self.question_id(state), answer])
+        current = answers.get("current_followup")
+        return upgraded, self._legacy_state(current) if current else None
+
+
+dialogue = DialogueMachine(FOLLOWUP_TEMPLATES, GENERIC_FOLLOWUPS)
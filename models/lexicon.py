@@ -0,0 +1,81 @@
+"""
+The tagged phrase table compiled into SymptomAnalyzer's phrase matcher.
+
+Each phrase carries one or more tags:
+    ("symptom", canonical)       synonym_map entries
+    ("emergency", symptom)       emergency symptoms and their synonyms
+    ("intent", intent)           remedy and feedback keywords
+so a single scan of a message finds symptoms, emergencies and intent together.
+"""
+import functools
+
+from utils.phrase_matcher import tokenize
+from utils.safety_checker import emergency_phrases
+
+SYMPTOM = "symptom"
+EMERGENCY = "emergency"
+INTENT = "intent"
+
+# When a message matches several intents, the first one listed wins
+INTENT_PHRASES = {
+    "remedy_request": ["remedy", "remedies", "home remedy", "treatment", "treatments", "what can i do"],
+    "feedback": ["feedback", "suggestion", "suggestions", "complaint", "complaints"],
+}
+DEFAULT_INTENT = "symptom_report"
+
+
+def phrase_key(phrase):
+    """
+    The normalized form a phrase is stored under: its tokens joined by spaces.
+    """
+    return " ".join(tokenize(phrase.lower()))
+
+
+def build_lexicon(synonym_map):
+    """
+    Return {phrase: tags} for synonym_map plus the emergency and intent
+    phrases. Phrases are normalized to their tokens; tags is a tuple of
+    (kind, value) pairs with at most one pair per kind.
+    """
+    lexicon = {}
+
+    def tag(phrase, kind, value):
+        key = phrase_key(phrase)
+        if key:
+            lexicon.setdefault(key, {})[kind] = value
+
+    red_flags = emergency_phrases()
+    emergency_symptoms = set(red_flags.values())
+    for phrase, canonical in synonym_map.items():
+        tag(phrase, SYMPTOM, canonical)
+        # A synonym of an emergency symptom is an emergency too
+        if canonical in emergency_symptoms:
+            tag(phrase, EMERGENCY, canonical)
+    for phrase, symptom in red_flags.items():
+        tag(phrase, EMERGENCY, symptom)
+    for intent, phrases in INTENT_PHRASES.items():
+        for phrase in phrases:
+            tag(phrase, INTENT, intent)
+    return {phrase: tuple(sorted(tags.items())) for phrase, tags in lexicon.items()}
+
+
+@functools.lru_cache(maxsize=None)
+def _fixed_tags():
+    # Tags of the emergency and intent phrases, which override anything a
+    # synonym contributes (as in build_lexicon), and the emergency symptoms
+    return build_lexicon({}), frozenset(emergency_phrases().values())
+
+
+def synonym_entry(phrase, canonical):
+    """
+    Return the (key, tags) build_lexicon gives a synonym_map entry, for
+    adding it to a compiled matcher in place. key is "" for a phrase with no
+    tokens.
+    """
+    fixed, emergency_symptoms = _fixed_tags()
+    key = phrase_key(phrase)
+    tags = dict(fixed.get(key, ()))
+    tags[SYMPTOM] = canonical
+    if canonical in emergency_symptoms:
+        tags.setdefault(EMERGENCY, canonical)
+    return key, tuple(sorted(tags.items()))
@@ -1,177 +1,228 @@
-from database.db import SessionLocal
-from database.models import Condition
-import difflib
+import time
+
+import numpy as np
+
+from database.knowledge_base import KnowledgeBase, read_lexicon
+from models.analyzer_artifact import DEFAULT_PATH as DEFAULT_ARTIFACT_PATH, load_artifact
+from models.lexicon import DEFAULT_INTENT, EMERGENCY, INTENT_PHRASES, SYMPTOM, build_lexicon, synonym_entry
+from utils.extraction_cache import ExtractionCache, message_key
+from utils.phrase_matcher import PhraseMatcher, tokenize
+from utils.fuzzy_index import FuzzyIndex
+from utils.semantic_index import ENABLED as SEMANTIC_MATCHING, SemanticIndex
 
 class SymptomAnalyzer:
     """
     Analyzes symptoms, maps to conditions, and assigns confidence scores.
     """
-    def __init__(self):
-        # Expanded synonym/phrase mapping for better symptom extraction
-        self.synonym_map = {
-            # Headache
-            "my head is hurting": "headache",
-            "head is hurting": "headache",
-            "pain in my head": "headache",
-            "head hurts": "headache",
-            "head is aching": "headache",
-            "my head aches": "headache",
-            "pounding head": "headache",
-            "throbbing head": "headache",
-            "pressure in head": "headache",
-            # Fatigue/Tiredness
-            "body feels weak": "fatigue",
-            "i feel weak": "fatigue",
-            "feeling weak": "fatigue",
-            "tired": "tiredness",
-            "i am tired": "tiredness",
-            "i feel tired": "tiredness",
-            "no energy": "fatigue",
-            "exhausted": "fatigue",
-            "worn out": "fatigue",
-            "drained": "fatigue",
-            "lethargic": "fatigue",
-            "my body is heavy": "fatigue",
-            "my eyes feel heavy": "fatigue",
-            # Fever
-            "i have a fever": "fever",
-            "running a temperature": "fever",
-            "high temperature": "fever",
-            "feeling hot": "fever",
-            "chills and fever": "fever",
-            # Sore Throat
-            "my throat hurts": "sore throat",
-            "throat is sore": "sore throat",
-            "scratchy throat": "sore throat",
-            "throat pain": "sore throat",
-            "throat is dry": "sore throat",
-            "throat is itchy": "sore throat",
-            "my throat is dry and itchy": "sore throat",
-            # Cough
-            "i am coughing": "cough",
-            "i have a cough": "cough",
-            "persistent cough": "cough",
-            "dry cough": "cough",
-            "wet cough": "cough",
-            # Runny Nose
-            "my nose is runny": "runny nose",
-            "runny nose": "runny nose",
-            "stuffy nose": "congestion",
-            "blocked nose": "congestion",
-            "nasal congestion": "congestion",
-            # Nausea
-            "i feel nauseous": "nausea",
-            "nauseous": "nausea",
-            "i feel sick": "nausea",
-            "queasy": "nausea",
-            # Dizziness
-            "i feel dizzy": "dizziness",
-            "i am dizzy": "dizziness",
-            "feeling dizzy": "dizziness",
-            "dizzy": "dizziness",
-            "lightheaded": "dizziness",
-            "i am lightheaded": "dizziness",
-            "my head is spinning": "dizziness",
-            # Sweating
-            "i am sweating": "sweating",
-            "sweating profusely": "sweating",
-            "i am sweating a lot": "sweating",
-            "excessive sweating": "sweating",
-            # Chest pain/heaviness
-            "my chest hurts": "chest pain",
-            "pain in chest": "chest pain",
-            "tightness in chest": "chest pain",
-            "my chest feels heavy": "chest pain",
-            "pressure in chest": "chest pain",
-            "chest discomfort": "chest pain",
-            # Shortness of breath
-            "hard to breathe": "shortness of breath",
-            "breathless": "shortness of breath",
-            "difficulty breathing": "shortness of breath",
-            "i can't catch my breath": "shortness of breath",
-            # Muscle aches
-            "my muscles ache": "muscle aches",
-            "muscles are sore": "muscle aches",
-            "body aches": "muscle aches",
-            # Joint pain
-            "my joints hurt": "joint pain",
-            "joints are stiff": "joint pain",
-            "joint pain": "joint pain",
-            # Chills
-            "i have chills": "chills",
-            "i am shivering": "chills",
-            # Abdominal pain
-            "my stomach hurts": "abdominal pain",
-            "stomach is hurting": "abdominal pain",
-            "stomach ache": "abdominal pain",
-            "belly pain": "abdominal pain",
-            # Rash
-            "skin rash": "rash",
-            "itchy skin": "rash",
-            "red spots": "rash",
-            # Loss of appetite
-            "not hungry": "loss of appetite",
-            "no appetite": "loss of appetite",
-        }
-        # List of canonical symptoms for fuzzy matching
-        db = SessionLocal()
-        self.known_symptoms = [s for s in set(self.synonym_map.values())]
-        db.close()
+    def __init__(self, artifact_path=DEFAULT_ARTIFACT_PATH):
+        # Phrase -> canonical symptom, from the synonyms table (seeded by
+        # database/migrations.py, extended with database/ingest.py)
+        rows, self.symptom_details = read_lexicon()
+        self.synonym_map = {phrase: canonical for row_id, phrase, canonical in rows}
+        # symptom_details: canonical symptom -> (body_part, severity_indicators)
+        # Highest synonym id loaded; refresh_lexicon() reads the rows above it
+        self.lexicon_revision = rows[-1][0] if rows else 0
+        # Bumped whenever the vocabulary changes so derived indexes can be rebuilt
+        self.vocab_version = 0
+        # Results of extract() for recently seen messages, dropped on every vocab_version bump
+        self.extraction_cache = ExtractionCache()
+        # Use the prebuilt matcher and indexes when an up-to-date artifact exists
+        # (see models/analyzer_artifact.py); otherwise build them here
+        if artifact_path and load_artifact(self, artifact_path):
+            self.vocab_version += 1
+            return
+        self.rebuild_index()
+        # Condition snapshot used by analyze(); reload with knowledge_base.load()
+        self.knowledge_base = KnowledgeBase()
+        self.knowledge_base.load(vocabulary=self.known_symptoms)
 
-    def extract_and_classify(self, text):
+    def rebuild_index(self):
         """
-        Extract symptoms and classify intent from user input.
-        Returns (symptoms, intent)
+        Recompile the matching structures from synonym_map.
+        Call this after editing synonym_map directly.
+        """
+        # Symptoms, emergency phrases and intent keywords share one matcher
+        self.phrase_matcher = PhraseMatcher(build_lexicon(self.synonym_map))
+        # List of canonical symptoms for fuzzy matching: every symptom in the
+        # table, whether or not a phrase maps to it
+        self.known_symptoms = [s for s in set(self.synonym_map.values()) | set(self.symptom_details)]
+        self.fuzzy_index = FuzzyIndex(self.known_symptoms)
+        # Optional last resort for messages neither pass understood (see utils/semantic_index.py)
+        self.semantic_index = self.build_semantic_index() if SEMANTIC_MATCHING else None
+        self.vocab_version += 1
+
+    def build_semantic_index(self):
+        """
+        Index every phrase and canonical symptom name for semantic matching.
+        """
+        entries = list(self.synonym_map.items()) + [(symptom, symptom) for symptom in self.known_symptoms]
+        index = SemanticIndex(entries)
+        index.prepare()
+        return index
+
+    def update_synonyms(self, mapping):
+        """
+        Add or replace phrase -> canonical symptom mappings and rebuild the matcher.
+        """
+        self.synonym_map.update(mapping)
+        self.rebuild_index()
+
+    def refresh_lexicon(self):
+        """
+        Pick up synonyms and symptoms added to the database since the last
+        read, updating the matching structures in place.
+        Returns the number of phrases added or changed.
+        """
+        rows, self.symptom_details = read_lexicon(self.lexicon_revision)
+        mapping = {phrase: canonical for row_id, phrase, canonical in rows}
+        # Symptoms without any phrase yet still become fuzzy-match targets
+        added = self.symptom_details.keys() - set(self.known_symptoms)
+        for symptom in added:
+            self.known_symptoms.append(symptom)
+            self.fuzzy_index.add(symptom)
+            if self.semantic_index is not None:
+                self.semantic_index.add(symptom, symptom)
+        if added and not mapping:
+            # add_synonyms() bumps it otherwise
+            self.vocab_version += 1
+        if mapping:
+            self.add_synonyms(mapping)
+            self.lexicon_revision = rows[-1][0]
+        return len(mapping)
+
+    def add_synonyms(self, mapping):
+        """
+        Add or replace phrase -> canonical symptom mappings, updating the
+        matcher and fuzzy index in place instead of rebuilding them.
         """
-        text_lower = text.lower()
+        known = set(self.known_symptoms)
+        for phrase, canonical in mapping.items():
+            key, tags = synonym_entry(phrase, canonical)
+            if not key:
+                continue
+            self.synonym_map[phrase] = canonical
+            self.phrase_matcher.add(key, tags)
+            if self.semantic_index is not None:
+                self.semantic_index.add(phrase, canonical)
+            if canonical not in known:
+                known.add(canonical)
+                self.known_symptoms.append(canonical)
+                self.fuzzy_index.add(canonical)
+                if self.semantic_index is not None:
+                    self.semantic_index.add(canonical, canonical)
+        self.vocab_version += 1
+
+    def apply_ingest(self, changes):
+        """
+        Apply rows just written by database/ingest.py in place. changes holds
+        the ids written per table (see IngestResult.changes); the rows
+        themselves are re-read from the database.
+        """
+        if changes.get("synonyms") or changes.get("symptoms"):
+            # New and changed phrases have ids above lexicon_revision, and new
+            # symptoms without phrases become fuzzy-match targets here too
+            self.refresh_lexicon()
+        if changes.get("conditions") or changes.get("remedies"):
+            self.knowledge_base.reload_rows(changes.get("conditions", ()), changes.get("remedies", ()))
+
+    def scan(self, text):
+        """
+        Run the phrase matcher over a message once.
+        Returns (symptoms, intent, is_emergency), where symptoms only holds
+        exact phrase matches; extract() adds fuzzy matches on top.
+        """
+        return self._scan_tokens(tokenize(text.lower()))
+
+    def _scan_tokens(self, tokens):
         found = set()
-        # Synonym/phrase matching
-        for phrase, canonical in self.synonym_map.items():
-            if phrase in text_lower:
-                found.add(canonical)
+        intents = set()
+        is_emergency = False
+        for tags in self.phrase_matcher.find_tokens(tokens):
+            for kind, value in tags:
+                if kind == SYMPTOM:
+                    found.add(value)
+                elif kind == EMERGENCY:
+                    is_emergency = True
+                else:
+                    intents.add(value)
+        intent = next((i for i in INTENT_PHRASES if i in intents), DEFAULT_INTENT)
+        return found, intent, is_emergency
+
+    def extract(self, text, scan=None, use_cache=True):
+        """
+        Extract symptoms, classify intent and detect emergency symptoms.
+        Pass scan(text) if the caller already ran it.
+        Repeated messages are answered from extraction_cache; use_cache=False
+        leaves the cache and its stats alone, for callers with their own memo.
+        Returns (symptoms, intent, is_emergency)
+        """
+        key, tokens, words = message_key(text)
+        cached = self.extraction_cache.get(key, self.vocab_version) if use_cache else None
+        if cached is not None:
+            symptoms, intent, is_emergency = cached
+            # Callers may modify the list
+            return list(symptoms), intent, is_emergency
+        start = time.perf_counter()
+        found, intent, is_emergency = scan or self._scan_tokens(tokens)
+        found = set(found)
         # Fuzzy matching for single words (lower cutoff for more matches)
-        words = text_lower.replace('.', '').replace(',', '').split()
         for word in words:
-            close = difflib.get_close_matches(word, self.known_symptoms, n=1, cutoff=0.7)
+            close = self.fuzzy_index.best_match(word, 0.7)
             if close:
-                found.add(close[0])
+                found.add(close)
         # Fuzzy matching for 2- and 3-word phrases (lower cutoff)
         for n in [2, 3]:
             for i in range(len(words) - n + 1):
                 phrase = ' '.join(words[i:i+n])
-                close = difflib.get_close_matches(phrase, self.known_symptoms, n=1, cutoff=0.65)
+                close = self.fuzzy_index.best_match(phrase, 0.65)
                 if close:
-                    found.add(close[0])
-        # Intent classification
-        if any(word in text_lower for word in ["remedy", "home remedy", "treatment", "what can i do"]):
-            intent = "remedy_request"
-        elif any(word in text_lower for word in ["feedback", "suggestion", "complaint"]):
-            intent = "feedback"
-        else:
-            intent = "symptom_report"
-        return list(found), intent
+                    found.add(close)
+        if not found and self.semantic_index is not None:
+            found.update(self.semantic_index.match(tokens))
+        symptoms = list(found)
+        if use_cache:
+            self.extraction_cache.put(key, self.vocab_version, (tuple(symptoms), intent, is_emergency),
+                                      time.perf_counter() - start)
+        return symptoms, intent, is_emergency
+
+    def extract_and_classify(self, text):
+        """
+        Extract symptoms and classify intent from user input.
+        Returns (symptoms, intent)
+        """
+        symptoms, intent, _ = self.extract(text)
+        return symptoms, intent
 
-    def analyze(self, symptoms):
+    def analyze(self, symptoms, top_k=None):
         """
         Map symptoms to potential conditions and assign confidence scores.
         Args:
             symptoms (list): List of extracted symptoms
+            top_k (int): Only return the best top_k conditions (default: all)
         Returns:
             list of dict: [{"condition": str, "confidence": float}]
         """
-        db = SessionLocal()
-        results = []
-        for cond in db.query(Condition).all():
-            score = 0
-            cond_desc = (cond.description or '').lower()
-            for symptom in symptoms:
-                canonical = self.synonym_map.get(symptom, symptom)
-                if canonical in cond_desc:
-                    score += 1
-            if score > 0:
-                confidence = score / len(symptoms)
-                results.append({"condition": cond.name, "confidence": round(confidence, 2)})
-        db.close()
+        kb = self.knowledge_base
+        kb.ensure_loaded()
+        if not symptoms:
+            return []
+        canonicals = [self.synonym_map.get(symptom, symptom) for symptom in symptoms]
+        indexes, counts = kb.match_counts(canonicals)
+        total = len(symptoms)
+        if top_k is not None and top_k < len(counts):
+            # Keep everything that could round to the k-th best confidence, so
+            # ties are broken by table order exactly as in the full ranking
+            kth = np.partition(counts, len(counts) - top_k)[len(counts) - top_k]
+            floor = kth
+            while floor > 1 and round((floor - 1) / total, 2) == round(kth / total, 2):
+                floor -= 1
+            keep = counts >= floor
+            indexes, counts = indexes[keep], counts[keep]
+        # Conditions come back in table order, so the stable sort keeps ties as before
+        results = [
+            {"condition": kb.conditions[index]["name"], "confidence": round(count / total, 2)}
+            for index, count in zip(indexes.tolist(), counts.tolist())
+        ]
         # Sort by confidence descending
         results.sort(key=lambda x: x["confidence"], reverse=True)
-        return results 
\ No newline at end of file
+        return results if top_k is None else results[:top_k]
@@ -0,0 +1,121 @@
+"""
+Pre-fork multi-worker server.
+
+The app (and with it the symptom analyzer and knowledge base snapshot) is
+built once in the parent, which then forks N uvicorn workers that share the
+listening socket and the analyzer's memory copy-on-write. With more than one
+worker, session state must live somewhere every worker sees:
+
+    --store kv      the parent also runs the shared key-value server
+                    (database/kv_store.py); sessions live in its memory
+    --store sqlite  sessions stay in medbot.db without an in-process cache;
+                    workers contend for the SQLite writer lock (baseline)
+
+Each worker holds its own copy of the analyzer, knowledge base and reference
+cache, and an admin call (/admin/reload-knowledge-base, refresh-lexicon,
+apply-ingest) reaches only the worker that accepts it. That worker records the
+change in medbot.db (database/admin_changes.py), and every worker polls for
+changes it hasn't seen yet every MEDBOT_ADMIN_POLL_SECONDS (1 s) and applies
+them in a background thread. So other workers pick a change up within a poll
+interval, not when the admin call returns. Tables edited by hand still need one
+of the admin calls before any worker notices.
+
+Turns for one user are serialized by a lock in each worker, not across
+workers. Two turns for the same user that run at once on different workers
+can each load the session before the other saves it, and the later save wins.
+The frontend sends one message at a time, so it never does this.
+
+Usage:
+    PYTHONPATH=. python3 serve.py --workers 4 --store kv --port 8000
+"""
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def start_kv_server(address):
+    pid = os.fork()
+    if pid == 0:
+        from database.kv_store import KVServer
+
+        signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+        # Ctrl-C reaches the whole process group; the parent stops this last
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        asyncio.run(KVServer().serve(address))
+        os._exit(0)
+    deadline = time.time() + 10
+    while not os.path.exists(address):
+        if time.time() > deadline:
+            raise RuntimeError("key-value server did not start")
+        time.sleep(0.05)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run MedBot with several pre-forked workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--store", choices=["kv", "sqlite"], default="kv")
+    parser.add_argument("--kv-address", default=f"/tmp/medbot-kv-{os.getpid()}.sock")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    os.environ["MEDBOT_SESSION_STORE"] = args.store
+    os.environ["MEDBOT_KV_ADDRESS"] = args.kv_address
+    os.environ["MEDBOT_WORKERS"] = str(args.workers)
+    children = []
+    if args.store == "kv":
+        children.append(start_kv_server(args.kv_address))
+
+    import uvicorn
+    import app
+    from database.db import engine, async_engine
+
+    # Connections opened while building the app must not be shared across processes
+    engine.dispose()
+    async_engine.sync_engine.dispose()
+    # Keep the garbage collector from touching (and so copying) the shared objects
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    config = uvicorn.Config(app.app, log_level=args.log_level)
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            uvicorn.Server(config).run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers ({args.store} sessions)",
+          file=sys.stderr)
+
+    def stop(signum, frame):
+        # Workers first, so they can write back sessions before the store goes away
+        for pid in reversed(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        if os.path.exists(args.kv_address):
+            os.unlink(args.kv_address)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while True:
+        signal.pause()
+
+
+if __name__ == "__main__":
+    main()
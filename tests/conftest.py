@@ -0,0 +1,21 @@
+import shutil
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import knowledge_base
+
+
+@pytest.fixture
+def scratch_db(tmp_path, monkeypatch):
+    """
+    Run against a copy of medbot.db. The lexicon readers and ingest() open
+    ./medbot.db; the SQLAlchemy engine was bound to the real file at import.
+    """
+    shutil.copy("medbot.db", tmp_path / "medbot.db")
+    monkeypatch.chdir(tmp_path)
+    engine = create_engine(f"sqlite:///{tmp_path / 'medbot.db'}")
+    monkeypatch.setattr(knowledge_base, "SessionLocal", sessionmaker(bind=engine))
+    yield tmp_path
+    engine.dispose()
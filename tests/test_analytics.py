@@ -0,0 +1,84 @@
+import asyncio
+import datetime
+import random
+import sqlite3
+
+import pytest
+
+from database import analytics
+from database.conversation_log import ConversationLog
+
+STAGES = ["new_symptom", "follow_up", "summary", "reset"]
+INTENTS = ["symptom_report", "greeting", None]
+
+
+def events(rng, count, days):
+    start = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+    for _ in range(count):
+        stamp = start + datetime.timedelta(seconds=rng.random() * days * 86400)
+        stage = rng.choice(STAGES)
+        yield analytics.turn_event(f"user {rng.randrange(5)}", {
+            "stage": stage,
+            "intent": rng.choice(INTENTS),
+            # Repeats within a turn count once
+            "symptoms": rng.choices(["headache", "fever", "cough", "nausea"], k=rng.randint(0, 3)),
+            "condition": rng.choice(["Migraine", "Common cold"]) if stage == "summary" else None,
+            "emergency": rng.random() < 0.1,
+            # Every bucket, the open-ended top one included
+            "latency_ms": rng.choice([0.0, 5.0, 7.5, 99.9, 100.0, 4000.0, 12000.0]) + rng.random(),
+        }, stamp.isoformat())
+
+
+def snapshot(conn):
+    return (conn.execute("SELECT * FROM turn_rollup_daily ORDER BY day").fetchall(),
+            conn.execute("SELECT * FROM value_rollup_daily ORDER BY dimension, day, value").fetchall())
+
+
+def rebuilt(conn):
+    totals, values = snapshot(conn)
+    count = analytics.rebuild(conn)
+    assert count == conn.execute("SELECT COUNT(*) FROM turn_events").fetchone()[0]
+    # Latency sums are added up batch by batch, so only equal up to rounding
+    incremental = ([(*row[:4], pytest.approx(row[4]), row[5]) for row in totals], values)
+    return incremental, snapshot(conn)
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 1000])
+def test_incremental_rollups_match_a_rebuild(batch_size):
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(analytics.SCHEMA)
+    batch = []
+    for event in events(random.Random(batch_size), 500, days=10):
+        batch.append(event)
+        if len(batch) == batch_size:
+            with conn:
+                analytics.write_events(conn, batch)
+            batch = []
+    if batch:
+        with conn:
+            analytics.write_events(conn, batch)
+
+    incremental, full = rebuilt(conn)
+    assert len(incremental[0]) == 10
+    assert full == incremental
+
+
+def test_logged_turns_match_a_rebuild(tmp_path):
+    # Through the conversation log, with records in between the events
+    log = ConversationLog(str(tmp_path / "conversations.db"), batch_size=16)
+
+    async def record():
+        rng = random.Random(0)
+        for i, event in enumerate(events(rng, 200, days=1)):
+            await log.append_async(event["user_id"], "chat", f"message {i}", "reply")
+            await log.record_turn_async(event["user_id"], event)
+
+    asyncio.run(record())
+    assert log.close()
+    assert log.stats()["turn_events"] == 200 and log.stats()["dropped"] == 0
+
+    conn = sqlite3.connect(log.path)
+    incremental, full = rebuilt(conn)
+    assert sum(row[1] for row in incremental[0]) == 200
+    assert full == incremental
+    conn.close()
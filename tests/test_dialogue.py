@@ -0,0 +1,94 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from config.medical_config import DISCLAIMER, SLOT_DURATION, SLOT_SEVERITY
+from database.session_cache import SessionState
+from models.chat_flow import run_turn
+from models.dialogue import dialogue
+from models.symptom_analyzer import SymptomAnalyzer
+
+# A session saved before follow-ups were compiled to question ids: answers
+# keyed by question text, the pending question under "current_followup"
+LEGACY_SORE_THROAT = {
+    "symptoms": "[]",
+    "conditions_suggested": "[]",
+    "canonicals": '["sore throat"]',
+    "answers": '{"How long have you had your sore throat?": "Two days", '
+               '"current_followup": "On a scale of 1-10, how severe is your sore throat?"}',
+    "followups": '["Are you also experiencing any cough or fever?"]',
+}
+
+
+@pytest.fixture
+def analyzer(scratch_db):
+    return SymptomAnalyzer(artifact_path=None)
+
+
+async def no_remedy(condition):
+    return None
+
+
+def turn(analyzer, session, message):
+    response, logged = asyncio.run(run_turn(analyzer, session, message, no_remedy))
+    assert logged
+    return response
+
+
+def test_committed_legacy_session_is_upgraded():
+    # The session stored in medbot.db is in the old format
+    conn = sqlite3.connect("medbot.db")
+    row = conn.execute("SELECT id, symptoms, conditions_suggested, canonicals, answers, followups "
+                       "FROM user_sessions").fetchone()
+    conn.close()
+    user_id, *columns = row
+    state = SessionState.from_values(user_id, dict(zip(LEGACY_SORE_THROAT, columns)))
+    assert dict(zip(LEGACY_SORE_THROAT, columns)) == LEGACY_SORE_THROAT
+    assert state.dialogue == ["sore throat", 1]
+
+
+def test_legacy_session_asks_the_next_follow_up(analyzer):
+    session = SessionState.from_values("legacy", LEGACY_SORE_THROAT)
+    assert session.dialogue == ["sore throat", 1]
+    [(question_id, answer)] = session.answers
+    assert dialogue.slot(question_id) == SLOT_DURATION and answer == "Two days"
+
+    # The pending question is answered, so the third sore throat question is next
+    assert turn(analyzer, session, "7") == "Are you also experiencing any cough or fever?\n\n" + DISCLAIMER
+    assert session.dialogue == ["sore throat", 2]
+    assert dialogue.slot(session.answers[-1][0]) == SLOT_SEVERITY
+
+    summary = turn(analyzer, session, "no")
+    assert session.dialogue is None
+    assert "Duration: Two days." in summary and "Severity: 7/10." in summary
+
+    # Saved again in the new format, and loaded back unchanged
+    reloaded = SessionState.from_values("legacy", session.row_values())
+    assert reloaded.answers == session.answers and reloaded.dialogue is None
+
+
+def test_legacy_generic_session_asks_the_next_follow_up(analyzer):
+    session = SessionState.from_values("legacy", dict(LEGACY_SORE_THROAT, canonicals='["rash"]', answers=(
+        '{"How long have you had your rash?": "a week", "Where does it itch?": "arms", '
+        '"current_followup": "On a scale of 1-10, how severe is your rash?"}')))
+    # The generic flow is matched with the symptom filled in; unknown questions are dropped
+    assert session.dialogue == ["rash", 1]
+    assert [dialogue.slot(question_id) for question_id, _ in session.answers] == [SLOT_DURATION]
+
+    # The generic flow has no third question, so the answer leads to the summary
+    summary = turn(analyzer, session, "4")
+    assert session.dialogue is None
+    assert "You reported: rash." in summary and "Duration: a week." in summary and "Severity: 4/10." in summary
+
+
+def test_legacy_session_without_a_pending_question(analyzer):
+    session = SessionState.from_values("legacy", dict(LEGACY_SORE_THROAT, answers=(
+        '{"How long have you had your sore throat?": "Two days", '
+        '"On a scale of 1-10, how severe is your sore throat?": "3", '
+        '"Are you also experiencing any cough or fever?": "no"}')))
+    assert session.dialogue is None and len(session.answers) == 3
+
+    # A new symptom starts its own flow from the first question
+    assert turn(analyzer, session, "I also have a headache").startswith("How long have you had your headache?")
+    assert session.dialogue == ["headache", 0]
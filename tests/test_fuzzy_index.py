@@ -0,0 +1,73 @@
+import csv
+import difflib
+import random
+
+import pytest
+
+from database.migrations import SEED_SYNONYMS_PATH
+from utils.fuzzy_index import FuzzyIndex
+
+# The cutoffs SymptomAnalyzer.extract() uses for words and for 2- and 3-word phrases
+CUTOFFS = [0.7, 0.65]
+
+
+def seed_lexicon():
+    with open(SEED_SYNONYMS_PATH, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    symptoms = list(dict.fromkeys(row["symptom"] for row in rows))
+    return symptoms, symptoms + [row["phrase"] for row in rows]
+
+
+def typos(term, rng):
+    # A dropped, a doubled and a swapped character
+    i = rng.randrange(len(term))
+    j = min(i + 1, len(term) - 1)
+    swapped = list(term)
+    swapped[i], swapped[j] = swapped[j], swapped[i]
+    return [term[:i] + term[i + 1:], term[:i] + term[i] + term[i:], "".join(swapped)]
+
+
+def queries(vocabulary):
+    rng = random.Random(0)
+    found = []
+    for term in vocabulary:
+        found.append(term)
+        found.extend(typos(term, rng))
+        found.extend(term.split())
+    # Empty, one character and non-ASCII input
+    found += ["", "a", "e", "x", "é", "naüsea", "fièvre", "hèadache", "头痛", "🤒 fever", "ﬁnger pain"]
+    return found
+
+
+def expected(query, vocabulary, cutoff):
+    matches = difflib.get_close_matches(query, vocabulary, n=1, cutoff=cutoff)
+    return matches[0] if matches else None
+
+
+# The small vocabulary (canonical symptoms) is scored term by term, the large
+# one (every phrase too) goes through the packed LCS search
+@pytest.mark.parametrize("which", ["symptoms", "symptoms and phrases"])
+def test_best_match_agrees_with_difflib(which):
+    symptoms, everything = seed_lexicon()
+    vocabulary = symptoms if which == "symptoms" else everything
+    index = FuzzyIndex(vocabulary)
+    for cutoff in CUTOFFS:
+        for query in queries(vocabulary):
+            assert index.best_match(query, cutoff) == expected(query, vocabulary, cutoff), (query, cutoff)
+
+
+@pytest.mark.parametrize("padding", [0, 100])
+def test_ties_go_to_the_larger_term(padding):
+    # "abcx" scores 0.75 against both; get_close_matches keeps the larger string
+    vocabulary = ["abce", "abcd"] + [f"unrelated term {i}" for i in range(padding)]
+    index = FuzzyIndex(vocabulary)
+    assert index.best_match("abcx", 0.7) == expected("abcx", vocabulary, 0.7) == "abce"
+
+
+def test_terms_added_later_are_found():
+    symptoms, everything = seed_lexicon()
+    index = FuzzyIndex(everything)
+    assert index.best_match("earache", 0.7) == expected("earache", everything, 0.7) != "earache"
+    # The memoized answer must not outlive the new term
+    index.add("earache")
+    assert index.best_match("earache", 0.7) == "earache"
@@ -0,0 +1,48 @@
+from database.ingest import ingest
+from models.symptom_analyzer import SymptomAnalyzer
+
+
+def test_synonym_only_ingest_is_applied_live(scratch_db):
+    analyzer = SymptomAnalyzer(artifact_path=None)
+    message = "my tummy is doing cartwheels"
+    assert "nausea" not in analyzer.extract(message)[0]
+
+    (scratch_db / "synonyms.csv").write_text("phrase,symptom\ntummy is doing cartwheels,nausea\n")
+    result = ingest([("synonyms", str(scratch_db / "synonyms.csv"))])
+    assert len(result.changes["synonyms"]) == 1
+    assert not result.changes["conditions"] and not result.changes["remedies"]
+
+    analyzer.apply_ingest(result.changes)
+    assert "nausea" in analyzer.extract(message)[0]
+
+
+def test_symptom_only_ingest_is_applied_live(scratch_db):
+    analyzer = SymptomAnalyzer(artifact_path=None)
+
+    (scratch_db / "symptoms.csv").write_text("name,body_part,severity_indicators\nearache,ear,\n")
+    result = ingest([("symptoms", str(scratch_db / "symptoms.csv"))])
+    assert len(result.changes["symptoms"]) == 1
+
+    analyzer.apply_ingest(result.changes)
+    assert "earache" in analyzer.extract("i have an earache")[0]
+
+
+def test_ingested_conditions_and_remedies_are_reread(scratch_db):
+    analyzer = SymptomAnalyzer(artifact_path=None)
+
+    (scratch_db / "conditions.csv").write_text(
+        "name,description,severity_level\nEar infection,Causes earache and fever.,moderate\n")
+    (scratch_db / "remedies.csv").write_text(
+        "condition,remedy_text,safety_notes\nEar infection,Warm compress.,See a doctor if it lasts.\n")
+    result = ingest([("conditions", str(scratch_db / "conditions.csv")),
+                     ("remedies", str(scratch_db / "remedies.csv"))])
+
+    # Only ids travel; the rows come from the database
+    analyzer.apply_ingest(result.changes)
+    kb = analyzer.knowledge_base
+    assert kb.conditions[-1]["name"] == "Ear infection"
+    assert kb.remedy_for("Ear infection") == ("Warm compress.", "See a doctor if it lasts.")
+    # Ids that aren't in the database change nothing
+    version = kb.version
+    analyzer.apply_ingest({"conditions": [10 ** 9], "remedies": [10 ** 9]})
+    assert kb.conditions[-1]["name"] == "Ear infection" and kb.version == version + 1
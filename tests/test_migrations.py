@@ -0,0 +1,148 @@
+import csv
+import shutil
+import sqlite3
+
+import pytest
+
+from database.migrations import LATEST_VERSION, SEED_SYNONYMS_PATH, migrate
+
+# The schema medbot.db had before migrations existed (user_version 0)
+LEGACY_SCHEMA = """
+CREATE TABLE conditions (id INTEGER NOT NULL, name VARCHAR NOT NULL, description TEXT,
+    severity_level VARCHAR, PRIMARY KEY (id));
+CREATE INDEX ix_conditions_id ON conditions (id);
+CREATE TABLE symptoms (id INTEGER NOT NULL, name VARCHAR NOT NULL, body_part VARCHAR,
+    severity_indicators TEXT, PRIMARY KEY (id));
+CREATE INDEX ix_symptoms_id ON symptoms (id);
+CREATE TABLE conversations (id INTEGER NOT NULL, user_id VARCHAR, messages TEXT, timestamp DATETIME,
+    PRIMARY KEY (id));
+CREATE INDEX ix_conversations_id ON conversations (id);
+CREATE TABLE user_sessions (id VARCHAR NOT NULL, symptoms TEXT, conditions_suggested TEXT, canonicals TEXT,
+    answers TEXT, followups TEXT, timestamp DATETIME, PRIMARY KEY (id));
+CREATE INDEX ix_user_sessions_id ON user_sessions (id);
+CREATE TABLE remedies (id INTEGER NOT NULL, condition_id INTEGER, remedy_text TEXT NOT NULL, safety_notes TEXT,
+    PRIMARY KEY (id), FOREIGN KEY(condition_id) REFERENCES conditions (id));
+CREATE INDEX ix_remedies_id ON remedies (id);
+"""
+
+INDEXES = {
+    "ix_conditions_name", "ix_symptoms_name", "ix_remedies_condition_id", "ix_conversations_user_id",
+    "ix_user_sessions_timestamp", "ix_session_symptoms_symptom", "ix_session_answers_question_id",
+    "ix_synonyms_symptom_id",
+}
+TRIGGERS = {"session_details_insert", "session_details_update", "session_details_delete"}
+
+
+def schema_names(conn, kind):
+    return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def session_details(conn, session_id):
+    symptoms = conn.execute("SELECT position, symptom FROM session_symptoms WHERE session_id = ? "
+                            "ORDER BY position", (session_id,)).fetchall()
+    answers = conn.execute("SELECT position, question_id, answer FROM session_answers WHERE session_id = ? "
+                           "ORDER BY position", (session_id,)).fetchall()
+    return symptoms, answers
+
+
+def save_session(conn, session_id, canonicals, answers):
+    conn.execute("INSERT INTO user_sessions (id, canonicals, answers) VALUES (?, ?, ?)",
+                 (session_id, canonicals, answers))
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.execute("INSERT INTO symptoms (name) VALUES ('headache')")
+    save_session(conn, "current", '["headache", "fever"]', '[[1, "yes"], [2, "3 days"]]')
+    # Answers saved before follow-ups had question ids were keyed by question text
+    save_session(conn, "old", '["sore throat"]', '{"How long have you had your sore throat?": "Two days"}')
+    save_session(conn, "broken", "not json", None)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def v4_db(tmp_path):
+    # The committed medbot.db as it was at version 4, before admin_changes
+    path = str(tmp_path / "medbot.db")
+    shutil.copy("medbot.db", path)
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE IF EXISTS admin_changes")
+    conn.execute("PRAGMA user_version = 4")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_migrates_a_legacy_database_to_the_latest_version(legacy_db):
+    assert migrate(legacy_db) == list(range(1, LATEST_VERSION + 1))
+    assert migrate(legacy_db) == []
+
+    conn = sqlite3.connect(legacy_db)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == LATEST_VERSION
+    assert INDEXES <= schema_names(conn, "index")
+    assert TRIGGERS <= schema_names(conn, "trigger")
+    assert {"session_symptoms", "session_answers", "synonyms", "admin_changes"} <= schema_names(conn, "table")
+
+    # Existing sessions were backfilled
+    assert session_details(conn, "current") == ([(0, "headache"), (1, "fever")], [(0, 1, "yes"), (1, 2, "3 days")])
+    assert session_details(conn, "old") == ([(0, "sore throat")], [])
+    assert session_details(conn, "broken") == ([], [])
+
+    # Every seed phrase points at its symptom; the existing symptom row is reused
+    with open(SEED_SYNONYMS_PATH, newline="", encoding="utf-8") as f:
+        seeds = list(csv.DictReader(f))
+    synonyms = conn.execute("SELECT COUNT(*) FROM synonyms JOIN symptoms ON symptoms.id = synonyms.symptom_id"
+                            ).fetchone()[0]
+    assert synonyms == len(seeds)
+    assert conn.execute("SELECT COUNT(*) FROM symptoms WHERE name = 'headache'").fetchone()[0] == 1
+    conn.close()
+
+
+def test_migrates_the_version_4_database(v4_db):
+    conn = sqlite3.connect(v4_db)
+    sessions = conn.execute("SELECT COUNT(*) FROM user_sessions").fetchone()[0]
+    synonyms = conn.execute("SELECT COUNT(*) FROM synonyms").fetchone()[0]
+    conn.close()
+
+    assert migrate(v4_db) == [5]
+
+    conn = sqlite3.connect(v4_db)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == LATEST_VERSION
+    assert "admin_changes" in schema_names(conn, "table")
+    assert INDEXES <= schema_names(conn, "index")
+    assert TRIGGERS <= schema_names(conn, "trigger")
+    assert conn.execute("SELECT COUNT(*) FROM user_sessions").fetchone()[0] == sessions
+    assert conn.execute("SELECT COUNT(*) FROM synonyms").fetchone()[0] == synonyms
+    conn.execute("INSERT INTO admin_changes (kind) VALUES ('reload')")
+    assert conn.execute("SELECT created_at IS NOT NULL FROM admin_changes").fetchone()[0] == 1
+    conn.close()
+
+
+def test_triggers_keep_session_details_in_step(legacy_db):
+    migrate(legacy_db)
+    conn = sqlite3.connect(legacy_db)
+
+    save_session(conn, "new", '["nausea"]', '[[3, "no"]]')
+    assert session_details(conn, "new") == ([(0, "nausea")], [(0, 3, "no")])
+
+    # An update replaces the rows, including ones past the new end
+    conn.execute("UPDATE user_sessions SET canonicals = '[\"cough\"]', answers = '[]' WHERE id = 'new'")
+    assert session_details(conn, "new") == ([(0, "cough")], [])
+    conn.execute("UPDATE user_sessions SET answers = '[[4, \"mild\"], [5, null]]' WHERE id = 'new'")
+    assert session_details(conn, "new") == ([(0, "cough")], [(0, 4, "mild"), (1, 5, None)])
+
+    # Invalid JSON and non-array values leave no rows
+    conn.execute("UPDATE user_sessions SET canonicals = 'oops', answers = '{\"q\": \"a\"}' WHERE id = 'new'")
+    assert session_details(conn, "new") == ([], [])
+
+    # Deleting the session (as the sweeper does) clears them
+    conn.execute("DELETE FROM user_sessions WHERE id IN ('new', 'current')")
+    assert session_details(conn, "new") == ([], [])
+    assert session_details(conn, "current") == ([], [])
+    assert session_details(conn, "old") == ([(0, "sore throat")], [])
+    conn.close()
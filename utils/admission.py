@@ -0,0 +1,238 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+# Chat turns per second each user (or client address, without a user_id) may
+# sustain, and how many they may send at once; a rate of 0 turns the limit off
+RATE_PER_SECOND = float(os.environ.get("MEDBOT_RATE_LIMIT_PER_SECOND", "2"))
+BURST = float(os.environ.get("MEDBOT_RATE_LIMIT_BURST", "10"))
+# Priority turns (messages that mention an emergency) spend from a separate,
+# looser bucket per key, so an emergency still gets through after ordinary
+# messages used up the first one, but can't be used to get around the limit
+PRIORITY_RATE_PER_SECOND = float(os.environ.get("MEDBOT_PRIORITY_RATE_LIMIT_PER_SECOND", "4"))
+PRIORITY_BURST = float(os.environ.get("MEDBOT_PRIORITY_RATE_LIMIT_BURST", "20"))
+# Turns per second from one client address, whatever user_id they carry, so
+# switching user_id doesn't get around the limit; looser than the per-user
+# limit as users behind one NAT share it. Priority turns get a bucket of their
+# own with the same settings.
+ADDRESS_RATE_PER_SECOND = float(os.environ.get("MEDBOT_ADDRESS_RATE_LIMIT_PER_SECOND", "10"))
+ADDRESS_BURST = float(os.environ.get("MEDBOT_ADDRESS_RATE_LIMIT_BURST", "50"))
+# Turns processed at once; the rest wait in a queue of bounded length and time
+MAX_CONCURRENT = int(os.environ.get("MEDBOT_MAX_CONCURRENT_TURNS", "32"))
+MAX_QUEUED = int(os.environ.get("MEDBOT_MAX_QUEUED_TURNS", "128"))
+QUEUE_TIMEOUT_SECONDS = float(os.environ.get("MEDBOT_QUEUE_TIMEOUT_SECONDS", "2"))
+# Priority turns wait in a queue of their own, also bounded, but for longer
+MAX_PRIORITY_QUEUED = int(os.environ.get("MEDBOT_MAX_PRIORITY_QUEUED_TURNS", "32"))
+PRIORITY_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("MEDBOT_PRIORITY_QUEUE_TIMEOUT_SECONDS", "10"))
+# Buckets kept; the longest idle are dropped first (they would be full again anyway)
+_MAX_KEYS = 100000
+
+
+class Rejected(Exception):
+    """
+    A turn was not admitted. status_code is 429 (rate limited) or 503
+    (overloaded); retry_after is the suggested wait in whole seconds.
+    """
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    def headers(self):
+        return {"Retry-After": str(self.retry_after)}
+
+
+class RateLimiter:
+    """
+    Token bucket per key: `burst` tokens, refilled at `rate` per second, one
+    spent per turn.
+    """
+    def __init__(self, rate=RATE_PER_SECOND, burst=BURST, max_keys=_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, now=None):
+        """
+        Spend a token for `key`. Returns 0 if there was one, otherwise the
+        seconds until there will be.
+        """
+        now = time.monotonic() if now is None else now
+        tokens, stamp = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - stamp) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    """
+    Admission for chat turns: per-key and per-client-address rate limits in
+    front of a global cap on turns in progress.
+
+    A turn over its key's or its address's rate is refused with 429
+    (check_rate()). Otherwise it runs at once if a slot is free (slot()), or
+    waits in a FIFO queue; when the queue is full, or the wait passes
+    queue_timeout, it is refused with 503, so an overloaded server answers
+    quickly instead of letting every turn's latency grow. Priority
+    turns (messages that mention an emergency) only differ in where they
+    wait: they have their own rate limit bucket, queue and timeout, all
+    looser, and their queue is handed the next free slot before the other.
+    A finishing turn hands its slot straight to the next waiter.
+    """
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_queued=MAX_QUEUED,
+                 queue_timeout=QUEUE_TIMEOUT_SECONDS, limiter=None,
+                 max_priority_queued=MAX_PRIORITY_QUEUED, priority_queue_timeout=PRIORITY_QUEUE_TIMEOUT_SECONDS,
+                 priority_limiter=None, address_limiter=None, priority_address_limiter=None):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.max_priority_queued = max_priority_queued
+        self.priority_queue_timeout = priority_queue_timeout
+        self.limiter = limiter if limiter is not None else (RateLimiter() if RATE_PER_SECOND > 0 else None)
+        if priority_limiter is None and PRIORITY_RATE_PER_SECOND > 0:
+            priority_limiter = RateLimiter(PRIORITY_RATE_PER_SECOND, PRIORITY_BURST)
+        self.priority_limiter = priority_limiter
+        if address_limiter is None and ADDRESS_RATE_PER_SECOND > 0:
+            address_limiter = RateLimiter(ADDRESS_RATE_PER_SECOND, ADDRESS_BURST)
+        if priority_address_limiter is None and ADDRESS_RATE_PER_SECOND > 0:
+            priority_address_limiter = RateLimiter(ADDRESS_RATE_PER_SECOND, ADDRESS_BURST)
+        self.address_limiter = address_limiter
+        self.priority_address_limiter = priority_address_limiter
+        self.in_flight = 0
+        self._waiters = deque()
+        self._priority_waiters = deque()
+        self.admitted = 0
+        self.priority_admitted = 0
+        self.queued = 0
+        self.shed_rate_limited = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._wait_seconds = 0.0
+        # Moving average of how long an admitted turn holds its slot
+        self._service_seconds = 0.01
+
+    def check_rate(self, key, priority=False, address=None):
+        """
+        Spend a turn from key's bucket, and address's when given. Raises
+        Rejected (429) if either is empty. Call it before slot(), and before
+        waiting on anything else, so a turn over the limit is refused at once.
+        """
+        if priority:
+            limits = [(self.priority_address_limiter, address), (self.priority_limiter, key)]
+        else:
+            limits = [(self.address_limiter, address), (self.limiter, key)]
+        for limiter, limit_key in limits:
+            if limiter is None or limit_key is None:
+                continue
+            wait = limiter.take(limit_key)
+            if wait:
+                self.shed_rate_limited += 1
+                raise Rejected(429, "Too many messages; please slow down.", wait)
+
+    @asynccontextmanager
+    async def slot(self, priority=False):
+        """
+        Hold a slot for the duration of the block. Raises Rejected (503) if
+        the turn is not admitted.
+        """
+        await self._acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_seconds += (time.perf_counter() - start - self._service_seconds) * 0.05
+            self._release()
+
+    def _retry_after(self):
+        # About how long the current queue takes to drain
+        return (len(self._waiters) + 1) * self._service_seconds / self.max_concurrent
+
+    async def _acquire(self, priority):
+        if priority:
+            waiters, max_queued, timeout = self._priority_waiters, self.max_priority_queued, self.priority_queue_timeout
+        else:
+            waiters, max_queued, timeout = self._waiters, self.max_queued, self.queue_timeout
+        if self.in_flight < self.max_concurrent and not self._waiters and not self._priority_waiters:
+            self.in_flight += 1
+            self._admitted(priority)
+            return
+        if len(waiters) >= max_queued:
+            self.shed_queue_full += 1
+            raise Rejected(503, "The server is busy; please try again shortly.", self._retry_after())
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        self.queued += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiters, future)
+            # The slot may have been handed over just as the wait timed out
+            if future.done() and not future.cancelled():
+                self._release()
+            self.shed_timeout += 1
+            raise Rejected(503, "The server is busy; please try again shortly.", self._retry_after())
+        except asyncio.CancelledError:
+            self._discard(waiters, future)
+            # The slot may have been handed over just as the client went away
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            self._wait_seconds += time.perf_counter() - start
+        self._admitted(priority)
+
+    def _admitted(self, priority):
+        self.admitted += 1
+        if priority:
+            self.priority_admitted += 1
+
+    @staticmethod
+    def _discard(waiters, future):
+        try:
+            waiters.remove(future)
+        except ValueError:
+            pass
+
+    def _release(self):
+        # Hand the slot to the next live waiter, emergencies first
+        for waiters in (self._priority_waiters, self._waiters):
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": len(self._waiters),
+            "priority_queue_depth": len(self._priority_waiters),
+            "admitted": self.admitted,
+            "priority_admitted": self.priority_admitted,
+            "queued": self.queued,
+            "mean_queue_wait_ms": round(self._wait_seconds / self.queued * 1e3, 3) if self.queued else None,
+            "shed_rate_limited": self.shed_rate_limited,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "rate_limited_keys": len(self.limiter) if self.limiter is not None else 0,
+            "priority_rate_limited_keys": len(self.priority_limiter) if self.priority_limiter is not None else 0,
+            "rate_limited_addresses": len(self.address_limiter) if self.address_limiter is not None else 0,
+        }
@@ -0,0 +1,105 @@
+import os
+from collections import OrderedDict
+
+from utils.phrase_matcher import tokenize
+
+# Distinct messages kept; 0 turns the cache off
+DEFAULT_SIZE = int(os.environ.get("MEDBOT_EXTRACTION_CACHE_SIZE", "10000"))
+
+
+def message_key(text):
+    """
+    Canonical form of a message for the extraction cache.
+    Returns (key, tokens, words): the phrase matcher's tokens and the fuzzy
+    pass's words, which extraction needs anyway, and a key that is equal for
+    two messages exactly when both of those are. Case, whitespace and the
+    punctuation neither pass sees ("Headache." vs "headache") are normalized
+    away; punctuation the fuzzy pass does see ("headache?") stays in the key.
+    """
+    lowered = text.lower()
+    tokens = tokenize(lowered)
+    # The fuzzy pass only strips periods and commas
+    words = lowered.replace('.', '').replace(',', '').split()
+    key = " ".join(tokens)
+    fuzzy = " ".join(words)
+    if fuzzy != key:
+        # Tokens never contain "|", so the two halves can't run together
+        key += "|" + fuzzy
+    return key, tokens, words
+
+
+class ExtractionCache:
+    """
+    Bounded LRU cache of extraction results keyed on message_key().
+
+    Users repeat themselves a lot ("headache", "yes", "3 days", "7"), and each
+    repeat would otherwise go through the phrase matcher and the fuzzy n-gram
+    sweep again. Entries are tagged with the analyzer's vocabulary version;
+    when the lexicon changes the version moves on and the next lookup drops
+    every entry, as in database/reference_cache.py.
+    """
+    def __init__(self, max_size=DEFAULT_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._miss_seconds = 0.0
+        self._saved_seconds = 0.0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        """
+        Return the cached result for `key` under `version`, or None.
+        """
+        self._check_version(version)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        result, seconds = entry
+        self._saved_seconds += seconds
+        return result
+
+    def put(self, key, version, result, seconds=0.0):
+        """
+        Store a result computed under `version`; `seconds` is what computing
+        it cost, which every later hit on it counts as saved.
+        """
+        self._miss_seconds += seconds
+        if not self.max_size:
+            return
+        self._check_version(version)
+        self._entries[key] = (result, seconds)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "vocab_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "miss_latency_ms": round(self._miss_seconds / self.misses * 1e3, 4) if self.misses else None,
+            # What the hits' messages cost to extract when they were first seen
+            "saved_seconds": round(self._saved_seconds, 3),
+        }
@@ -0,0 +1,173 @@
+import math
+from difflib import SequenceMatcher
+
+import numpy as np
+
+# Terms are packed one per uint64 lane, so only the first 64 characters get a bit
+_LANE_BITS = 64
+# Below this many terms, scoring each one directly beats the packed-lane pass
+_SMALL_VOCABULARY = 64
+# Lookups are memoized per (query, cutoff); the memo is cleared when it grows past this
+_MEMO_LIMIT = 50000
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return _BYTE_POPCOUNT[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class FuzzyIndex:
+    """
+    Approximate string lookup over a vocabulary.
+
+    Scores are exactly difflib's SequenceMatcher ratio, so best_match() returns
+    the same term as difflib.get_close_matches(query, terms, n=1, cutoff=cutoff).
+    Instead of running SequenceMatcher against every term, the longest common
+    subsequence of the query with all terms is computed at once with the
+    bit-parallel LCS algorithm over packed uint64 lanes. SequenceMatcher's
+    matching blocks form a common subsequence, so 2 * LCS / (len(a) + len(b))
+    bounds the ratio from above: terms under the cutoff are dropped without
+    being scored and the rest are verified best-bound first. Lanes are sorted
+    by length and only the terms whose length alone allows the cutoff are
+    compared, so lookups don't slow down in proportion to the vocabulary. Small
+    vocabularies are scored directly, and results are memoized per query
+    because the same words and phrases come up again and again.
+    """
+    def __init__(self, terms=()):
+        self.terms = []
+        self._ids = {}
+        self._packed = None
+        self._memo = {}
+        for term in terms:
+            self.add(term)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def add(self, term):
+        """
+        Add a term to the index. Duplicates are ignored.
+        """
+        if term in self._ids:
+            return
+        self._ids[term] = len(self.terms)
+        self.terms.append(term)
+        # Lanes are repacked on the next lookup
+        self._packed = None
+        self._memo = {}
+
+    def _pack(self):
+        # Lanes are sorted by term length, so the terms a query can match
+        # (see _length_range) are one contiguous slice
+        order = sorted(range(len(self.terms)), key=lambda i: len(self.terms[i]))
+        count = len(order)
+        char_masks = {}
+        for lane, i in enumerate(order):
+            for pos, ch in enumerate(self.terms[i][:_LANE_BITS]):
+                char_masks.setdefault(ch, [0] * count)[lane] |= 1 << pos
+        lengths = np.array([len(self.terms[i]) for i in order], dtype=np.int64)
+        packed_lengths = np.minimum(lengths, _LANE_BITS)
+        lane_masks = np.array([(1 << int(n)) - 1 for n in packed_lengths], dtype=np.uint64)
+        self._packed = {
+            "order": np.array(order, dtype=np.intp),
+            "char_masks": {ch: np.array(m, dtype=np.uint64) for ch, m in char_masks.items()},
+            "lengths": lengths,
+            "packed_lengths": packed_lengths,
+            # Characters past the lane width can each add at most one match
+            "overflow": lengths - packed_lengths,
+            "lane_masks": lane_masks,
+        }
+        return self._packed
+
+    @staticmethod
+    def _length_range(length, cutoff):
+        # ratio <= 2 * min(len(a), len(b)) / (len(a) + len(b)), so only terms
+        # within these lengths can reach the cutoff
+        return (math.ceil(length * cutoff / (2.0 - cutoff) - 1e-9),
+                math.floor(length * (2.0 - cutoff) / cutoff + 1e-9) if cutoff > 0 else math.inf)
+
+    def _lcs_lengths(self, query, packed, lo, hi):
+        char_masks = packed["char_masks"]
+        lane_masks = packed["lane_masks"][lo:hi]
+        v = lane_masks.copy()
+        u = np.empty_like(v)
+        carry = np.empty_like(v)
+        for ch in query:
+            mask = char_masks.get(ch)
+            if mask is None:
+                continue
+            mask = mask[lo:hi]
+            np.bitwise_and(v, mask, out=u)
+            np.add(v, u, out=carry)
+            np.subtract(v, u, out=v)
+            np.bitwise_or(v, carry, out=v)
+        np.bitwise_and(v, lane_masks, out=v)
+        return packed["packed_lengths"][lo:hi] - _popcount(v).astype(np.int64) + packed["overflow"][lo:hi]
+
+    def best_match(self, query, cutoff):
+        """
+        Return the closest term with a similarity ratio >= cutoff, or None.
+        """
+        key = (query, cutoff)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        if len(self.terms) <= _SMALL_VOCABULARY:
+            result = self._scan(query, cutoff)
+        else:
+            result = self._search(query, cutoff)
+        if len(self._memo) >= _MEMO_LIMIT:
+            self._memo = {}
+        self._memo[key] = result
+        return result
+
+    def _scan(self, query, cutoff):
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        best = None
+        for term in self.terms:
+            total = len(query) + len(term)
+            if 2.0 * min(len(query), len(term)) / total < cutoff:
+                continue
+            matcher.set_seq1(term)
+            if matcher.quick_ratio() < cutoff:
+                continue
+            score = matcher.ratio()
+            if score >= cutoff and (best is None or (score, term) > best):
+                best = (score, term)
+        return best[1] if best else None
+
+    def _search(self, query, cutoff):
+        if not self.terms or not query:
+            return None
+        packed = self._packed or self._pack()
+        shortest, longest = self._length_range(len(query), cutoff)
+        lo = int(np.searchsorted(packed["lengths"], shortest, side="left"))
+        hi = int(np.searchsorted(packed["lengths"], longest, side="right"))
+        if lo >= hi:
+            return None
+        lcs = np.minimum(self._lcs_lengths(query, packed, lo, hi), len(query))
+        bounds = 2.0 * lcs / (len(query) + packed["lengths"][lo:hi])
+        candidates = np.flatnonzero(bounds >= cutoff)
+        if not len(candidates):
+            return None
+        candidates = candidates[np.argsort(-bounds[candidates], kind="stable")]
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        best = None
+        order = packed["order"]
+        for lane in candidates:
+            bound = bounds[lane]
+            if best is not None and bound < best[0]:
+                break
+            term = self.terms[order[lo + lane]]
+            matcher.set_seq1(term)
+            score = matcher.ratio()
+            # Ties go to the larger string, as in get_close_matches
+            if score >= cutoff and (best is None or (score, term) > best):
+                best = (score, term)
+        return best[1] if best else None
@@ -0,0 +1,151 @@
+"""
+In-process counters and latency histograms exported in the Prometheus text
+format by GET /metrics.
+
+Recording is a couple of dict lookups and additions, so spans can wrap every
+stage of a turn:
+
+    with span("analyze"):
+        analysis = analyzer.analyze(symptoms)
+"""
+import time
+from bisect import bisect_left
+
+# Seconds; covers in-memory stages (tens of microseconds) up to slow commits
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _labels(self.label_names, label_values, [f'le="{_number(bound)}"'])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, gauges=()):
+        """
+        Return the exposition text for every metric plus the given
+        (name, help, value) gauges, which are sampled by the caller.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help, value in gauges:
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {_number(value)}"])
+        return "\n".join(lines) + "\n"
+
+
+def stats_gauges(prefix, stats):
+    """
+    Turn a stats() dict (as served by /admin/metrics) into gauges, skipping
+    values that aren't numbers. Nested dicts extend the name.
+    """
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from stats_gauges(name, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, f"{key} from /admin/metrics", value
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "medbot_stage_seconds", "Time spent in each stage of a chat turn.", labels=("stage",))
+TURNS = REGISTRY.counter("medbot_chat_turns_total", "Chat turns served.", labels=("transport",))
+
+
+class span:
+    """
+    Context manager that records the time spent in a stage into
+    medbot_stage_seconds{stage=...}.
+    """
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
+        return False
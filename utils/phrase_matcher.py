@@ -0,0 +1,67 @@
+import re
+
+# Words are runs of letters, digits and apostrophes, so "can't" stays one token
+# and punctuation never glues two words together.
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    """
+    Split lowercased text into word tokens.
+    """
+    return _TOKEN_RE.findall(text.replace("’", "'"))
+
+
+class PhraseMatcher:
+    """
+    Trie over word tokens that finds every known phrase in one scan of a message.
+    Phrases only match on whole words, so "tired" does not fire inside "untired".
+    """
+    # Marks the end of a phrase inside a trie node (tokens are always strings)
+    _END = None
+
+    def __init__(self, phrases=None):
+        self._root = {}
+        self.size = 0
+        self.max_length = 0
+        for phrase, value in (phrases or {}).items():
+            self.add(phrase, value)
+
+    def add(self, phrase, value):
+        """
+        Insert or replace a phrase. The trie is updated in place.
+        """
+        tokens = tokenize(phrase.lower())
+        if not tokens:
+            return
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if self._END not in node:
+            self.size += 1
+        node[self._END] = value
+        self.max_length = max(self.max_length, len(tokens))
+
+    def find_tokens(self, tokens):
+        """
+        Return the values of every phrase found in a token list, in text order.
+        """
+        root = self._root
+        matches = []
+        for start in range(len(tokens)):
+            node = root.get(tokens[start])
+            pos = start + 1
+            while node is not None:
+                if self._END in node:
+                    matches.append(node[self._END])
+                if pos == len(tokens):
+                    break
+                node = node.get(tokens[pos])
+                pos += 1
+        return matches
+
+    def find_all(self, text):
+        """
+        Return the values of every phrase found in text, in text order.
+        """
+        return self.find_tokens(tokenize(text.lower()))
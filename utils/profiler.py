@@ -0,0 +1,138 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+Enable it with MEDBOT_PROFILE_SLOW_MS=<threshold>. While a tracked request is
+in flight, a background thread samples the stack of the thread serving it
+every MEDBOT_PROFILE_INTERVAL_MS (default 2 ms). Requests slower than the
+threshold get their samples written as folded stacks (one "frame;frame;frame
+count" line per distinct stack, ready for flamegraph.pl or speedscope) to
+MEDBOT_PROFILE_DIR (default ./profiles) by the same thread, so the request
+path never waits on the disk. Faster requests are discarded.
+
+Async requests all run on the event loop thread, so samples taken during a
+slow request also include whatever else the loop ran meanwhile.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from utils.metrics import REGISTRY
+
+logger = logging.getLogger("medbot.profiler")
+
+SLOW_REQUESTS = REGISTRY.counter(
+    "medbot_slow_requests_total", "Requests over the profiling threshold.", labels=("name",))
+
+
+def _folded(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Tracked:
+    __slots__ = ("profiler", "name", "thread_id", "start", "samples")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.samples = Counter()
+        self.profiler._active.add(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._active.discard(self)
+        elapsed_ms = (time.perf_counter() - self.start) * 1e3
+        if elapsed_ms >= self.profiler.threshold_ms:
+            SLOW_REQUESTS.inc(self.name)
+            # Written by the sampler thread
+            self.profiler._reports.append((self, elapsed_ms))
+        return False
+
+
+class _Untracked:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_UNTRACKED = _Untracked()
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold_ms, interval_ms=2.0, out_dir="./profiles", max_samples=5000):
+        self.threshold_ms = threshold_ms
+        self.interval = interval_ms / 1e3
+        self.out_dir = out_dir
+        self.max_samples = max_samples
+        self._active = set()
+        self._reports = deque()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def track(self, name):
+        if self._thread is None:
+            # Started on first use so pre-forked workers each get their own sampler
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                    self._thread.start()
+        return _Tracked(self, name)
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            while self._reports:
+                self._report(*self._reports.popleft())
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for tracked in list(self._active):
+                frame = frames.get(tracked.thread_id)
+                if frame is not None and len(tracked.samples) < self.max_samples:
+                    tracked.samples[_folded(frame)] += 1
+
+    def _report(self, tracked, elapsed_ms):
+        path = os.path.join(self.out_dir, f"{tracked.name}-{time.strftime('%Y%m%d-%H%M%S')}-{id(tracked):x}.folded")
+        try:
+            os.makedirs(self.out_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in tracked.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError:
+            # Keep the sampler thread alive
+            logger.exception("Could not write the profile of a slow %s request", tracked.name)
+            return
+        logger.warning("Slow %s request (%.1f ms, %d samples): %s", tracked.name, elapsed_ms,
+                       sum(tracked.samples.values()), path)
+
+
+class _Disabled:
+    def track(self, name):
+        return _UNTRACKED
+
+
+def make_profiler():
+    """
+    Build the profiler configured by the environment, or a no-op stand-in.
+    """
+    threshold = os.environ.get("MEDBOT_PROFILE_SLOW_MS")
+    if not threshold:
+        return _Disabled()
+    return SlowRequestProfiler(
+        float(threshold),
+        interval_ms=float(os.environ.get("MEDBOT_PROFILE_INTERVAL_MS", "2")),
+        out_dir=os.environ.get("MEDBOT_PROFILE_DIR", "./profiles"),
+    )
@@ -1,12 +1,40 @@
-from config.medical_config import EMERGENCY_SYMPTOMS
+import re
+
+from config.medical_config import EMERGENCY_SYMPTOMS, EMERGENCY_SYNONYMS
+from utils.phrase_matcher import tokenize
+
+
+def emergency_phrases():
+    """
+    Map every phrase that signals an emergency to the emergency symptom it
+    stands for. Entries like "blood in stool/urine" are split into their
+    alternatives ("blood in stool", "blood in urine").
+    """
+    phrases = {}
+    for symptom in EMERGENCY_SYMPTOMS:
+        variants = [[]]
+        for word in symptom.split():
+            variants = [variant + [alternative] for variant in variants for alternative in word.split("/")]
+        for variant in variants:
+            phrases[" ".join(variant)] = symptom
+    phrases.update(EMERGENCY_SYNONYMS)
+    return phrases
+
+
+def _compile(phrases):
+    # Whole-word matches with the same word boundaries as utils.phrase_matcher.tokenize
+    alternatives = sorted((r"[^a-z0-9']+".join(map(re.escape, tokenize(phrase))) for phrase in phrases),
+                          key=len, reverse=True)
+    return re.compile(r"(?<![a-z0-9'])(?:" + "|".join(alternatives) + r")(?![a-z0-9'])")
+
+
+_pattern = _compile(emergency_phrases())
+
 
 def check_emergency_symptoms(text):
     """
-    Check if user input contains any emergency symptoms.
+    Check if user input mentions an emergency symptom or one of its synonyms.
     Returns True if emergency detected, else False.
+    SymptomAnalyzer.scan does the same check in its symptom matching pass.
     """
-    text_lower = text.lower()
-    for symptom in EMERGENCY_SYMPTOMS:
-        if symptom in text_lower:
-            return True
-    return False 
\ No newline at end of file
+    return _pattern.search(text.lower().replace("’", "'")) is not None
@@ -0,0 +1,283 @@
+import math
+import os
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from utils.phrase_matcher import tokenize
+
+# The semantic stage of SymptomAnalyzer.extract is off unless MEDBOT_SEMANTIC_MATCH=1
+ENABLED = os.environ.get("MEDBOT_SEMANTIC_MATCH", "0") == "1"
+# A message gets this long to find matches before the stage gives up
+BUDGET_MS = float(os.environ.get("MEDBOT_SEMANTIC_BUDGET_MS", "5"))
+# Minimum cosine similarity between a message n-gram and a vocabulary phrase
+CUTOFF = 0.8
+# At most this many symptoms are reported per message, best first
+MAX_MATCHES = 3
+
+# Size of the hashed feature space
+_DIMENSIONS = 1 << 14
+# LSH tables, each keyed on up to _MAX_BITS signs of random projections
+_TABLES = 8
+_MAX_BITS = 12
+# Bits per table are chosen so a bucket holds about this many phrases
+_BUCKET_SIZE = 32
+# Up to this many phrases every one is scored, which is exact and cheap enough
+_SMALL_VOCABULARY = 2000
+# Message n-grams of up to this many content words are compared with the phrases
+_MAX_NGRAM = 3
+# N-grams scored per pass; the budget is checked between passes
+_CHUNK = 128
+
+# Words that carry no symptom meaning, dropped from phrases and messages alike
+STOPWORDS = frozenset(
+    "i i'm im me my mine a an the is am are was were be been being have has had having do does did "
+    "it it's its this that and or but so to of in on at for with from by about as "
+    "feel feels feeling felt very really quite bit little kind sort some just got get getting "
+    "lot lots like".split())
+
+
+@lru_cache(maxsize=None)
+def _planes():
+    # Random +-1 hyperplanes for the LSH tables; seeded, so every process agrees
+    rng = np.random.default_rng(0)
+    return (rng.integers(0, 2, (_DIMENSIONS, _TABLES * _MAX_BITS), dtype=np.int8) * 2 - 1).astype(np.float32)
+
+
+@lru_cache(maxsize=65536)
+def word_features(word):
+    """
+    Hashed features of one word: the word itself and its character trigrams,
+    with boundary marks so "ache" and "headache" share only some of them.
+    Returns (sorted feature ids, counts).
+    """
+    padded = f"#{word}#"
+    keys = ["w:" + word] + [padded[i:i + 3] for i in range(len(padded) - 2)]
+    ids = np.array([zlib.crc32(key.encode()) % _DIMENSIONS for key in keys], dtype=np.int64)
+    ids, counts = np.unique(ids, return_counts=True)
+    return ids, counts.astype(np.float32)
+
+
+def content_words(tokens):
+    return [token for token in tokens if token not in STOPWORDS]
+
+
+class SemanticIndex:
+    """
+    Nearest-neighbour lookup of message n-grams among vocabulary phrases by
+    hashed TF-IDF similarity.
+
+    Catches paraphrases that are neither a known phrase nor close enough
+    character by character: reordered words ("throat is sore" for "sore
+    throat"), filler in between ("pain in my chest") and inflections. Phrases
+    are vectorized once, weighted by IDF over the vocabulary, and indexed in
+    LSH tables of signed random projections. A message is handled in one
+    batch: its n-gram vectors are sums of word vectors, so projections, dot
+    products and norms all come from the handful of distinct words, and only
+    the phrases sharing a bucket with some n-gram are scored exactly. Small
+    vocabularies skip the tables and score every phrase.
+    """
+    def __init__(self, entries=()):
+        """
+        entries: (phrase, label) pairs; the label is what a match returns.
+        IDF weights come from these phrases and are kept for add().
+        """
+        self.labels = []
+        self._keys = set()
+        # Content words per phrase, up to _MAX_NGRAM; an n-gram needs at least
+        # as many to match it
+        self._sizes = []
+        self._rows = []
+        self._signs = []
+        self._packed = None
+        self.lookups = 0
+        self.matched = 0
+        self.over_budget = 0
+        self._seconds = 0.0
+        rows = []
+        for phrase, label in entries:
+            words = tuple(sorted(content_words(tokenize(phrase.lower()))))
+            if words and (words, label) not in self._keys:
+                self._keys.add((words, label))
+                rows.append((words, label))
+        df = np.zeros(_DIMENSIONS, dtype=np.float64)
+        for words, label in rows:
+            df[np.unique(np.concatenate([word_features(w)[0] for w in words]))] += 1
+        self._idf = (np.log((1 + len(rows)) / (1 + df)) + 1).astype(np.float32)
+        for words, label in rows:
+            self._append(words, label)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, phrase, label):
+        """
+        Add a phrase, weighted with the IDF computed at build time.
+        """
+        words = tuple(sorted(content_words(tokenize(phrase.lower()))))
+        if words and (words, label) not in self._keys:
+            self._keys.add((words, label))
+            self._append(words, label)
+
+    def _append(self, words, label):
+        ids = np.concatenate([word_features(w)[0] for w in words])
+        counts = np.concatenate([word_features(w)[1] for w in words])
+        ids, inverse = np.unique(ids, return_inverse=True)
+        values = np.bincount(inverse, weights=counts).astype(np.float32) * self._idf[ids]
+        values /= np.linalg.norm(values)
+        self.labels.append(label)
+        self._sizes.append(min(len(words), _MAX_NGRAM))
+        self._rows.append((ids, values))
+        self._signs.append(values @ _planes()[ids] > 0)
+        # Rows and tables are repacked on the next lookup
+        self._packed = None
+
+    def prepare(self):
+        """
+        Do the one-time work of the first lookup now (packing the rows and
+        tables, generating the projection planes).
+        """
+        _planes()
+        if self.labels and self._packed is None:
+            self._pack()
+
+    def _pack(self):
+        lengths = np.array([len(ids) for ids, _ in self._rows], dtype=np.int64)
+        packed = {
+            "indptr": np.concatenate([[0], np.cumsum(lengths)]),
+            "indices": np.concatenate([ids for ids, _ in self._rows]),
+            "data": np.concatenate([values for _, values in self._rows]),
+            "sizes": np.array(self._sizes, dtype=np.int64),
+            "bits": 0,
+            "tables": [],
+        }
+        count = len(self._rows)
+        if count > _SMALL_VOCABULARY:
+            bits = min(_MAX_BITS, max(1, round(math.log2(count / _BUCKET_SIZE))))
+            codes = self._codes(np.array(self._signs), bits)
+            for table in range(_TABLES):
+                # Keyed on (code, size): an n-gram reads the part of its bucket
+                # holding phrases no longer than itself
+                keys = codes[:, table] * (_MAX_NGRAM + 1) + packed["sizes"]
+                order = np.argsort(keys, kind="stable")
+                packed["tables"].append((keys[order], order))
+            packed["bits"] = bits
+        self._packed = packed
+        return packed
+
+    @staticmethod
+    def _codes(signs, bits):
+        # One integer bucket code per table from the first `bits` signs of each
+        weights = 1 << np.arange(bits, dtype=np.int64)
+        return np.stack([signs[:, t * _MAX_BITS:t * _MAX_BITS + bits] @ weights for t in range(_TABLES)], axis=1)
+
+    def _candidates(self, projections, sizes, packed):
+        if not packed["tables"]:
+            return np.arange(len(self.labels))
+        codes = self._codes(projections > 0, packed["bits"]) * (_MAX_NGRAM + 1)
+        found = []
+        for table, (keys, order) in enumerate(packed["tables"]):
+            starts = np.searchsorted(keys, codes[:, table], side="left")
+            ends = np.searchsorted(keys, codes[:, table] + sizes, side="right")
+            for start, end in zip(starts, ends):
+                found.append(order[start:end])
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+
+    @staticmethod
+    def _word_dots(word_vectors, union, rows, packed):
+        # Dot products of every word vector with every candidate row, reading
+        # only the row entries on features some word has
+        indptr = packed["indptr"]
+        starts, ends = indptr[rows], indptr[rows + 1]
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = offsets + np.arange(lengths.sum())
+        owners = np.repeat(np.arange(len(rows)), lengths)
+        slot_of = np.full(_DIMENSIONS, -1, dtype=np.intp)
+        slot_of[union] = np.arange(len(union))
+        slots = slot_of[packed["indices"][positions]]
+        shared = slots >= 0
+        owners, slots, values = owners[shared], slots[shared], packed["data"][positions][shared]
+        return np.stack([np.bincount(owners, weights=word_vectors[i, slots] * values, minlength=len(rows))
+                         for i in range(len(word_vectors))])
+
+    def match(self, tokens, cutoff=CUTOFF, budget_ms=BUDGET_MS):
+        """
+        Labels of the phrases most similar to some n-gram of a tokenized
+        message (see utils.phrase_matcher.tokenize), best first, with cosine
+        similarity >= cutoff. Stops early, keeping what it found so far, once
+        budget_ms have passed.
+        """
+        start = time.perf_counter()
+        self.lookups += 1
+        words = content_words(tokens)
+        if not words or not self.labels:
+            return []
+        packed = self._packed or self._pack()
+        vocabulary = list(dict.fromkeys(words))
+        position = {word: i for i, word in enumerate(vocabulary)}
+        # Each n-gram as counts of the distinct words in it
+        grams = {}
+        for n in range(1, _MAX_NGRAM + 1):
+            for i in range(len(words) - n + 1):
+                grams.setdefault(tuple(sorted(position[w] for w in words[i:i + n])), None)
+        counts = np.zeros((len(grams), len(vocabulary)), dtype=np.float32)
+        gram_sizes = np.array([len(gram) for gram in grams], dtype=np.int64)
+        for row, gram in enumerate(grams):
+            for i in gram:
+                counts[row, i] += 1
+        # Word vectors over just the features they use
+        features = [word_features(word) for word in vocabulary]
+        union = np.unique(np.concatenate([ids for ids, _ in features]))
+        word_vectors = np.zeros((len(vocabulary), len(union)), dtype=np.float32)
+        for i, (ids, word_counts) in enumerate(features):
+            word_vectors[i, np.searchsorted(union, ids)] = word_counts
+        word_vectors *= self._idf[union]
+        # An n-gram vector is counts @ word_vectors, so its norm and its
+        # projections follow from the words' Gram matrix and projections
+        norms = np.sqrt(np.einsum("ij,ij->i", counts @ (word_vectors @ word_vectors.T), counts))
+        projections = counts @ (word_vectors @ _planes()[union])
+        # (score, n-gram, label) of each n-gram's closest phrase above the cutoff
+        hits = []
+        gram_words = list(grams)
+        deadline = start + budget_ms / 1e3
+        for lo in range(0, len(counts), _CHUNK):
+            if lo and time.perf_counter() > deadline:
+                self.over_budget += 1
+                break
+            rows = self._candidates(projections[lo:lo + _CHUNK], gram_sizes[lo:lo + _CHUNK], packed)
+            if not len(rows):
+                continue
+            dots = counts[lo:lo + _CHUNK] @ self._word_dots(word_vectors, union, rows, packed)
+            scores = dots / norms[lo:lo + _CHUNK, None]
+            # One strong word can't stand in for a whole phrase ("aching" for "head is aching")
+            scores[gram_sizes[lo:lo + _CHUNK, None] < packed["sizes"][rows]] = 0
+            closest = scores.argmax(axis=1)
+            for i in np.flatnonzero(scores[np.arange(len(closest)), closest] >= cutoff):
+                hits.append((float(scores[i, closest[i]]), lo + i, self.labels[rows[closest[i]]]))
+        # Best matches first; an n-gram only counts if none of its words went
+        # to a better one, so "pain" alone can't add "headache" to "chest pain"
+        result = []
+        covered = set()
+        for score, gram, label in sorted(hits, key=lambda hit: (-hit[0], -len(gram_words[hit[1]]), hit[2])):
+            if covered.isdisjoint(gram_words[gram]):
+                covered.update(gram_words[gram])
+                if label not in result:
+                    result.append(label)
+        result = result[:MAX_MATCHES]
+        if result:
+            self.matched += 1
+        self._seconds += time.perf_counter() - start
+        return result
+
+    def stats(self):
+        return {
+            "phrases": len(self.labels),
+            "lookups": self.lookups,
+            "matched": self.matched,
+            "match_rate": round(self.matched / self.lookups, 4) if self.lookups else 0.0,
+            "over_budget": self.over_budget,
+            "latency_ms": round(self._seconds / self.lookups * 1e3, 4) if self.lookups else None,
+        }